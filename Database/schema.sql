@@ -0,0 +1,226 @@
+-- HeartDiseaseDB star schema.
+-- Generated by scripts/generate_schema.py from the table definitions in
+-- scripts/load_data.py; edit those and regenerate instead of editing this file.
+
+USE HeartDiseaseDB;
+GO
+
+-- Dimensions
+
+IF OBJECT_ID(N'dbo.DimPerson', N'U') IS NULL
+BEGIN
+CREATE TABLE dbo.DimPerson (
+    PersonID INT IDENTITY(1,1) NOT NULL,
+    Sex VARCHAR(10) NOT NULL,
+    AgeCategory VARCHAR(20) NOT NULL,
+    RaceEthnicityCategory VARCHAR(40) NOT NULL,
+    CONSTRAINT PK_DimPerson PRIMARY KEY CLUSTERED (PersonID)
+);
+CREATE UNIQUE NONCLUSTERED INDEX UX_DimPerson_NaturalKey
+    ON dbo.DimPerson (Sex, AgeCategory, RaceEthnicityCategory);
+END
+GO
+
+IF OBJECT_ID(N'dbo.DimState', N'U') IS NULL
+BEGIN
+CREATE TABLE dbo.DimState (
+    StateID INT IDENTITY(1,1) NOT NULL,
+    StateName VARCHAR(40) NOT NULL,
+    Region VARCHAR(50) NULL,
+    CONSTRAINT PK_DimState PRIMARY KEY CLUSTERED (StateID)
+);
+CREATE UNIQUE NONCLUSTERED INDEX UX_DimState_NaturalKey
+    ON dbo.DimState (StateName);
+END
+GO
+
+IF OBJECT_ID(N'dbo.DimCheckupTime', N'U') IS NULL
+BEGIN
+CREATE TABLE dbo.DimCheckupTime (
+    CheckupTimeID INT IDENTITY(1,1) NOT NULL,
+    LastCheckupTime VARCHAR(80) NOT NULL,
+    CheckupRecency TINYINT NOT NULL,
+    CONSTRAINT PK_DimCheckupTime PRIMARY KEY CLUSTERED (CheckupTimeID)
+);
+CREATE UNIQUE NONCLUSTERED INDEX UX_DimCheckupTime_NaturalKey
+    ON dbo.DimCheckupTime (LastCheckupTime);
+END
+GO
+
+IF OBJECT_ID(N'dbo.DimPhysicalActivity', N'U') IS NULL
+BEGIN
+CREATE TABLE dbo.DimPhysicalActivity (
+    PhysicalActivityID INT IDENTITY(1,1) NOT NULL,
+    PhysicalActivities VARCHAR(3) NOT NULL,
+    ActivityLevel VARCHAR(10) NOT NULL,
+    CONSTRAINT PK_DimPhysicalActivity PRIMARY KEY CLUSTERED (PhysicalActivityID)
+);
+CREATE UNIQUE NONCLUSTERED INDEX UX_DimPhysicalActivity_NaturalKey
+    ON dbo.DimPhysicalActivity (PhysicalActivities, ActivityLevel);
+END
+GO
+
+IF OBJECT_ID(N'dbo.DimLifestyle', N'U') IS NULL
+BEGIN
+CREATE TABLE dbo.DimLifestyle (
+    LifestyleID INT IDENTITY(1,1) NOT NULL,
+    SmokerStatus VARCHAR(50) NOT NULL,
+    ECigaretteUsage VARCHAR(50) NOT NULL,
+    AlcoholDrinkers VARCHAR(3) NOT NULL,
+    SleepQuality VARCHAR(10) NOT NULL,
+    CONSTRAINT PK_DimLifestyle PRIMARY KEY CLUSTERED (LifestyleID)
+);
+CREATE UNIQUE NONCLUSTERED INDEX UX_DimLifestyle_NaturalKey
+    ON dbo.DimLifestyle (SmokerStatus, ECigaretteUsage, AlcoholDrinkers, SleepQuality);
+END
+GO
+
+IF OBJECT_ID(N'dbo.DimChronicDiseases', N'U') IS NULL
+BEGIN
+CREATE TABLE dbo.DimChronicDiseases (
+    ChronicDiseaseID INT IDENTITY(1,1) NOT NULL,
+    HadDiabetes VARCHAR(3) NOT NULL,
+    HadArthritis VARCHAR(3) NOT NULL,
+    HadCOPD VARCHAR(3) NOT NULL,
+    HadKidneyDisease VARCHAR(3) NOT NULL,
+    HadDepressiveDisorder VARCHAR(3) NOT NULL,
+    HadCancer VARCHAR(3) NOT NULL,
+    HadSkinCancer VARCHAR(3) NOT NULL,
+    CONSTRAINT PK_DimChronicDiseases PRIMARY KEY CLUSTERED (ChronicDiseaseID)
+);
+CREATE UNIQUE NONCLUSTERED INDEX UX_DimChronicDiseases_NaturalKey
+    ON dbo.DimChronicDiseases (HadDiabetes, HadArthritis, HadCOPD, HadKidneyDisease, HadDepressiveDisorder, HadCancer, HadSkinCancer);
+END
+GO
+
+-- Facts: one partition per RecordYear (2020-2030)
+
+IF NOT EXISTS (SELECT 1 FROM sys.partition_functions WHERE name = N'pfRecordYear')
+    CREATE PARTITION FUNCTION pfRecordYear (SMALLINT)
+    AS RANGE RIGHT FOR VALUES (2020, 2021, 2022, 2023, 2024, 2025, 2026, 2027, 2028, 2029, 2030, 2031);
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.partition_schemes WHERE name = N'psRecordYear')
+    CREATE PARTITION SCHEME psRecordYear
+    AS PARTITION pfRecordYear ALL TO ([PRIMARY]);
+GO
+
+IF OBJECT_ID(N'dbo.HealthRecord', N'U') IS NULL
+BEGIN
+CREATE TABLE dbo.HealthRecord (
+    HealthRecordID INT IDENTITY(1,1) NOT NULL,
+    PersonID INT NOT NULL,
+    StateID INT NOT NULL,
+    CheckupTimeID INT NOT NULL,
+    PhysicalActivityID INT NOT NULL,
+    ChronicDiseaseID INT NOT NULL,
+    LifestyleID INT NOT NULL,
+    HeartDiseaseFlag TINYINT NOT NULL,
+    PhysicalHealthDays DECIMAL(4, 1) NULL,
+    MentalHealthDays DECIMAL(4, 1) NULL,
+    SleepHours DECIMAL(4, 2) NULL,
+    HeightInMeters DECIMAL(3, 2) NULL,
+    WeightInKilograms DECIMAL(5, 2) NULL,
+    BMI DECIMAL(4, 2) NULL,
+    RecordYear SMALLINT NOT NULL,
+    CONSTRAINT PK_HealthRecord PRIMARY KEY NONCLUSTERED (HealthRecordID, RecordYear) ON psRecordYear (RecordYear),
+    CONSTRAINT FK_HealthRecord_DimPerson FOREIGN KEY (PersonID) REFERENCES dbo.DimPerson (PersonID),
+    CONSTRAINT FK_HealthRecord_DimState FOREIGN KEY (StateID) REFERENCES dbo.DimState (StateID),
+    CONSTRAINT FK_HealthRecord_DimCheckupTime FOREIGN KEY (CheckupTimeID) REFERENCES dbo.DimCheckupTime (CheckupTimeID),
+    CONSTRAINT FK_HealthRecord_DimPhysicalActivity FOREIGN KEY (PhysicalActivityID) REFERENCES dbo.DimPhysicalActivity (PhysicalActivityID),
+    CONSTRAINT FK_HealthRecord_DimLifestyle FOREIGN KEY (LifestyleID) REFERENCES dbo.DimLifestyle (LifestyleID),
+    CONSTRAINT FK_HealthRecord_DimChronicDiseases FOREIGN KEY (ChronicDiseaseID) REFERENCES dbo.DimChronicDiseases (ChronicDiseaseID)
+) ON psRecordYear (RecordYear);
+CREATE CLUSTERED COLUMNSTORE INDEX CCI_HealthRecord
+    ON dbo.HealthRecord ON psRecordYear (RecordYear);
+END
+GO
+
+IF OBJECT_ID(N'dbo.HealthRecordStage', N'U') IS NULL
+BEGIN
+CREATE TABLE dbo.HealthRecordStage (
+    HealthRecordID INT IDENTITY(1,1) NOT NULL,
+    PersonID INT NOT NULL,
+    StateID INT NOT NULL,
+    CheckupTimeID INT NOT NULL,
+    PhysicalActivityID INT NOT NULL,
+    ChronicDiseaseID INT NOT NULL,
+    LifestyleID INT NOT NULL,
+    HeartDiseaseFlag TINYINT NOT NULL,
+    PhysicalHealthDays DECIMAL(4, 1) NULL,
+    MentalHealthDays DECIMAL(4, 1) NULL,
+    SleepHours DECIMAL(4, 2) NULL,
+    HeightInMeters DECIMAL(3, 2) NULL,
+    WeightInKilograms DECIMAL(5, 2) NULL,
+    BMI DECIMAL(4, 2) NULL,
+    RecordYear SMALLINT NOT NULL,
+    CONSTRAINT PK_HealthRecordStage PRIMARY KEY NONCLUSTERED (HealthRecordID, RecordYear) ON psRecordYear (RecordYear),
+    CONSTRAINT FK_HealthRecordStage_DimPerson FOREIGN KEY (PersonID) REFERENCES dbo.DimPerson (PersonID),
+    CONSTRAINT FK_HealthRecordStage_DimState FOREIGN KEY (StateID) REFERENCES dbo.DimState (StateID),
+    CONSTRAINT FK_HealthRecordStage_DimCheckupTime FOREIGN KEY (CheckupTimeID) REFERENCES dbo.DimCheckupTime (CheckupTimeID),
+    CONSTRAINT FK_HealthRecordStage_DimPhysicalActivity FOREIGN KEY (PhysicalActivityID) REFERENCES dbo.DimPhysicalActivity (PhysicalActivityID),
+    CONSTRAINT FK_HealthRecordStage_DimLifestyle FOREIGN KEY (LifestyleID) REFERENCES dbo.DimLifestyle (LifestyleID),
+    CONSTRAINT FK_HealthRecordStage_DimChronicDiseases FOREIGN KEY (ChronicDiseaseID) REFERENCES dbo.DimChronicDiseases (ChronicDiseaseID)
+) ON psRecordYear (RecordYear);
+CREATE CLUSTERED COLUMNSTORE INDEX CCI_HealthRecordStage
+    ON dbo.HealthRecordStage ON psRecordYear (RecordYear);
+END
+GO
+
+-- Summary tables and load bookkeeping
+
+IF OBJECT_ID(N'dbo.AggHeartDiseaseByDemographics', N'U') IS NULL
+BEGIN
+CREATE TABLE dbo.AggHeartDiseaseByDemographics (
+    RecordYear SMALLINT NOT NULL,
+    StateID INT NOT NULL,
+    PersonID INT NOT NULL,
+    RecordCount INT NOT NULL,
+    HeartDiseaseCount INT NOT NULL,
+    BMISum FLOAT NOT NULL,
+    SleepHoursSum FLOAT NOT NULL,
+    HeartDiseasePrevalence AS CAST(HeartDiseaseCount AS FLOAT) / NULLIF(RecordCount, 0),
+    CONSTRAINT PK_AggHeartDiseaseByDemographics PRIMARY KEY CLUSTERED (RecordYear, StateID, PersonID)
+);
+END
+GO
+
+IF OBJECT_ID(N'dbo.AggHeartDiseaseByRisk', N'U') IS NULL
+BEGIN
+CREATE TABLE dbo.AggHeartDiseaseByRisk (
+    RecordYear SMALLINT NOT NULL,
+    ChronicDiseaseID INT NOT NULL,
+    LifestyleID INT NOT NULL,
+    RecordCount INT NOT NULL,
+    HeartDiseaseCount INT NOT NULL,
+    BMISum FLOAT NOT NULL,
+    SleepHoursSum FLOAT NOT NULL,
+    HeartDiseasePrevalence AS CAST(HeartDiseaseCount AS FLOAT) / NULLIF(RecordCount, 0),
+    CONSTRAINT PK_AggHeartDiseaseByRisk PRIMARY KEY CLUSTERED (RecordYear, ChronicDiseaseID, LifestyleID)
+);
+END
+GO
+
+IF OBJECT_ID(N'dbo.EtlLoadManifest', N'U') IS NULL
+BEGIN
+CREATE TABLE dbo.EtlLoadManifest (
+    RecordYear SMALLINT NOT NULL PRIMARY KEY,
+    SourceFile NVARCHAR(400) NOT NULL,
+    ContentHash CHAR(64) NOT NULL,
+    RowsLoaded INT NOT NULL,
+    LoadedAt DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME()
+);
+END
+GO
+
+IF OBJECT_ID(N'dbo.EtlLoadCheckpoint', N'U') IS NULL
+BEGIN
+CREATE TABLE dbo.EtlLoadCheckpoint (
+    RecordYear SMALLINT NOT NULL,
+    BatchNo INT NOT NULL,
+    LoadFingerprint CHAR(64) NOT NULL,
+    RowsLoaded INT NOT NULL,
+    CommittedAt DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME(),
+    CONSTRAINT PK_EtlLoadCheckpoint PRIMARY KEY CLUSTERED (RecordYear, BatchNo)
+);
+END
+GO
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Streaming access to an LLCP ASC file as shipped: plain, or compressed as
+.zip (as CDC distributes it), .gz or .zst. Compressed files are
+decompressed while they are read, never extracted to disk.
+
+- open_asc: a binary, line-readable file object over the (decompressed) records.
+- read_chunks: the records as large buffers of whole lines, with the byte
+  offset after each one, for the decode stage of asc_to_csv.py.
+
+Compressed input can only be read front to back, so it cannot be split into
+byte-range shards; asc_to_csv.py decodes its chunks on worker processes
+instead. .zst needs the zstandard package (or pyarrow, whose zstd codec is
+used when zstandard is missing).
+"""
+
+import gzip
+import io
+import os
+import time
+import zipfile
+from typing import Optional
+
+from instrumentation import record
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+COMPRESSED_SUFFIXES = ('.zip', '.gz', '.zst')
+READ_BUFFER = 1 << 20  # buffer of the decompressed stream
+SKIP_BYTES = 16 * 1024 * 1024  # read size when skipping to a resume offset
+
+
+def compression(path: str) -> Optional[str]:
+    """The compressed-file suffix of path ('.zip', '.gz', '.zst'), or None for a plain file."""
+    suffix = os.path.splitext(path)[1].lower()
+    return suffix if suffix in COMPRESSED_SUFFIXES else None
+
+
+def is_compressed(path: str) -> bool:
+    return compression(path) is not None
+
+
+def asc_member(archive: zipfile.ZipFile) -> zipfile.ZipInfo:
+    """The ASC file inside a zip: the only *.ASC member, or the only file."""
+    members = [member for member in archive.infolist() if not member.is_dir()]
+    # CDC names the member 'LLCP2022.ASC ' (with a trailing space)
+    candidates = [member for member in members if member.filename.strip().upper().endswith('.ASC')] or members
+    if len(candidates) != 1:
+        names = ', '.join(repr(member.filename) for member in candidates) or 'no files'
+        raise ValueError(f'Expected one ASC file in {archive.filename}, found {names}')
+    return candidates[0]
+
+
+def open_asc(path: str):
+    """Open an ASC file (plain, .zip, .gz or .zst) for binary reading."""
+    suffix = compression(path)
+    if suffix is None:
+        return open(path, 'rb')
+    if suffix == '.gz':
+        return gzip.open(path, 'rb')
+    if suffix == '.zip':
+        # The member keeps the archive file open until it is closed itself
+        with zipfile.ZipFile(path) as archive:
+            return archive.open(asc_member(archive))
+    if zstandard is not None:
+        raw = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True)
+    elif pa is not None:
+        raw = pa.CompressedInputStream(path, 'zstd')
+    else:
+        raise ImportError('zstandard is required to read .zst files. Install it with: pip install zstandard')
+    return io.BufferedReader(raw, READ_BUFFER)
+
+
+def first_record(path: str) -> bytes:
+    """The first line of an ASC file, line terminator included."""
+    with open_asc(path) as f:
+        return f.readline()
+
+
+def skip_bytes(f, nbytes: int):
+    """Read and discard nbytes (compressed streams cannot seek cheaply)."""
+    while nbytes > 0:
+        data = f.read(min(nbytes, SKIP_BYTES))
+        if not data:
+            raise EOFError(f'The ASC stream ended {nbytes} bytes before the resume offset')
+        nbytes -= len(data)
+
+
+def read_chunks(path: str, chunk_bytes: int, start: int = 0):
+    """
+    Yield (buffer of whole records, byte offset after them) from the
+    decompressed ASC stream, starting at byte `start` (a record boundary).
+    Every buffer ends with a line terminator except, possibly, the last one.
+    With fixed-length records and chunk_bytes a multiple of their length,
+    every buffer but the last holds exactly chunk_bytes.
+    Reading and decompression are timed as the span 'read'.
+    """
+    with open_asc(path) as f:
+        if start:
+            if compression(path) is None:
+                f.seek(start)
+            else:
+                skip_bytes(f, start)
+        offset = start
+        pending = b''
+        while True:
+            began = time.perf_counter()
+            data = f.read(chunk_bytes)
+            record('read', time.perf_counter() - began, nbytes=len(data))
+            if not data:
+                break
+            if pending:
+                data = pending + data
+            cut = data.rfind(b'\n') + 1
+            pending = data[cut:]
+            if cut:
+                offset += cut
+                yield data[:cut] if pending else data, offset
+        if pending:
+            yield pending, offset + len(pending)
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
-Convert a fixed-width LLCP ASCII file (e.g. LLCP2022.ASC) to CSV
-using the SAS HTML codebook to infer column positions.
+Convert a fixed-width LLCP ASCII file (e.g. LLCP2022.ASC) to CSV (or Parquet /
+Arrow IPC with --format) using the SAS HTML codebook to infer column positions.
 
 Usage:
   python scripts/asc_to_csv.py \
@@ -11,18 +11,53 @@ Usage:
     --chunksize 50000
 
 This script:
-- Parses the SAS HTML codebook to extract "Column: start-end" and "SAS Variable Name" pairs.
+- Parses the SAS HTML codebook to extract "Column: start-end" and "SAS Variable Name" pairs
+  (compiled once and cached by content hash, see codebook_schema.py).
 - Builds absolute column specs (supports overlapping columns).
-- Streams the large ASC file into CSV using pandas.read_fwf with chunks.
+- Streams the large ASC file into CSV in blocks, slicing every column of a
+  block at once from a NumPy character matrix (see read_fwf_blocks).
+- Reads --asc as a plain file or straight from a .zip (as CDC ships it),
+  .gz or .zst, decompressing while streaming (see asc_input.py).
+- Overlaps the stages: a reader thread decompresses ahead of the decoder
+  (compressed input), the blocks are decoded on --workers processes (plain
+  files are split into byte-range shards instead), and a writer thread
+  encodes and writes every block to the output, which stays open for the
+  whole run. The stages are joined by bounded queues.
+- Optionally writes typed, zstd-compressed Parquet or Arrow IPC instead of CSV
+  (--format), with one row group / record batch per chunk.
+- Times every stage (codebook, read_decode, write_csv, ...) and can write a
+  JSON run report, a Prometheus textfile or a profile (--report, --prometheus,
+  --profile; see instrumentation.py).
+- Checkpoints every CSV output part (the main output or each --workers part)
+  after every block: the next ASC byte offset, the rows and the bytes
+  written. After a crash, --resume checks the partial output against its
+  checkpoint and continues from there, and skips outputs that are already
+  complete (see checkpoint.py).
 """
 
-import re
+import contextlib
 import csv
-import html
+import hashlib
+import io
+import json
+import mmap
 import argparse
 import os
+import queue
+import shutil
 import sys
-from typing import List, Tuple
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from asc_input import first_record, is_compressed, open_asc, read_chunks
+from checkpoint import checkpoint_path, file_identity, load_checkpoint, save_checkpoint, sync
+from codebook_schema import load_codebook_schema
+from instrumentation import add_counts, add_instrumentation_args, instrumented_run, span, timed_iter
 
 try:
     import pandas as pd
@@ -30,50 +65,66 @@ except ImportError:
     print("pandas is required. Install it with: pip install pandas", file=sys.stderr)
     raise
 
+# pyarrow is only needed for --format parquet/arrow
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+OUTPUT_FORMATS = ('csv', 'parquet', 'arrow')
+SHARDS_FILE = 'shards.json'  # shard list of a --workers run, kept in its parts directory
+PIPELINE_DEPTH = 2  # blocks a pipeline stage may run ahead of the next one
+
 
 # ----------------------------------------------------------------------
 # Step 1: Parse the SAS HTML codebook
 # ----------------------------------------------------------------------
 def parse_codebook(codebook_path: str) -> List[Tuple[str, int, int]]:
-    """Parse the SAS HTML codebook and return list of (varname, start, end).
+    """Return list of (varname, start, end) from the SAS HTML codebook.
 
-    The function extracts lines like:
+    Positions come from lines like:
       Column: 19-26 ... SAS Variable Name: IDATE
-    and returns positions as integers (1-based, inclusive).
+    and are returned as integers (1-based, inclusive). The codebook is compiled
+    once into a schema cached by its content hash (see codebook_schema.py).
     """
-    with open(codebook_path, 'r', encoding='utf-8', errors='ignore') as f:
-        raw = f.read()
-
-    # Decode HTML entities and remove tags for easier regex search
-    text = html.unescape(raw)
-    text_plain = re.sub(r'<[^>]+>', ' ', text)
-
-    # Find Column: X-Y ... SAS Variable Name: NAME
-    pattern = re.compile(r'Column:\s*([0-9]+)(?:-([0-9]+))?.*?SAS\s+Variable\s+Name:\s*([A-Za-z0-9_]+)', re.S)
-    matches = pattern.findall(text_plain)
+    schema = load_codebook_schema(codebook_path)
+    vars_positions = [(var['name'], var['start'], var['end']) for var in schema['variables']]
+    vars_positions.sort(key=lambda x: x[1])  # sort by start position
+    return vars_positions
 
-    if not matches:
-        raise RuntimeError(f'No column/variable matches found in {codebook_path}.')
 
-    vars_positions = []
-    for m in matches:
-        start = int(m[0])
-        end = int(m[1]) if m[1] else start
-        var = m[2]
-        vars_positions.append((var, start, end))
+def parse_codebook_types(codebook_path: str) -> Dict[str, Tuple[str, Optional[int]]]:
+    """Return {varname: (sas_type, implied_decimals)} from the SAS HTML codebook.
 
-    vars_positions.sort(key=lambda x: x[1])  # sort by start position
-    return vars_positions
+    sas_type is 'Num' or 'Char' (from "Type of Variable:"). implied_decimals
+    comes from value-label notes such as "[2 implied decimal places]" and is 0
+    when there is none, or None for variables documented with a
+    "Floating Decimal Point".
+    """
+    schema = load_codebook_schema(codebook_path)
+    return {var['name']: (var['type'], var['implied_decimals']) for var in schema['variables']}
 
 
 # ----------------------------------------------------------------------
 # Step 2: Build column specs for read_fwf_gerator
 # ----------------------------------------------------------------------
-def build_colspecs_and_names(vars_positions: List[Tuple[str, int, int]]):
+def build_colspecs_and_names(vars_positions: List[Tuple[str, int, int]],
+                             columns: Optional[List[str]] = None):
     """
     Build colspecs for pandas.read_fwf from (varname, start, end) positions.
     Handles overlapping columns correctly by using absolute 0-based positions.
+
+    If columns is given, only those SAS variables are kept, in the requested
+    order, so every later stage decodes and writes just the projected fields.
     """
+    if columns is not None:
+        by_name = {var: (var, start, end) for var, start, end in vars_positions}
+        missing = [col for col in columns if col not in by_name]
+        if missing:
+            raise ValueError(f'Columns not found in codebook: {", ".join(missing)}')
+        vars_positions = [by_name[col] for col in dict.fromkeys(columns)]
+
     names = []
     colspecs = []
     for var, start, end in vars_positions:
@@ -82,6 +133,54 @@ def build_colspecs_and_names(vars_positions: List[Tuple[str, int, int]]):
         names.append(var)
     return names, colspecs
 
+
+def load_column_list(path: str) -> List[str]:
+    """
+    Read SAS variable names from a text file, one per line.
+
+    Lines may carry a description after ' - ' (the format of
+    documentation/var_list_decription.txt); blank lines and '#' comments are skipped.
+    """
+    columns = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            name = line.split(' - ', 1)[0].strip()
+            if name and not name.startswith('#'):
+                columns.append(name)
+    return columns
+
+
+def coalesce_colspecs(colspecs: List[Tuple[int, int]]):
+    """
+    Merge the byte ranges used by colspecs into as few contiguous ranges as possible.
+
+    Returns (ranges, local_colspecs): ranges are the merged (start, end) spans
+    of a record, and local_colspecs are the original colspecs re-based onto the
+    concatenation of those spans. The memory-mapped path never copies bytes
+    outside every range; the line reader (see decode_block) copies each line
+    up to the end of the last range first.
+    """
+    ranges = []
+    for start, end in sorted(colspecs):
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([start, end])
+
+    offsets = []
+    packed = 0
+    for start, end in ranges:
+        offsets.append((start, packed))
+        packed += end - start
+
+    local_colspecs = []
+    for start, end in colspecs:
+        range_start, packed_start = next((r, p) for r, p in reversed(offsets) if r <= start)
+        shift = packed_start - range_start
+        local_colspecs.append((start + shift, end + shift))
+    return [tuple(r) for r in ranges], local_colspecs
+
+
 def read_fwf_generator(filepath, colspecs, names):
     """
     Reads a fixed-width file line by line, yielding one dictionary per row.
@@ -91,30 +190,189 @@ def read_fwf_generator(filepath, colspecs, names):
         filepath (str): Path to the file.
         colspecs (list): List of (start, end) tuples for slicing.
         names (list): List of column names.
+
+    Errors (a missing file, a read error) propagate to the caller instead of
+    ending the iteration early, so a failed read cannot pass for a short file.
+    """
+    with io.TextIOWrapper(open_asc(filepath)) as f:
+        for line in f:
+            # Use rstrip() to remove trailing newline characters
+            # without affecting potential leading whitespace in a field.
+            cleaned_line = line.rstrip('\n\r')
+
+            # Build a list of values by slicing the line
+            values = []
+            for start, end in colspecs:
+                # Slice the line and strip whitespace from the field
+                # This achieves dtype=str by default.
+                field_value = cleaned_line[start:end].strip()
+                values.append(field_value)
+
+            # Yield the row as a dictionary
+            if len(values) == len(names):
+                yield dict(zip(names, values))
+
+def read_fwf_blocks(filepath, colspecs, names, block_rows=50000, start=0, end=None, with_offsets=False, workers=1):
+    """
+    Reads a fixed-width file in blocks, yielding one dict of column arrays per block.
+    This is the vectorized counterpart of read_fwf_generator + chunk_generator.
+
+    Each block of raw lines is packed into a fixed-stride (rows x width) byte
+    matrix, so every column in colspecs is a single 2-D slice of that matrix
+    instead of one Python slice and strip per row. Short lines are padded with
+    NUL bytes, which NumPy drops from 'S' values, so they decode like the
+    out-of-range slices of the line-based reader.
+
+    Compressed files (.zip, .gz, .zst) are decompressed on a reader thread
+    and their blocks decoded on `workers` processes (see decode_chunks);
+    they can only be read from `start` to the end.
+
+    Args:
+        filepath (str): Path to the file.
+        colspecs (list): List of (start, end) tuples for slicing.
+        names (list): List of column names.
+        block_rows (int): Number of lines to decode per block.
+        start (int): Byte offset of the first record to read (must be a record boundary).
+        end (int): Optional byte offset to stop at (records starting before it are read).
+        with_offsets (bool): Yield (block, byte offset after the block's last record).
+        workers (int): Processes decoding the blocks of a compressed file.
+
+    Yields:
+        dict: column name -> 1-D numpy array of stripped bytes ('S' dtype).
     """
+    width = max(end for _, end in colspecs)
+    record_dtype = np.dtype(f'S{width}')
+    ranges, local_colspecs = coalesce_colspecs(colspecs)
+
+    if is_compressed(filepath):
+        if end is not None:
+            raise ValueError(f'{filepath} is compressed and can only be read to the end, not by byte range')
+        record_length, _ = detect_record_length(filepath)
+        chunks = read_chunks(filepath, block_rows * max(record_length, 1), start)
+        with contextlib.closing(decode_chunks(chunks, ranges, local_colspecs, names, width, workers)) as blocks:
+            for block, offset in blocks:
+                yield (block, offset) if with_offsets else block
+        return
+
+    # Fixed-length files are sliced straight out of a memory map; if a record
+    # of a different length turns up, the line reader takes over from there.
+    mapped = map_records(filepath, width)
+    if mapped is not None:
+        start = yield from read_mapped_blocks(mapped, ranges, local_colspecs, names, width, block_rows, start, end,
+                                              with_offsets)
+        del mapped
+        if start is None:
+            return
+
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        records = iter_records(f, end - start) if end is not None else f
+        offset = start
+        while True:
+            lines = list(islice(records, block_rows))
+            if not lines:
+                break
+            block = decode_block(lines, ranges, local_colspecs, names, record_dtype)
+            offset += sum(map(len, lines))
+            yield (block, offset) if with_offsets else block
+
+
+def iter_records(f, nbytes):
+    """Yield lines from a binary file until nbytes have been consumed."""
+    consumed = 0
+    for line in f:
+        if consumed >= nbytes:
+            break
+        consumed += len(line)
+        yield line
+
+
+def decode_block(lines, ranges, local_colspecs, names, record_dtype):
+    """
+    Slice every column out of a list of raw byte lines in one pass per column.
+
+    ranges and local_colspecs come from coalesce_colspecs. Each line is first
+    copied up to the record width (the end of the last range), bytes outside
+    the ranges included, and the ranges are then gathered from that matrix:
+    one copy per line is faster than gathering the ranges byte by byte from
+    the line buffers, even for a narrow projection.
+    """
+    width = record_dtype.itemsize
+    # np.array copies the lines into one contiguous buffer, truncating longer
+    # lines and NUL-padding shorter ones to the record width.
+    matrix = np.array(lines, dtype=record_dtype).view(np.uint8).reshape(len(lines), width)
+    return decode_matrix(matrix, ranges, local_colspecs, names)
+
+
+def decode_matrix(matrix, ranges, local_colspecs, names):
+    """Slice every column out of a (rows x width) uint8 record matrix."""
+    if ranges != [(0, matrix.shape[1])]:
+        matrix = np.concatenate([matrix[:, start:end] for start, end in ranges], axis=1)
+
+    block = {}
+    for name, (start, end) in zip(names, local_colspecs):
+        field = np.ascontiguousarray(matrix[:, start:end]).view(f'S{end - start}').ravel()
+        # strip() also removes the trailing newline when a field runs past the end of a line
+        block[name] = np.char.strip(field)
+    return block
+
+
+def block_length(block: Dict[str, np.ndarray]) -> int:
+    """Number of rows in a block of column arrays."""
+    return len(next(iter(block.values()))) if block else 0
+
+
+def decode_column(values: np.ndarray) -> list:
+    """Convert an 'S' column array into a list of str for the csv writer."""
     try:
-        with open(filepath, 'r') as f:
-            for line in f:
-                # Use rstrip() to remove trailing newline characters
-                # without affecting potential leading whitespace in a field.
-                cleaned_line = line.rstrip('\n\r')
-
-                # Build a list of values by slicing the line
-                values = []
-                for start, end in colspecs:
-                    # Slice the line and strip whitespace from the field
-                    # This achieves dtype=str by default.
-                    field_value = cleaned_line[start:end].strip()
-                    values.append(field_value)
-                
-                # Yield the row as a dictionary
-                if len(values) == len(names):
-                    yield dict(zip(names, values))
-                    
-    except FileNotFoundError:
-        print(f"Error: File not found at {filepath}")
-    except Exception as e:
-        print(f"An error occurred: {e}")
+        return values.astype(str).tolist()
+    except UnicodeDecodeError:
+        # LLCP files are ASCII; keep going on stray bytes instead of failing the block
+        return np.char.decode(values, 'latin-1').tolist()
+
+
+# Bytes that make csv.writer quote a field (QUOTE_MINIMAL with the default dialect)
+_CSV_SPECIAL_BYTES = np.frombuffer(b',"\r\n', dtype=np.uint8)
+
+
+def needs_quoting(values: np.ndarray) -> bool:
+    """True if any value in an 'S' column contains a delimiter, quote or line break."""
+    return bool(np.isin(values.view(np.uint8), _CSV_SPECIAL_BYTES).any())
+
+
+def csv_header(names: List[str]) -> bytes:
+    """The CSV header line, as csv.writer writes it."""
+    buf = io.StringIO()
+    csv.writer(buf).writerow(names)
+    return buf.getvalue().encode('utf-8')
+
+
+def write_csv_header(f, names: List[str]):
+    """Write the CSV header line to a binary file handle."""
+    f.write(csv_header(names))
+
+
+def write_csv_block(f, block: Dict[str, np.ndarray], names: List[str]):
+    """
+    Write a block of column arrays as CSV rows to a binary file handle,
+    in the order given by names.
+
+    The output is byte-identical to csv.writer/csv.DictWriter with the default
+    dialect. LLCP fields never need quoting, so rows are joined directly from
+    the column bytes; a block that does contain special characters (or a
+    single-column block, where csv quotes empty rows) goes through csv.writer.
+    """
+    columns = [block[name] for name in names]
+    if len(columns) > 1 and not any(needs_quoting(values) for values in columns):
+        lines = map(b','.join, zip(*(values.tolist() for values in columns)))
+        f.write(b'\r\n'.join(lines))
+        f.write(b'\r\n')
+        return
+
+    buf = io.StringIO()
+    csv.writer(buf).writerows(zip(*(decode_column(values) for values in columns)))
+    f.write(buf.getvalue().encode('utf-8'))
+
 
 def chunk_generator(generator, chunksize):
     """
@@ -136,15 +394,436 @@ def chunk_generator(generator, chunksize):
     if chunk:
         yield chunk
 
+# ----------------------------------------------------------------------
+# Memory-mapped access to fixed-length records
+# ----------------------------------------------------------------------
+def detect_record_length(asc_path: str) -> Tuple[int, bytes]:
+    """Return (record length including the line terminator, terminator) from the first record."""
+    first = first_record(asc_path)
+    if first.endswith(b'\r\n'):
+        return len(first), b'\r\n'
+    if first.endswith(b'\n'):
+        return len(first), b'\n'
+    return len(first), b''
+
+
+def map_records(asc_path: str, width: int):
+    """
+    Memory-map a fixed-length ASC file as a (records x record_length) uint8 matrix.
+
+    The record length comes from the first line (the same check as
+    validate_colspecs_with_file). Returns (records, tail, terminator), where
+    records is a read-only NumPy view over the mapped file (the map is closed
+    once the last view is released) and tail is an unterminated last record
+    (or b''), or None when the file cannot be addressed as fixed-length records
+    covering width, in which case callers fall back to reading lines.
+    """
+    size = os.path.getsize(asc_path)
+    if size == 0:
+        return None
+    record_length, terminator = detect_record_length(asc_path)
+    if not terminator or record_length - len(terminator) < width:
+        return None
+
+    n_records, tail_length = divmod(size, record_length)
+    with open(asc_path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mmap, 'MADV_SEQUENTIAL'):
+        # Blocks are read front to back, so the OS can read ahead while one is decoded
+        mm.madvise(mmap.MADV_SEQUENTIAL)
+    tail = mm[n_records * record_length:] if tail_length else b''
+    if b'\n' in tail:
+        mm.close()
+        return None
+
+    records = np.frombuffer(mm, dtype=np.uint8, count=n_records * record_length).reshape(n_records, record_length)
+    # Cheap spot check; every block is verified again before it is decoded
+    if not (has_terminators(records[:1], terminator) and has_terminators(records[-1:], terminator)):
+        del records
+        mm.close()
+        return None
+    return records, tail, terminator
+
+
+def has_terminators(records: np.ndarray, terminator: bytes) -> bool:
+    """True if every row of a record matrix ends with the line terminator."""
+    expected = np.frombuffer(terminator, dtype=np.uint8)
+    return bool((records[:, -len(expected):] == expected).all())
+
+
+def read_mapped_blocks(mapped, ranges, local_colspecs, names, width, block_rows, start=0, end=None,
+                       with_offsets=False):
+    """
+    Yield blocks of column arrays from a memory-mapped fixed-length file
+    (as (block, byte offset after it) pairs with with_offsets).
+
+    Blocks are views into the map (no read() or per-line copies); only the
+    projected byte ranges are copied while decoding. start/end are byte
+    offsets on record boundaries, as produced by find_shard_offsets.
+
+    Returns None when the range has been read, or the byte offset of the first
+    block whose records are not all record_length bytes long.
+    """
+    records, tail, terminator = mapped
+    n_records, record_length = records.shape
+    size = n_records * record_length + len(tail)
+    end = size if end is None else min(end, size)
+    first_record = start // record_length
+    last_record = min(-(-end // record_length), n_records)
+
+    for i in range(first_record, last_record, block_rows):
+        stop = min(i + block_rows, last_record)
+        matrix = records[i:stop]
+        if not has_terminators(matrix, terminator):
+            return i * record_length
+        block = decode_matrix(matrix[:, :width], ranges, local_colspecs, names)
+        yield (block, stop * record_length) if with_offsets else block
+
+    # An unterminated last record falls inside [start, end) only for the final shard
+    if tail and end > n_records * record_length:
+        block = decode_block([tail], ranges, local_colspecs, names, np.dtype(f'S{width}'))
+        yield (block, size) if with_offsets else block
+    return None
+
+
+# ----------------------------------------------------------------------
+# Overlapped stages: read ahead, decode on processes, write behind
+# ----------------------------------------------------------------------
+_END = object()
+
+
+def prefetch(items, depth: int = PIPELINE_DEPTH):
+    """
+    Iterate over `items` on a background thread, at most `depth` items ahead
+    of the caller (for I/O such as reading and decompressing). Errors are
+    raised in the caller; closing the iterator stops the thread.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((_END, None))
+        except BaseException as e:
+            put((_END, e))
+        finally:
+            if hasattr(items, 'close'):
+                items.close()
+
+    thread = threading.Thread(target=produce, name='prefetch', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if error is not None:
+                raise error
+            if item is _END:
+                return
+            yield item
+    finally:
+        stopped.set()
+        thread.join()
+
+
+class WriteBehind:
+    """
+    Calls func(item) for every put() item, in order, on a background thread
+    at most `depth` items behind the caller (for encoding and writing output).
+    An error in func is raised from the next put() or from close(); the items
+    after it are dropped. Leaving the with-block waits for the queued items.
+    """
+
+    def __init__(self, func, depth: int = PIPELINE_DEPTH):
+        self.items = queue.Queue(maxsize=depth)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, args=(func,), name='write-behind', daemon=True)
+        self.thread.start()
+
+    def _run(self, func):
+        while True:
+            item = self.items.get()
+            if item is _END:
+                return
+            if self.error is None:
+                try:
+                    func(item)
+                except BaseException as e:
+                    self.error = e
+
+    def put(self, item):
+        if self.error is not None:
+            raise self.error
+        self.items.put(item)
+
+    def close(self):
+        self.items.put(_END)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Keep the caller's error; the queued items are still written
+            self.items.put(_END)
+            self.thread.join()
+
+
+def decode_chunk(data: bytes, ranges, local_colspecs, names, width: int) -> Dict[str, np.ndarray]:
+    """
+    Decode a buffer of whole records (see read_chunks) into a block of column
+    arrays: as one record matrix when all of its lines have the same length,
+    line by line otherwise.
+    """
+    record_length = data.find(b'\n') + 1
+    if record_length > width and len(data) % record_length == 0:
+        records = np.frombuffer(data, dtype=np.uint8).reshape(-1, record_length)
+        if has_terminators(records, b'\n'):
+            return decode_matrix(records[:, :width], ranges, local_colspecs, names)
+    return decode_block(io.BytesIO(data).readlines(), ranges, local_colspecs, names, np.dtype(f'S{width}'))
+
+
+def decode_chunks(chunks, ranges, local_colspecs, names, width: int, workers: int = 1):
+    """
+    Yield (block, byte offset) for every (buffer, byte offset) of read_chunks,
+    which runs ahead on a reader thread. With workers > 1 the buffers are
+    decoded on that many processes, at most workers + PIPELINE_DEPTH at a
+    time, and yielded in order.
+    """
+    with contextlib.closing(prefetch(chunks)) as chunks:
+        if workers <= 1:
+            for data, offset in chunks:
+                yield decode_chunk(data, ranges, local_colspecs, names, width), offset
+            return
+
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            try:
+                for data, offset in chunks:
+                    pending.append((pool.submit(decode_chunk, data, ranges, local_colspecs, names, width), offset))
+                    if len(pending) >= workers + PIPELINE_DEPTH:
+                        future, done_offset = pending.popleft()
+                        yield future.result(), done_offset
+                while pending:
+                    future, done_offset = pending.popleft()
+                    yield future.result(), done_offset
+            finally:
+                for future, _ in pending:
+                    future.cancel()
+
+
+# ----------------------------------------------------------------------
+# Columnar (Parquet / Arrow IPC) output
+# ----------------------------------------------------------------------
+def column_arrow_type(sas_type: str, decimals: Optional[int], width: int, dictionary: bool = True):
+    """
+    Pick an Arrow type for a codebook variable.
+
+    Char variables become (dictionary-encoded) strings. Num codes up to 4 digits
+    become the narrowest integer type that holds them; wider Num fields, those
+    with implied decimals and floating-point ones become float64.
+    """
+    if sas_type == 'Char':
+        return pa.dictionary(pa.int32(), pa.string()) if dictionary else pa.string()
+    if decimals == 0 and width <= 4:
+        return pa.int8() if width <= 2 else pa.int16()
+    return pa.float64()
+
+
+def build_arrow_schema(names: List[str], colspecs: List[Tuple[int, int]],
+                       column_types: Dict[str, Tuple[str, Optional[int]]], fmt: str = 'parquet'):
+    """
+    Build the Arrow schema for the output columns from codebook widths and types.
+
+    Parquet dictionary-encodes every column chunk itself, and Char columns are
+    also Arrow dictionaries so readers get them back as categoricals. Arrow IPC
+    files only allow one dictionary per field for the whole file, so Char
+    columns are plain strings there.
+    """
+    fields = []
+    for name, (start, end) in zip(names, colspecs):
+        sas_type, decimals = column_types.get(name, ('Char', 0))
+        metadata = {'sas_type': sas_type, 'width': str(end - start),
+                    'implied_decimals': '' if decimals is None else str(decimals)}
+        arrow_type = column_arrow_type(sas_type, decimals, end - start, dictionary=(fmt == 'parquet'))
+        fields.append(pa.field(name, arrow_type, metadata=metadata))
+    return pa.schema(fields)
+
+
+def to_arrow_array(name: str, values: np.ndarray, field):
+    """Convert one 'S' column array to a typed Arrow array; blanks become nulls."""
+    blank = values == b''
+    if pa.types.is_dictionary(field.type):
+        return pa.array(decode_column(values), type=pa.string(), mask=blank).dictionary_encode()
+    if pa.types.is_string(field.type):
+        return pa.array(decode_column(values), type=pa.string(), mask=blank)
+
+    filled = np.where(blank, b'0', values)
+    dtype = np.int64 if pa.types.is_integer(field.type) else np.float64
+    try:
+        numbers = filled.astype(dtype)
+    except ValueError:
+        # Rare: fall back to element-wise parsing and null out what does not parse
+        numbers, invalid = parse_numbers_slow(filled, dtype)
+        print(f'Warning: {int(invalid.sum())} values in column {name} do not match '
+              f'its codebook type and were set to null.', file=sys.stderr)
+        blank |= invalid
+
+    decimals = field.metadata.get(b'implied_decimals', b'')
+    if decimals not in (b'', b'0'):
+        numbers = numbers / 10 ** int(decimals)
+    return pa.array(numbers, type=field.type, mask=blank)
+
+
+def parse_numbers_slow(values: np.ndarray, dtype):
+    """Parse an 'S' array value by value; returns (numbers, invalid_mask)."""
+    numbers = np.zeros(len(values), dtype=dtype)
+    invalid = np.zeros(len(values), dtype=bool)
+    for i, value in enumerate(values.tolist()):
+        try:
+            numbers[i] = dtype(value.decode('latin-1'))
+        except (ValueError, OverflowError):
+            invalid[i] = True
+    return numbers, invalid
+
+
+def block_to_table(block: Dict[str, np.ndarray], schema):
+    """Convert a block of column arrays to an Arrow table with the given schema."""
+    arrays = [to_arrow_array(field.name, block[field.name], field) for field in schema]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def open_columnar_writer(path: str, fmt: str, schema):
+    """Open a zstd-compressed Parquet or Arrow IPC file writer (both expose write_table/close)."""
+    if fmt == 'parquet':
+        return pq.ParquetWriter(path, schema, compression='zstd', use_dictionary=True)
+    options = pa.ipc.IpcWriteOptions(compression='zstd')
+    return pa.ipc.new_file(path, schema, options=options)
+
+
+def write_columnar_block(writer, fmt: str, block: Dict[str, np.ndarray], schema):
+    """Write one block as a single Parquet row group / Arrow record batch."""
+    table = block_to_table(block, schema)
+    if fmt == 'parquet':
+        writer.write_table(table, row_group_size=max(table.num_rows, 1))
+    else:
+        writer.write_table(table)
+
+
+def copy_columnar_part(writer, fmt: str, part_path: str):
+    """Append the row groups / record batches of a part file to an open writer."""
+    if fmt == 'parquet':
+        part = pq.ParquetFile(part_path)
+        for i in range(part.num_row_groups):
+            table = part.read_row_group(i)
+            writer.write_table(table, row_group_size=max(table.num_rows, 1))
+    else:
+        with pa.memory_map(part_path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                writer.write_batch(reader.get_batch(i))
+
+
+# ----------------------------------------------------------------------
+# Checkpoints (--resume)
+# ----------------------------------------------------------------------
+def layout_fingerprint(names: List[str], colspecs: List[Tuple[int, int]], fmt: str) -> str:
+    """Identifies the output layout (format and columns) a checkpoint was written for."""
+    return hashlib.sha1(json.dumps([fmt, names, [list(c) for c in colspecs]]).encode('utf-8')).hexdigest()
+
+
+PROGRESS_IDENTITY = ('asc', 'layout', 'start', 'end', 'max_rows')
+
+
+def new_progress(asc_path: str, layout: str, start: int = 0, end: Optional[int] = None,
+                 max_rows: Optional[int] = None) -> dict:
+    """Progress of an output part that converts ASC bytes start..end and has nothing written yet."""
+    return {'asc': file_identity(asc_path), 'layout': layout, 'start': start, 'end': end, 'max_rows': max_rows,
+            'offset': start, 'rows': 0, 'bytes': 0, 'done': False}
+
+
+def completed_output(out_path: str, fresh: dict) -> Optional[dict]:
+    """The checkpoint of out_path if it records a finished conversion of the same input that the file still matches."""
+    saved = load_checkpoint(checkpoint_path(out_path))
+    if (saved is None or not saved.get('done') or any(saved.get(key) != fresh[key] for key in PROGRESS_IDENTITY)
+            or not os.path.exists(out_path) or os.path.getsize(out_path) != saved['bytes']):
+        return None
+    return saved
+
+
+def mark_complete(out_path: str, fresh: dict, rows: int):
+    """Checkpoint a finished output, so that resume skips it."""
+    save_checkpoint(checkpoint_path(out_path),
+                    dict(fresh, offset=fresh['asc']['size'], rows=rows, bytes=os.path.getsize(out_path), done=True))
+
+
+def resume_progress(part_path: str, fresh: dict, header: bytes = b'') -> Optional[dict]:
+    """
+    The checkpointed progress of part_path if the part can be continued: the
+    checkpoint is for the same ASC file (size and mtime), layout and byte
+    range, and the part holds at least the checkpointed bytes, starting with
+    `header` and ending on a complete row. The part is truncated to those
+    bytes, dropping a block written after the last checkpoint.
+    Returns None (and says why) when the part has to be written from the start.
+    """
+    saved = load_checkpoint(checkpoint_path(part_path))
+    if saved is None:
+        reason = 'no checkpoint'
+    elif any(saved.get(key) != fresh[key] for key in PROGRESS_IDENTITY):
+        reason = 'its checkpoint is for another ASC file, column list or format'
+    elif not os.path.exists(part_path) or os.path.getsize(part_path) < saved['bytes']:
+        reason = 'it is shorter than its checkpoint'
+    else:
+        with open(part_path, 'rb') as f:
+            head = f.read(len(header))
+            f.seek(max(saved['bytes'] - 1, 0))
+            last = f.read(1)
+        if saved['bytes'] and head != header:
+            reason = 'its header does not match'
+        elif saved['bytes'] > len(header) and last != b'\n':
+            reason = 'its checkpoint does not end on a complete row'
+        else:
+            os.truncate(part_path, saved['bytes'])
+            return saved
+    print(f'Cannot resume {part_path} ({reason}); converting it from the start.')
+    return None
+
+
+def saved_shards(parts_dir: str, asc_path: str, layout: str) -> Optional[List[Tuple[int, int]]]:
+    """Shards of an interrupted --workers run of the same ASC file and layout, or None."""
+    saved = load_checkpoint(os.path.join(parts_dir, SHARDS_FILE))
+    if saved is None or saved.get('asc') != file_identity(asc_path) or saved.get('layout') != layout:
+        return None
+    return [tuple(shard) for shard in saved['shards']]
+
+
 # ----------------------------------------------------------------------
 # Step 3: Optional preview/validation helper
 # ----------------------------------------------------------------------
 def validate_colspecs_with_file(asc_path: str, colspecs: List[Tuple[int, int]], preview: int = 200):
     """Check if the line length roughly matches the maximum column end position."""
     total_width = max(e for _, e in colspecs)
-    with open(asc_path, 'r', encoding='utf-8', errors='ignore') as f:
-        first_line = f.readline().rstrip('\n\r')
+    first = first_record(asc_path)
+    first_line = first.decode('utf-8', errors='ignore').rstrip('\n\r')
+    record_length = len(first)
     print(f"First line length: {len(first_line)}")
+    print(f"Record length (incl. line terminator): {record_length} bytes")
     print(f"Max column end position: {total_width}")
     if len(first_line) < total_width:
         print("Warning: ASC line shorter than expected — file may be truncated or misaligned.")
@@ -158,11 +837,222 @@ def validate_colspecs_with_file(asc_path: str, colspecs: List[Tuple[int, int]],
 # ----------------------------------------------------------------------
 # Step 4: Convert ASC → CSV
 # ----------------------------------------------------------------------
+def find_shard_offsets(asc_path: str, n_shards: int) -> List[Tuple[int, int]]:
+    """
+    Split the ASC file into at most n_shards (start, end) byte ranges.
+
+    Every boundary is moved forward to the start of the next record, so each
+    shard holds whole records and the shards together cover the file in order.
+    """
+    size = os.path.getsize(asc_path)
+    boundaries = [0]
+    with open(asc_path, 'rb') as f:
+        for i in range(1, n_shards):
+            f.seek(max(size * i // n_shards - 1, boundaries[-1]))
+            f.readline()  # finish the record we landed in
+            offset = f.tell()
+            if offset >= size:
+                break
+            if offset > boundaries[-1]:
+                boundaries.append(offset)
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def convert_csv_part(asc_path: str, part_path: str, colspecs, names, chunksize: int,
+                     progress: dict, header: bytes = b'', max_rows: Optional[int] = None, workers: int = 1) -> int:
+    """
+    Convert ASC bytes progress['offset']..progress['end'] into the CSV part
+    file, after the progress['bytes'] it already holds (a new part starts
+    with `header`). Blocks are read and decoded (on `workers` processes for
+    compressed input) while a writer thread encodes the previous ones into
+    the part, which stays open for the whole run; after every block the part
+    is fsynced and its checkpoint saved. Returns the rows the part holds.
+    """
+    if progress['done']:
+        return progress['rows']
+    ckpt = checkpoint_path(part_path)
+    record_length, _ = detect_record_length(asc_path)
+
+    with open(part_path, 'r+b' if progress['bytes'] else 'wb') as f:
+        if not progress['bytes']:
+            f.write(header)
+            sync(f)
+            progress['bytes'] = f.tell()
+            save_checkpoint(ckpt, progress)
+        f.seek(progress['bytes'])
+
+        def write_block(item):
+            block, offset, rows = item
+            with span('write_csv', rows=rows):
+                write_csv_block(f, block, names)
+                sync(f)
+            add_counts('write_csv', nbytes=f.tell() - progress['bytes'])
+            progress.update(offset=offset, rows=progress['rows'] + rows, bytes=f.tell())
+            save_checkpoint(ckpt, progress)
+            print(f'Wrote {progress["rows"]} rows so far...')
+
+        queued = progress['rows']
+        blocks = read_fwf_blocks(asc_path, colspecs, names, block_rows=chunksize, start=progress['offset'],
+                                 end=progress['end'], with_offsets=True, workers=workers)
+        with contextlib.closing(blocks), WriteBehind(write_block) as writer:
+            for block, offset in timed_iter('read_decode', blocks):
+                if max_rows is not None and queued >= max_rows:
+                    break
+                rows = block_length(block)
+                add_counts('read_decode', rows=rows, nbytes=rows * record_length)
+                if max_rows is not None and queued + rows > max_rows:
+                    rows = max_rows - queued
+                    block = {name: values[:rows] for name, values in block.items()}
+                writer.put((block, offset, rows))
+                queued += rows
+
+    progress['done'] = True
+    save_checkpoint(ckpt, progress)
+    return progress['rows']
+
+
+def convert_shard(asc_path: str, part_path: str, colspecs, names,
+                  start: int, end: int, chunksize: int,
+                  fmt: str = 'csv', schema=None, layout: str = '', resume: bool = False) -> int:
+    """
+    Convert one byte range of the ASC file into a part file (header-less for
+    CSV). With resume, a CSV part continues from its checkpoint; a Parquet /
+    Arrow part cannot be appended to once closed, so it is kept if complete
+    and otherwise written again.
+    """
+    fresh = new_progress(asc_path, layout, start, end)
+    if fmt == 'csv':
+        progress = (resume_progress(part_path, fresh) if resume else None) or fresh
+        return convert_csv_part(asc_path, part_path, colspecs, names, chunksize, progress)
+
+    saved = completed_output(part_path, fresh) if resume else None
+    if saved is not None:
+        return saved['rows']
+    written = 0
+    blocks = read_fwf_blocks(asc_path, colspecs, names, block_rows=chunksize, start=start, end=end)
+    writer = open_columnar_writer(part_path, fmt, schema)
+    try:
+        for block in blocks:
+            write_columnar_block(writer, fmt, block, schema)
+            written += block_length(block)
+    finally:
+        writer.close()
+    mark_complete(part_path, fresh, written)
+    return written
+
+
+def convert_parallel(asc_path: str, out_path: str, colspecs, names,
+                     chunksize: int, workers: int, fmt: str = 'csv', schema=None, resume: bool = False) -> int:
+    """
+    Convert the ASC file on a pool of worker processes.
+
+    The file is sharded at record boundaries, every shard is written to its
+    own part file, and the parts are combined in shard order: CSV parts are
+    concatenated after the header, so the result is byte-identical to the
+    serial conversion; Parquet/Arrow parts are appended row group by row group.
+    The parts directory is removed once the output is complete; after a
+    failure it is kept, so that resume can continue every shard.
+    """
+    parts_dir = out_path + '.parts'
+    layout = layout_fingerprint(names, colspecs, fmt)
+    shards = saved_shards(parts_dir, asc_path, layout) if resume else None
+    if shards is not None:
+        print(f'Resuming the {len(shards)} shards in {parts_dir}...')
+    else:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+        os.makedirs(parts_dir)
+        shards = find_shard_offsets(asc_path, workers)
+        save_checkpoint(os.path.join(parts_dir, SHARDS_FILE),
+                        {'asc': file_identity(asc_path), 'layout': layout, 'shards': shards})
+    part_paths = [os.path.join(parts_dir, f'part-{i:05d}.{fmt}') for i in range(len(shards))]
+
+    print(f'Converting {len(shards)} shards on {workers} workers...')
+    written = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(convert_shard, asc_path, part_path, colspecs, names, start, end, chunksize, fmt, schema,
+                        layout, resume)
+            for part_path, (start, end) in zip(part_paths, shards)
+        ]
+        for i, future in enumerate(futures):
+            written += future.result()
+            print(f'Shard {i + 1}/{len(shards)} done, {written} rows so far...')
+
+    if fmt == 'csv':
+        with open(out_path, 'wb') as out:
+            write_csv_header(out, names)
+            for part_path in part_paths:
+                with open(part_path, 'rb') as part:
+                    shutil.copyfileobj(part, out, 16 * 1024 * 1024)
+    else:
+        writer = open_columnar_writer(out_path, fmt, schema)
+        try:
+            for part_path in part_paths:
+                copy_columnar_part(writer, fmt, part_path)
+        finally:
+            writer.close()
+    shutil.rmtree(parts_dir, ignore_errors=True)
+
+    return written
+
+
+def convert_columnar(asc_path: str, out_path: str, colspecs, names, schema,
+                     chunksize: int, max_rows: Optional[int], fmt: str, workers: int = 1) -> int:
+    """
+    Serial conversion to Parquet/Arrow: one row group / record batch per
+    block, converted to Arrow and written on a writer thread.
+    """
+    written = 0
+    record_length, _ = detect_record_length(asc_path)
+    writer = open_columnar_writer(out_path, fmt, schema)
+
+    def write_block(item):
+        block, rows_so_far = item
+        with span(f'write_{fmt}', rows=block_length(block)):
+            write_columnar_block(writer, fmt, block, schema)
+        print(f'Wrote {rows_so_far} rows so far...')
+
+    try:
+        blocks = read_fwf_blocks(asc_path, colspecs, names, block_rows=chunksize, workers=workers)
+        with contextlib.closing(blocks), WriteBehind(write_block) as stage:
+            for block in timed_iter('read_decode', blocks):
+                if max_rows is not None and written >= max_rows:
+                    break
+                rows = block_length(block)
+                add_counts('read_decode', rows=rows, nbytes=rows * record_length)
+                if max_rows is not None and written + rows > max_rows:
+                    rows = max_rows - written
+                    block = {name: values[:rows] for name, values in block.items()}
+                written += rows
+                stage.put((block, written))
+    finally:
+        writer.close()
+    return written
+
+
 def convert(asc_path: str, codebook_path: str, out_csv: str,
-            chunksize: int = 50000, max_rows: int = None):
+            chunksize: int = 50000, max_rows: int = None,
+            columns: Optional[List[str]] = None, workers: int = 1,
+            fmt: str = 'csv', resume: bool = False):
+    """
+    Convert asc_path (plain, .zip, .gz or .zst) to out_csv (or Parquet / Arrow
+    with fmt). With resume, an interrupted CSV conversion continues from its
+    checkpoints instead of starting over (see resume_progress); errors
+    propagate after the checkpoints of the blocks written so far are saved.
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f'Unknown output format {fmt!r}; expected one of {", ".join(OUTPUT_FORMATS)}')
+    if fmt != 'csv' and pa is None:
+        raise ImportError(f'pyarrow is required for --format {fmt}. Install it with: pip install pyarrow')
+
     print(f'Parsing codebook: {codebook_path}')
-    vars_positions = parse_codebook(codebook_path)
-    names, colspecs = build_colspecs_and_names(vars_positions)
+    with span('codebook'):
+        vars_positions = parse_codebook(codebook_path)
+        names, colspecs = build_colspecs_and_names(vars_positions, columns)
+        schema = None
+        if fmt != 'csv':
+            schema = build_arrow_schema(names, colspecs, parse_codebook_types(codebook_path), fmt)
 
     print(f'Found {len(names)} columns (some may overlap).')
     print(f'First 5 columns: {names[:5]}')
@@ -175,41 +1065,53 @@ def convert(asc_path: str, codebook_path: str, out_csv: str,
     if out_dir and not os.path.exists(out_dir):
         os.makedirs(out_dir)
 
-    # Stream-read the file using read_fwf_generator
-
-    row_generator = read_fwf_generator(asc_path, colspecs, names)
-    reader = chunk_generator(row_generator, chunksize)
+    header = csv_header(names)
+    fresh = new_progress(asc_path, layout_fingerprint(names, colspecs, fmt), max_rows=max_rows)
+    if resume and completed_output(out_csv, fresh) is not None:
+        print(f'{out_csv} is already complete; nothing to resume.')
+        return
 
-    written = 0
-    first = True
+    # --max-rows is a quick-test option, so it always uses the serial path.
+    # Compressed input cannot be split into shards; its blocks are decoded on
+    # the worker processes instead.
+    decode_workers = 1
+    if is_compressed(asc_path):
+        decode_workers = workers
+        print(f'Decompressing {asc_path} while converting ({workers} decode process(es))...')
+    elif workers > 1 and max_rows is None:
+        # The shards are timed inside the worker processes, so time the whole step here
+        with span('convert_parallel'):
+            try:
+                written = convert_parallel(asc_path, out_csv, colspecs, names, chunksize, workers, fmt, schema, resume)
+            except Exception as e:
+                print(f'Conversion failed: {e}. The finished blocks of every shard are kept in {out_csv}.parts; '
+                      f'run again with --resume to continue.', file=sys.stderr)
+                raise
+        add_counts('convert_parallel', rows=written, nbytes=os.path.getsize(asc_path))
+        mark_complete(out_csv, fresh, written)
+        print(f'Done. Total rows written: {written} -> {out_csv}')
+        return
 
-    for chunk in reader:
-        if max_rows is not None and written >= max_rows:
-            break
-        if max_rows is not None and written + len(chunk) > max_rows:
-            chunk = chunk.iloc[:(max_rows - written)]
+    if fmt != 'csv':
+        if resume:
+            print(f'A partial {fmt} file cannot be appended to; converting from the start.')
+        written = convert_columnar(asc_path, out_csv, colspecs, names, schema, chunksize, max_rows, fmt,
+                                   decode_workers)
+        mark_complete(out_csv, fresh, written)
+        print(f'Done. Total rows written: {written} -> {out_csv}')
+        return
 
-        # Write to CSV (append after first chunk)
-        try:
-            # Determine mode and open the file
-            mode = 'w' if first else 'a'
-            # Use newline='' as required by the csv module
-            with open(out_csv, mode, newline='', encoding='utf-8') as f:
-                # 'names' is the list of column headers from the codebook
-                writer = csv.DictWriter(f, fieldnames=names)
-                
-                if first:
-                    writer.writeheader() # Write header only once
-                
-                writer.writerows(chunk) # Write all rows in the chunk
-                
-        except Exception as e:
-            print(f"Error writing to CSV: {e}", file=sys.stderr)
-            break # Stop processing if we can't write
-
-        written += len(chunk)
-        first = False
-        print(f'Wrote {written} rows so far...')
+    # Stream-read the file as blocks of column arrays, checkpointing after every block
+    progress = resume_progress(out_csv, fresh, header) if resume else None
+    if progress is not None:
+        print(f'Resuming after row {progress["rows"]} (ASC byte {progress["offset"]}).')
+    try:
+        written = convert_csv_part(asc_path, out_csv, colspecs, names, chunksize, progress or fresh, header, max_rows,
+                                   decode_workers)
+    except Exception as e:
+        print(f'Conversion failed: {e}. The rows written so far are checkpointed; run again with --resume to continue.',
+              file=sys.stderr)
+        raise
 
     print(f'Done. Total rows written: {written} -> {out_csv}')
 
@@ -218,14 +1120,37 @@ def convert(asc_path: str, codebook_path: str, out_csv: str,
 # ----------------------------------------------------------------------
 def main():
     p = argparse.ArgumentParser(description='Convert LLCP fixed-width ASC to CSV using SAS HTML codebook.')
-    p.add_argument('--asc', default='../data/raw/LLCP2022.ASC', help='Path to LLCP2022.ASC fixed-width file')
+    p.add_argument('--asc', default='../data/raw/LLCP2022.ASC',
+                   help='Path to LLCP2022.ASC fixed-width file, or a .zip / .gz / .zst holding it')
     p.add_argument('--codebook', default='../documentation/USCODE22_LLCP_102523.HTML', help='Path to SAS HTML codebook')
-    p.add_argument('--out', default='../data/processed/converted_from_script_new02.csv', help='Output CSV path')
+    p.add_argument('--out', default='../data/processed/converted_from_script_new02.csv', help='Output file path')
+    p.add_argument('--format', choices=OUTPUT_FORMATS, default='csv',
+                   help='Output format: csv (default), parquet or arrow (Arrow IPC file); the latter two need pyarrow')
     p.add_argument('--chunksize', type=int, default=50000, help='Number of lines to process per chunk')
     p.add_argument('--max-rows', type=int, default=None, help='Optional: stop after this many rows (for testing)')
+    projection = p.add_mutually_exclusive_group()
+    projection.add_argument('--columns', default=None, help='Optional: comma-separated SAS variable names to keep')
+    projection.add_argument('--columns-file', default=None,
+                            help='Optional: file with one SAS variable name per line (e.g. ../documentation/var_list_decription.txt)')
+    p.add_argument('--workers', type=int, default=1,
+                   help='Number of worker processes (default: 1; 0 = one per CPU core): shards of a plain '
+                        'ASC file, or decoders of the blocks of a compressed one')
+    p.add_argument('--resume', action='store_true',
+                   help='Continue an interrupted conversion from its checkpoint instead of starting over')
+    add_instrumentation_args(p)
     args = p.parse_args()
 
-    convert(args.asc, args.codebook, args.out, chunksize=args.chunksize, max_rows=args.max_rows)
+    columns = None
+    if args.columns:
+        columns = [c.strip() for c in args.columns.split(',') if c.strip()]
+    elif args.columns_file:
+        columns = load_column_list(args.columns_file)
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+
+    with instrumented_run(args, 'asc_to_csv'):
+        convert(args.asc, args.codebook, args.out, chunksize=args.chunksize, max_rows=args.max_rows,
+                columns=columns, workers=workers, fmt=args.format, resume=args.resume)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark the fixed-width decoders in asc_to_csv.py.
+
+Compares the line-by-line read_fwf_generator (+ chunk_generator + csv.DictWriter)
+with the block-based read_fwf_blocks (+ write_csv_block) on the same ASC file
+and checks that both write byte-identical CSV output.
+
+Usage:
+  python scripts/benchmark_asc_decode.py \
+    --codebook documentation/USCODE22_LLCP_102523.HTML \
+    --rows 20000
+
+  # or against a real file
+  python scripts/benchmark_asc_decode.py --asc data/raw/LLCP2022.ASC --rows 50000
+
+Without --asc a random fixed-width file with --rows records is written to a
+temporary directory, using the record width from the codebook.
+"""
+
+import argparse
+import csv
+import filecmp
+import os
+import random
+import tempfile
+import time
+
+from asc_to_csv import (
+    parse_codebook, build_colspecs_and_names,
+    read_fwf_generator, chunk_generator, read_fwf_blocks,
+    block_length, write_csv_header, write_csv_block,
+)
+
+
+def write_random_asc(path: str, width: int, rows: int, seed: int = 0):
+    """Write `rows` random records of `width` characters (digits and blanks)."""
+    rng = random.Random(seed)
+    alphabet = '0123456789    '
+    with open(path, 'w', newline='\n') as f:
+        for _ in range(rows):
+            f.write(''.join(rng.choice(alphabet) for _ in range(width)))
+            f.write('\n')
+
+
+def run_generator(asc_path, out_csv, colspecs, names, chunksize, max_rows):
+    """Baseline: one dict per row, written with csv.DictWriter."""
+    written = 0
+    with open(out_csv, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=names)
+        writer.writeheader()
+        for chunk in chunk_generator(read_fwf_generator(asc_path, colspecs, names), chunksize):
+            chunk = chunk[:max_rows - written]
+            writer.writerows(chunk)
+            written += len(chunk)
+            if written >= max_rows:
+                break
+    return written
+
+
+def run_blocks(asc_path, out_csv, colspecs, names, chunksize, max_rows):
+    """Vectorized: one dict of column arrays per block."""
+    written = 0
+    with open(out_csv, 'wb') as f:
+        write_csv_header(f, names)
+        for block in read_fwf_blocks(asc_path, colspecs, names, block_rows=chunksize):
+            rows = min(block_length(block), max_rows - written)
+            write_csv_block(f, {name: values[:rows] for name, values in block.items()}, names)
+            written += rows
+            if written >= max_rows:
+                break
+    return written
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    rows = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f'{label:<28} {elapsed:8.3f} s  {rows / elapsed:12,.0f} rows/s')
+    return elapsed
+
+
+def main():
+    p = argparse.ArgumentParser(description='Benchmark ASC fixed-width decoders.')
+    p.add_argument('--asc', default=None, help='Existing ASC file (default: generate a random one)')
+    p.add_argument('--codebook', default='../documentation/USCODE22_LLCP_102523.HTML', help='Path to SAS HTML codebook')
+    p.add_argument('--rows', type=int, default=20000, help='Number of rows to decode')
+    p.add_argument('--chunksize', type=int, default=50000, help='Rows per chunk/block')
+    args = p.parse_args()
+
+    names, colspecs = build_colspecs_and_names(parse_codebook(args.codebook))
+    print(f'{len(names)} columns, record width {max(e for _, e in colspecs)}')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asc_path = args.asc
+        if asc_path is None:
+            asc_path = os.path.join(tmp, 'random.asc')
+            write_random_asc(asc_path, max(e for _, e in colspecs), args.rows)
+
+        baseline_csv = os.path.join(tmp, 'generator.csv')
+        blocks_csv = os.path.join(tmp, 'blocks.csv')
+        t_gen = timed('read_fwf_generator', run_generator, asc_path, baseline_csv, colspecs, names, args.chunksize, args.rows)
+        t_blk = timed('read_fwf_blocks', run_blocks, asc_path, blocks_csv, colspecs, names, args.chunksize, args.rows)
+
+        if not filecmp.cmp(baseline_csv, blocks_csv, shallow=False):
+            raise SystemExit('Decoders wrote different CSV output')
+
+    print(f'Outputs identical. Speed-up: {t_gen / t_blk:.1f}x')
+
+if __name__ == '__main__':
+    main()
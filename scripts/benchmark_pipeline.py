@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of every pipeline stage on a synthetic LLCP file, with a
+history of results per commit.
+
+Usage:
+  python scripts/benchmark_pipeline.py \
+    --codebook documentation/USCODE22_LLCP_102523.HTML \
+    --rows 50000 --repeat 3
+
+  # only some stages, and without recording the run
+  python scripts/benchmark_pipeline.py --stages convert,recode --no-history
+
+A synthetic ASC file of --rows records (synthetic_llcp.py, fixed --seed) is
+converted and recoded once to produce the inputs of the later stages, then
+every stage runs --repeat times:
+- parse_codebook (cold: HTML -> schema; warm: cached schema),
+- read_fwf_generator (the line-by-line baseline) and convert (block decoder;
+  also from a gzip copy of the file, decompressed while streaming),
+- recode,
+- the cleaning of load_data (scan_csv + iter_clean_blocks + building the
+  HealthRecord tuples),
+- load_dimension / load_fact_table and the year swap, against a fresh
+  embedded database (--db sqlite / duckdb, see warehouse.py) or a scratch
+  database on the SQL Server configured in load_data.py (--db mssql
+  --mssql-database NAME; never the warehouse DATABASE_NAME, since every run
+  replaces a year of it).
+The best time of the repeats gives rows/s; one extra run under tracemalloc
+gives the peak memory allocated by the stage. Results are appended to
+--history (JSON lines, one per run, tagged with the git commit) and compared
+with the last run on the same number of rows.
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from asc_to_csv import parse_codebook, build_colspecs_and_names, convert
+from benchmark_asc_decode import run_generator
+from codebook_schema import compile_codebook
+from recode_data import SOURCE_COLUMNS, recode
+from synthetic_llcp import write_synthetic_asc
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HISTORY = os.path.join(SCRIPT_DIR, '..', 'data', 'benchmarks', 'history.jsonl')
+
+STAGES = ('parse_codebook', 'read_fwf_generator', 'convert', 'recode', 'clean', 'load')
+
+
+# ----------------------------------------------------------------------
+# Step 1: Stage runners; each returns the number of rows it processed
+# ----------------------------------------------------------------------
+def bench_parse_codebook_cold(ctx):
+    return len(compile_codebook(ctx['codebook']))
+
+
+def bench_parse_codebook_warm(ctx):
+    return len(parse_codebook(ctx['codebook']))
+
+
+def bench_read_fwf_generator(ctx):
+    names, colspecs = build_colspecs_and_names(parse_codebook(ctx['codebook']))
+    out_csv = os.path.join(ctx['tmp'], 'generator.csv')
+    return run_generator(ctx['asc'], out_csv, colspecs, names, ctx['chunksize'], ctx['rows'])
+
+
+def bench_convert(ctx):
+    convert(ctx['asc'], ctx['codebook'], os.path.join(ctx['tmp'], 'convert_all.csv'), chunksize=ctx['chunksize'])
+    return ctx['rows']
+
+
+def bench_convert_projected(ctx):
+    convert(ctx['asc'], ctx['codebook'], os.path.join(ctx['tmp'], 'convert_projected.csv'),
+            chunksize=ctx['chunksize'], columns=SOURCE_COLUMNS)
+    return ctx['rows']
+
+
+def bench_convert_gzip(ctx):
+    convert(ctx['asc_gz'], ctx['codebook'], os.path.join(ctx['tmp'], 'convert_gzip.csv'), chunksize=ctx['chunksize'])
+    return ctx['rows']
+
+
+def bench_recode(ctx):
+    recode(ctx['converted_csv'], ctx['codebook'], os.path.join(ctx['tmp'], 'recode.csv'), chunksize=ctx['chunksize'])
+    return ctx['rows']
+
+
+def local_maps(distinct_keys):
+    """Key -> ID maps numbered locally, shaped like the ones load_dimension returns."""
+    import load_data
+    maps = {}
+    for name, _, column_map, _, _ in load_data.DIMENSIONS:
+        keys = (tuple(row.get(col) for col in column_map) for row in distinct_keys[name])
+        maps[name] = {key: i for i, key in enumerate(keys, start=1)}
+    return maps
+
+
+def bench_clean(ctx):
+    import load_data
+    rows, imputer, distinct_keys = load_data.scan_csv(ctx['final_csv'])
+    maps = local_maps(distinct_keys)
+    batches = load_data.iter_fact_batches(load_data.iter_clean_blocks(ctx['final_csv'], imputer),
+                                          maps, load_data.RECORD_YEAR, load_data.BATCH_SIZE)
+    for _ in batches:
+        pass
+    return rows
+
+
+def bench_load(ctx):
+    import load_data
+    # Every run starts from an empty embedded database
+    path = None
+    if ctx['db'] != 'mssql':
+        ctx['load_runs'] = ctx.get('load_runs', 0) + 1
+        path = os.path.join(ctx['tmp'], f"warehouse_{ctx['load_runs']}.{ctx['db']}")
+    load_data.use_backend(ctx['db'], path, database=ctx['mssql_database'])
+    conn = load_data.get_db_connection()
+    if conn is None:
+        raise RuntimeError(f"Could not connect to the {ctx['db']} database")
+    try:
+        if not load_data.load_year(conn, ctx['final_csv'], load_data.RECORD_YEAR, force=True, use_key_cache=False):
+            raise RuntimeError('load_year failed')
+    finally:
+        conn.close()
+    return ctx['final_rows']
+
+
+# stage -> [(benchmark name, runner)]
+BENCHMARKS = {
+    'parse_codebook': [('parse_codebook.cold', bench_parse_codebook_cold),
+                       ('parse_codebook.warm', bench_parse_codebook_warm)],
+    'read_fwf_generator': [('read_fwf_generator', bench_read_fwf_generator)],
+    'convert': [('convert.all_columns', bench_convert), ('convert.recode_columns', bench_convert_projected),
+                ('convert.gzip_input', bench_convert_gzip)],
+    'recode': [('recode', bench_recode)],
+    'clean': [('clean', bench_clean)],
+    'load': [('load', bench_load)],
+}
+
+
+# ----------------------------------------------------------------------
+# Step 2: Measure
+# ----------------------------------------------------------------------
+def quiet_call(func, ctx):
+    """Run func(ctx) with the stages' progress prints and log messages discarded."""
+    stdout = sys.stdout
+    with open(os.devnull, 'w') as devnull:
+        sys.stdout = devnull
+        logging.disable(logging.INFO)
+        try:
+            return func(ctx)
+        finally:
+            logging.disable(logging.NOTSET)
+            sys.stdout = stdout
+
+
+def measure(func, ctx, repeat: int) -> dict:
+    """Best-of-`repeat` wall time, then one run under tracemalloc for the peak allocation."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = quiet_call(func, ctx)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        quiet_call(func, ctx)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = min(times)
+    return {
+        'rows': rows,
+        'seconds': best,
+        'rows_per_s': rows / best if best > 0 else None,
+        'peak_alloc_mb': peak / 2**20,
+    }
+
+
+def git_commit():
+    """(short commit hash, working tree has changes) of the repository, or (None, None)."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=SCRIPT_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip() != ''
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+# ----------------------------------------------------------------------
+# Step 3: History
+# ----------------------------------------------------------------------
+def last_comparable_run(history_path: str, rows: int):
+    """Most recent recorded run on the same number of synthetic rows, or None."""
+    if not os.path.exists(history_path):
+        return None
+    previous = None
+    with open(history_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                run = json.loads(line)
+            except ValueError:
+                continue
+            if run.get('rows') == rows:
+                previous = run
+    return previous
+
+
+def append_history(history_path: str, run: dict):
+    out_dir = os.path.dirname(history_path)
+    if out_dir and not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    with open(history_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(run) + '\n')
+
+
+def print_results(results: dict, previous):
+    print(f"{'benchmark':<26} {'seconds':>9} {'rows/s':>12} {'peak MB':>9} {'vs last':>9}")
+    for name, result in results.items():
+        change = ''
+        before = (previous or {}).get('results', {}).get(name)
+        if before and before.get('seconds'):
+            change = f"{(result['seconds'] / before['seconds'] - 1) * 100:+.0f}%"
+        rows_per_s = f"{result['rows_per_s']:,.0f}" if result['rows_per_s'] else '-'
+        print(f"{name:<26} {result['seconds']:>9.3f} {rows_per_s:>12} {result['peak_alloc_mb']:>9.1f} {change:>9}")
+    if previous:
+        print(f"(vs last: time change against {previous.get('commit')} from {previous.get('timestamp')})")
+
+
+def main():
+    p = argparse.ArgumentParser(description='Benchmark the pipeline stages on a synthetic LLCP file.')
+    p.add_argument('--codebook', default='../documentation/USCODE22_LLCP_102523.HTML', help='Path to SAS HTML codebook')
+    p.add_argument('--rows', type=int, default=50000, help='Synthetic ASC records to generate')
+    p.add_argument('--seed', type=int, default=0, help='Seed of the synthetic file')
+    p.add_argument('--chunksize', type=int, default=50000, help='Rows per chunk for convert / recode')
+    p.add_argument('--repeat', type=int, default=3, help='Timed runs per benchmark (the best one counts)')
+    p.add_argument('--stages', default=','.join(STAGES),
+                   help=f'Comma-separated stages to run (available: {", ".join(STAGES)})')
+    p.add_argument('--db', choices=('sqlite', 'duckdb', 'mssql'), default='sqlite',
+                   help='Database of the load stage: a fresh embedded sqlite / duckdb file per run (default: sqlite) '
+                        'or a scratch database on the server configured in load_data.py (mssql)')
+    p.add_argument('--mssql-database', default=None,
+                   help='Scratch database of --db mssql, created from Database/schema.sql; the load stage '
+                        'replaces a year of it on every run')
+    p.add_argument('--history', default=DEFAULT_HISTORY, help='JSON-lines file the results are appended to')
+    p.add_argument('--no-history', action='store_true', help='Do not record this run')
+    args = p.parse_args()
+
+    stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        p.error(f'unknown stage(s): {", ".join(unknown)}')
+    if args.rows < 1 or args.repeat < 1:
+        p.error('--rows and --repeat must be at least 1')
+    if args.db == 'mssql' and 'load' in stages:
+        import load_data
+        if not args.mssql_database:
+            p.error('--db mssql needs --mssql-database: the load stage overwrites a year of that database')
+        if args.mssql_database.lower() == load_data.DATABASE_NAME.lower():
+            p.error(f'--mssql-database must be a scratch database, not the warehouse {load_data.DATABASE_NAME}')
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = {'codebook': args.codebook, 'rows': args.rows, 'chunksize': args.chunksize, 'tmp': tmp, 'db': args.db,
+               'mssql_database': args.mssql_database,
+               'asc': os.path.join(tmp, 'synthetic.asc'),
+               'asc_gz': os.path.join(tmp, 'synthetic.asc.gz'),
+               'converted_csv': os.path.join(tmp, 'converted.csv'),
+               'final_csv': os.path.join(tmp, 'final_data.csv')}
+
+        print(f'Generating {args.rows} synthetic records (seed {args.seed})...')
+        write_synthetic_asc(ctx['asc'], args.codebook, args.rows, args.seed)
+        if 'convert' in stages:
+            with open(ctx['asc'], 'rb') as src, gzip.open(ctx['asc_gz'], 'wb', compresslevel=1) as dst:
+                shutil.copyfileobj(src, dst, 16 * 1024 * 1024)
+        quiet_call(lambda c: convert(c['asc'], c['codebook'], c['converted_csv'],
+                                     chunksize=c['chunksize'], columns=SOURCE_COLUMNS), ctx)
+        final_rows = quiet_call(lambda c: recode(c['converted_csv'], c['codebook'], c['final_csv'],
+                                                 chunksize=c['chunksize']), ctx)
+        ctx['final_rows'] = final_rows
+        print(f'{final_rows} rows survive recoding (input of the clean / load stages).')
+
+        for stage in stages:
+            for name, func in BENCHMARKS[stage]:
+                try:
+                    results[name] = measure(func, ctx, args.repeat)
+                except ImportError as e:
+                    print(f'Skipping {name}: {e}')
+
+    commit, dirty = git_commit()
+    previous = last_comparable_run(args.history, args.rows)
+    print_results(results, previous)
+
+    if not args.no_history:
+        append_history(args.history, {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'commit': commit,
+            'dirty': dirty,
+            'rows': args.rows,
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'results': results,
+        })
+        print(f'Results appended to {args.history}')
+
+
+if __name__ == '__main__':
+    main()
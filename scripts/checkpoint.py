@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Durable progress records for resumable runs (asc_to_csv.py --resume).
+
+A checkpoint is a small JSON file next to the output it describes. It is
+written to a temporary file, fsynced and renamed over the previous one, so a
+crash leaves either the old or the new checkpoint, never a torn one. Callers
+fsync the output before saving its checkpoint, so every byte a checkpoint
+counts is on disk.
+
+(The fact load of load_data.py keeps its checkpoint in the database instead,
+committed in the same transaction as every batch.)
+"""
+
+import json
+import os
+from typing import Optional
+
+CHECKPOINT_SUFFIX = '.checkpoint.json'
+
+
+def checkpoint_path(out_path: str) -> str:
+    """Checkpoint file of an output file."""
+    return out_path + CHECKPOINT_SUFFIX
+
+
+def sync(f):
+    """Flush a file object and make its contents durable."""
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def save_checkpoint(path: str, state: dict):
+    """Atomically replace the checkpoint at path with state."""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+        sync(f)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str) -> Optional[dict]:
+    """The saved state, or None if there is no (readable) checkpoint."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def file_identity(path: str) -> dict:
+    """Path, size and modification time of an input file, to tell whether it changed since a checkpoint."""
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
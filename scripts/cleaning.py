@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Columnar cleaning helpers used by load_data.py: a block of CSV rows is
+cleaned as one NumPy array per column instead of one dict per row.
+
+- RunningStats / GroupedStats: count, mean and variance in a single pass
+  (Welford's update in the chunk-merge form of Chan et al.), so the
+  statistics of chunks, files or worker processes can be merged.
+- Categorical: a column dictionary-encoded as (codes, values). Recoding a
+  category rewrites its few dictionary values, not every row.
+- combine / resolve_keys: the distinct value tuples of several categorical
+  columns, e.g. to map every row's dimension key to its ID with one dict
+  lookup per distinct key.
+- Imputer: mask-and-fill of missing numbers with the column mean, or with the
+  mean of the row's group (e.g. BMI by Sex x AgeCategory).
+- read_csv_columns: streams a CSV as such blocks, with pyarrow's CSV reader
+  (parsing and dictionary encoding in C) when it is installed.
+"""
+
+import csv
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+# pyarrow is optional: without it blocks are read with csv.reader
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+MAX_COMPOSITE_CODE = 2**62
+SAMPLE_BYTES = 1 << 20  # sampled to size pyarrow's blocks in rows
+
+
+# ----------------------------------------------------------------------
+# Step 1: Mergeable single-pass statistics
+# ----------------------------------------------------------------------
+class RunningStats:
+    """Count, mean and sum of squared deviations (m2) of a stream of values."""
+
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def update(self, values: np.ndarray) -> 'RunningStats':
+        """Add a chunk of values (no NaNs)."""
+        if len(values):
+            mean = float(values.mean())
+            self.merge(RunningStats(len(values), mean, float(((values - mean) ** 2).sum())))
+        return self
+
+    def merge(self, other: 'RunningStats') -> 'RunningStats':
+        """Add the values summarized by another RunningStats."""
+        if other.count:
+            count = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / count
+            self.m2 += other.m2 + delta * delta * self.count * other.count / count
+            self.count = count
+        return self
+
+    @property
+    def variance(self) -> float:
+        """Sample variance (0 for fewer than two values)."""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return self.variance ** 0.5
+
+    def __repr__(self):
+        return f'RunningStats(count={self.count}, mean={self.mean:.6g}, std={self.std:.6g})'
+
+
+class GroupedStats:
+    """RunningStats per group key, updated a chunk at a time."""
+
+    def __init__(self):
+        self.groups: Dict[tuple, RunningStats] = {}
+
+    def update(self, keys: Sequence[tuple], inverse: np.ndarray, values: np.ndarray) -> 'GroupedStats':
+        """Add values[i] to the group keys[inverse[i]] (see combine); values must not be NaN."""
+        counts = np.bincount(inverse, minlength=len(keys))
+        sums = np.bincount(inverse, weights=values, minlength=len(keys))
+        present = counts > 0
+        means = np.divide(sums, counts, out=np.zeros(len(keys)), where=present)
+        m2 = np.bincount(inverse, weights=(values - means[inverse]) ** 2, minlength=len(keys))
+        for i in np.flatnonzero(present).tolist():
+            stats = self.groups.get(keys[i])
+            if stats is None:
+                stats = self.groups[keys[i]] = RunningStats()
+            stats.merge(RunningStats(int(counts[i]), float(means[i]), float(m2[i])))
+        return self
+
+    def merge(self, other: 'GroupedStats') -> 'GroupedStats':
+        for key, stats in other.groups.items():
+            self.groups.setdefault(key, RunningStats()).merge(stats)
+        return self
+
+
+# ----------------------------------------------------------------------
+# Step 2: Dictionary-encoded categories
+# ----------------------------------------------------------------------
+class Categorical(NamedTuple):
+    codes: np.ndarray  # per row, index into values
+    values: list       # dictionary of the column (Python objects)
+
+
+def encode(values: np.ndarray) -> Categorical:
+    """Dictionary-encode a column of strings."""
+    dictionary, codes = np.unique(values, return_inverse=True)
+    return Categorical(codes.reshape(-1), dictionary.tolist())
+
+
+def constant(value, rows: int) -> Categorical:
+    """A column holding the same value in every row."""
+    return Categorical(np.zeros(rows, dtype=np.intp), [value])
+
+
+def map_values(column: Categorical, func) -> Categorical:
+    """Apply func to every dictionary value; the row codes are shared."""
+    return Categorical(column.codes, [func(value) for value in column.values])
+
+
+def equals(column: Categorical, value) -> np.ndarray:
+    """Boolean mask of the rows holding value."""
+    return np.array([v == value for v in column.values], dtype=bool)[column.codes]
+
+
+def combine(columns: List[Categorical]) -> Tuple[List[tuple], np.ndarray]:
+    """
+    Distinct value tuples of the given columns (the same length each) and,
+    per row, the index of its tuple in that list.
+    """
+    sizes = [max(len(column.values), 1) for column in columns]
+    if np.prod(sizes, dtype=np.float64) < MAX_COMPOSITE_CODE:
+        # One integer per row (mixed radix), unpacked again for the distinct ones
+        composite = np.zeros(len(columns[0].codes), dtype=np.int64)
+        for column, size in zip(columns, sizes):
+            composite = composite * size + column.codes
+        distinct, inverse = np.unique(composite, return_inverse=True)
+        codes = []
+        for size in reversed(sizes):
+            distinct, column_codes = np.divmod(distinct, size)
+            codes.append(column_codes)
+        codes.reverse()
+    else:
+        distinct, inverse = np.unique(np.stack([column.codes for column in columns], axis=1),
+                                      axis=0, return_inverse=True)
+        codes = list(distinct.T)
+    values = [[column.values[code] for code in column_codes.tolist()]
+              for column, column_codes in zip(columns, codes)]
+    return list(zip(*values)), inverse.reshape(-1)
+
+
+def resolve_keys(columns: List[Categorical], id_map: dict) -> Tuple[np.ndarray, List[tuple]]:
+    """
+    ID of every row's key tuple in id_map, or -1 where the key is unknown.
+    Returns (ids, unknown keys); id_map is consulted once per distinct key.
+    """
+    keys, inverse = combine(columns)
+    lut = np.array([id_map.get(key, -1) for key in keys], dtype=np.int64)
+    return lut[inverse], [key for key, key_id in zip(keys, lut.tolist()) if key_id < 0]
+
+
+# ----------------------------------------------------------------------
+# Step 3: Numbers and imputation
+# ----------------------------------------------------------------------
+def parse_numbers(values: np.ndarray, missing_values: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parse a column of strings to float64. Returns (numbers, missing): missing
+    markers become NaN and are flagged in `missing`; values that are not
+    numbers become NaN without being flagged.
+    """
+    missing = np.isin(values, list(missing_values))
+    values = np.where(missing, 'nan', values)
+    try:
+        return values.astype(np.float64), missing
+    except ValueError:
+        numbers = np.full(len(values), np.nan)
+        for i, value in enumerate(values.tolist()):
+            try:
+                numbers[i] = float(value)
+            except ValueError:
+                pass
+        return numbers, missing
+
+
+class Imputer:
+    """
+    Learns the mean of `columns` in a first pass (observe, chunk by chunk) and
+    fills their missing values in the second one (fill). A column listed in
+    `groups` (column -> group columns) is filled with the mean of the row's
+    group, or with the column mean for groups without observed values.
+    Columns never observed are filled with `default`.
+    """
+
+    def __init__(self, columns: Sequence[str], groups: Dict[str, Sequence[str]] = None, default: float = 0.0):
+        self.groups = {col: list(group_cols) for col, group_cols in (groups or {}).items()}
+        self.stats = {col: RunningStats() for col in columns}
+        self.group_stats = {col: GroupedStats() for col in self.groups}
+        self.default = default
+
+    def observe(self, numbers: Dict[str, np.ndarray], categories: Dict[str, Categorical]):
+        """Add one block: parsed numeric columns and the categorical columns the groups use."""
+        for col, stats in self.stats.items():
+            values = numbers[col]
+            valid = ~np.isnan(values)
+            stats.update(values[valid])
+            if col in self.groups:
+                keys, inverse = combine([categories[group_col] for group_col in self.groups[col]])
+                self.group_stats[col].update(keys, inverse[valid], values[valid])
+
+    def merge(self, other: 'Imputer') -> 'Imputer':
+        for col, stats in other.stats.items():
+            self.stats[col].merge(stats)
+        for col, stats in other.group_stats.items():
+            self.group_stats[col].merge(stats)
+        return self
+
+    def mean(self, col: str) -> float:
+        stats = self.stats.get(col)
+        return stats.mean if stats is not None and stats.count else self.default
+
+    def fill(self, col: str, values: np.ndarray, missing: np.ndarray,
+             categories: Dict[str, Categorical]) -> np.ndarray:
+        """values with the missing rows replaced by the column (or group) mean."""
+        if not missing.any():
+            return values
+        if col not in self.groups:
+            return np.where(missing, self.mean(col), values)
+        keys, inverse = combine([categories[group_col] for group_col in self.groups[col]])
+        groups = self.group_stats[col].groups
+        fallback = self.mean(col)
+        means = np.array([groups[key].mean if key in groups else fallback for key in keys])
+        return np.where(missing, means[inverse], values)
+
+
+# ----------------------------------------------------------------------
+# Step 4: Read a CSV as blocks of columns
+# ----------------------------------------------------------------------
+def read_header(path: str, columns: Sequence[str]) -> List[str]:
+    """Header of the CSV; raises KeyError if any of `columns` is missing."""
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        header = next(csv.reader(f))
+    missing = [col for col in columns if col not in header]
+    if missing:
+        raise KeyError(f'Columns not found in {path}: {", ".join(missing)}')
+    return header
+
+
+def block_bytes(path: str, chunksize: int) -> int:
+    """Bytes holding about `chunksize` rows, from the line length at the start of the file."""
+    with open(path, 'rb') as f:
+        sample = f.read(SAMPLE_BYTES)
+    line_bytes = len(sample) / max(sample.count(b'\n'), 1)
+    return max(int(line_bytes * chunksize), 1 << 16)
+
+
+def read_csv_columns(path: str, numeric_cols: Sequence[str], categorical_cols: Sequence[str], chunksize: int):
+    """
+    Yield ({numeric column: array of str}, {categorical column: Categorical})
+    for about `chunksize` rows at a time. Values are read as text, blanks
+    included, so that the caller decides what is missing.
+    """
+    read_header(path, list(numeric_cols) + list(categorical_cols))
+    if pa is None:
+        from recode_data import read_csv_blocks
+        for block in read_csv_blocks(path, list(numeric_cols) + list(categorical_cols), chunksize):
+            yield ({col: block[col] for col in numeric_cols},
+                   {col: encode(block[col]) for col in categorical_cols})
+        return
+
+    columns = list(numeric_cols) + list(categorical_cols)
+    reader = pa_csv.open_csv(
+        path,
+        read_options=pa_csv.ReadOptions(block_size=block_bytes(path, chunksize)),
+        convert_options=pa_csv.ConvertOptions(include_columns=columns,
+                                              column_types={col: pa.string() for col in columns},
+                                              strings_can_be_null=False))
+    for batch in reader:
+        if not batch.num_rows:
+            continue
+        numbers = {col: batch.column(col).to_numpy(zero_copy_only=False).astype(str) for col in numeric_cols}
+        categories = {}
+        for col in categorical_cols:
+            encoded = batch.column(col).dictionary_encode()
+            categories[col] = Categorical(encoded.indices.to_numpy().astype(np.intp), encoded.dictionary.to_pylist())
+        yield numbers, categories
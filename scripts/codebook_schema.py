@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Compile the SAS HTML codebook (e.g. USCODE22_LLCP_102523.HTML) into a compact
+JSON schema and cache it by the codebook's content hash.
+
+Usage:
+  python scripts/codebook_schema.py \
+    --codebook documentation/USCODE22_LLCP_102523.HTML
+
+The schema lists, for every SAS variable in the codebook:
+- its column positions (1-based, inclusive) and SAS type (Num / Char),
+- implied decimal places (null for "Floating Decimal Point" variables),
+- value labels, labelled value ranges and the label of BLANK,
+- the codes that mean "Don't know / Not sure / Refused / Missing",
+- the unweighted frequency of every value, range and BLANK, which
+  synthetic_llcp.py samples from.
+
+The codebook is read once with a streaming html.parser pass instead of a regex
+over the whole page. Later runs reuse the cached schema as long as the
+codebook file is byte-for-byte the same (asc_to_csv.convert does this
+automatically through load_codebook_schema).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+# Bump when the schema layout or the parsing rules change, so stale cache entries are ignored
+SCHEMA_VERSION = 3
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'cache', 'codebook')
+
+READ_SIZE = 64 * 1024
+
+MISSING_LABEL = re.compile(r"don.?t\s+know|not\s+sure|refused|missing", re.I)
+IMPLIED_DECIMALS = re.compile(r'([0-9]+)\s+implied\s+decimal', re.I)
+FLOATING_POINT = re.compile(r'Floating\s+Decimal\s+Point', re.I)
+VALUE_RANGE = re.compile(r'^([0-9]+)\s*-\s*([0-9]+)$')
+# Skip instructions and coding notes that the report runs into the label text,
+# e.g. "NoGo to Section 07.06 CHCSCNC1" or "MaleCode=1 if LANDSEX1=1 ..."
+LABEL_TRAILER = re.compile(r'(?:Go to\b|Code=).*$', re.I)
+
+
+# ----------------------------------------------------------------------
+# Step 1: Stream the codebook through html.parser
+# ----------------------------------------------------------------------
+class CodebookParser(HTMLParser):
+    """
+    Collects one entry per SAS variable from the codebook tables.
+
+    Every variable is one report table: a header cell (colspan=5) with
+    "Key: value" lines (Label, Column, Type of Variable, SAS Variable Name, ...)
+    followed by body rows of Value / Value Label / Frequency / ... cells.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.variables: List[dict] = []
+        self._current: Optional[dict] = None
+        self._cell: Optional[List[str]] = None
+        self._cell_is_header = False
+        self._row: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'tr':
+            self._row = []
+        elif tag == 'td':
+            self._cell = []
+            self._cell_is_header = dict(attrs).get('colspan') == '5'
+        elif tag == 'br' and self._cell is not None:
+            self._cell.append('\n')
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == 'td' and self._cell is not None:
+            text = ''.join(self._cell).replace('\xa0', ' ')
+            self._cell = None
+            if self._cell_is_header:
+                self._start_variable(text)
+            else:
+                self._row.append(text)
+        elif tag == 'tr':
+            if self._current is not None and len(self._row) >= 2:
+                frequency = self._row[2] if len(self._row) > 2 else ''
+                self._current['rows'].append((self._row[0].strip(), self._row[1], frequency))
+            self._row = []
+
+    def _start_variable(self, text: str):
+        fields = {}
+        for line in text.split('\n'):
+            key, sep, value = line.partition(':')
+            if sep:
+                fields[key.strip()] = value.strip()
+        if 'SAS Variable Name' not in fields or 'Column' not in fields:
+            self._current = None
+            return
+        self._current = {'fields': fields, 'rows': []}
+        self.variables.append(self._current)
+
+
+def parse_frequency(text: str) -> int:
+    """Frequency cell ("445,111") to int; 0 if the cell is empty or not a number."""
+    text = text.replace(',', '').strip()
+    return int(text) if text.isdigit() else 0
+
+
+def build_variable(raw: dict) -> dict:
+    """Turn the header fields and value rows of one table into a schema entry."""
+    fields = raw['fields']
+    start, _, end = fields['Column'].partition('-')
+    entry = {
+        'name': fields['SAS Variable Name'],
+        'start': int(start),
+        'end': int(end) if end else int(start),
+        'type': fields.get('Type of Variable', 'Num'),
+        'label': fields.get('Label', ''),
+        'section': fields.get('Section Name', ''),
+        'implied_decimals': 0,
+        'values': {},
+        'ranges': [],
+        'missing_codes': [],
+        'blank': None,
+        # Unweighted frequencies: per value code, per entry of 'ranges', of BLANK
+        'value_counts': {},
+        'range_counts': [],
+        'blank_count': 0,
+    }
+
+    range_text = []
+    all_text = []
+    for value, label_cell, frequency in raw['rows']:
+        label = LABEL_TRAILER.sub('', label_cell.partition('\n')[0]).strip()
+        all_text.append(label_cell)
+        count = parse_frequency(frequency)
+        match = VALUE_RANGE.match(value)
+        if value.isdigit():
+            code = int(value)
+            entry['values'][str(code)] = label
+            entry['value_counts'][str(code)] = count
+            if MISSING_LABEL.search(label):
+                entry['missing_codes'].append(code)
+        elif match:
+            entry['ranges'].append([int(match.group(1)), int(match.group(2)), label])
+            entry['range_counts'].append(count)
+            range_text.append(label_cell)
+        elif value == 'BLANK':
+            entry['blank'] = label
+            entry['blank_count'] = count
+
+    # Only value ranges describe the variable's own scale; coded variables
+    # such as _BMI5CAT mention other variables' implied decimals in their notes.
+    decimals = IMPLIED_DECIMALS.search('\n'.join(range_text))
+    if decimals:
+        entry['implied_decimals'] = int(decimals.group(1))
+    elif FLOATING_POINT.search('\n'.join(all_text)):
+        entry['implied_decimals'] = None
+    return entry
+
+
+def compile_codebook(codebook_path: str) -> List[dict]:
+    """Parse the codebook in one streaming pass and return the schema entries."""
+    parser = CodebookParser()
+    with open(codebook_path, 'r', encoding='utf-8', errors='ignore') as f:
+        while True:
+            chunk = f.read(READ_SIZE)
+            if not chunk:
+                break
+            parser.feed(chunk)
+    parser.close()
+
+    variables = [build_variable(raw) for raw in parser.variables]
+    if not variables:
+        raise RuntimeError(f'No column/variable matches found in {codebook_path}.')
+    return variables
+
+
+# ----------------------------------------------------------------------
+# Step 2: Cache compiled schemas by codebook content hash
+# ----------------------------------------------------------------------
+def codebook_hash(codebook_path: str) -> str:
+    """SHA-256 of the codebook file contents."""
+    digest = hashlib.sha256()
+    with open(codebook_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_codebook_schema(codebook_path: str, cache_dir: str = None) -> dict:
+    """
+    Return the compiled schema for a codebook, compiling it on first use.
+
+    The cache entry is keyed by the codebook's SHA-256, so an edited or
+    different codebook is recompiled and an unchanged one is never re-parsed.
+    """
+    cache_dir = cache_dir or DEFAULT_CACHE_DIR
+    sha = codebook_hash(codebook_path)
+    cache_path = os.path.join(cache_dir, f'{sha}.json')
+
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            schema = json.load(f)
+        if schema.get('version') == SCHEMA_VERSION and schema.get('codebook_sha256') == sha:
+            return schema
+    except (FileNotFoundError, ValueError):
+        pass
+
+    schema = {
+        'version': SCHEMA_VERSION,
+        'codebook_sha256': sha,
+        'codebook': os.path.basename(codebook_path),
+        'variables': compile_codebook(codebook_path),
+    }
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(schema, f, separators=(',', ':'))
+    os.replace(tmp_path, cache_path)  # atomic, so parallel runs never read half a file
+    return schema
+
+
+def variables_by_name(schema: dict) -> Dict[str, dict]:
+    """Index the schema entries by SAS variable name."""
+    return {var['name']: var for var in schema['variables']}
+
+
+# ----------------------------------------------------------------------
+# Step 3: CLI entry point
+# ----------------------------------------------------------------------
+def main():
+    p = argparse.ArgumentParser(description='Compile the SAS HTML codebook into a cached JSON schema.')
+    p.add_argument('--codebook', default='../documentation/USCODE22_LLCP_102523.HTML', help='Path to SAS HTML codebook')
+    p.add_argument('--cache-dir', default=None, help=f'Schema cache directory (default: {DEFAULT_CACHE_DIR})')
+    p.add_argument('--out', default=None, help='Optional: also write the schema to this path')
+    args = p.parse_args()
+
+    schema = load_codebook_schema(args.codebook, args.cache_dir)
+    print(f"Codebook {schema['codebook']} ({schema['codebook_sha256'][:12]}): "
+          f"{len(schema['variables'])} variables")
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(schema, f, indent=1)
+        print(f'Schema written to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Run the whole BRFSS pipeline (ASC -> CSV -> final_data -> HeartDiseaseDB) for
+one or more survey years.
+
+Usage:
+  python scripts/etl_main.py \
+    --year 2022 data/raw/LLCP2022.ASC documentation/USCODE22_LLCP_102523.HTML \
+    --year 2024 data/raw/LLCP2024ASC.zip documentation/USCODE24_LLCP_<date>.HTML \
+    --workers 4 --connections 4
+
+Every year is a chain of three tasks: convert -> recode -> load.
+- convert (asc_to_csv.py) and recode (recode_data.py) are CPU-bound and run
+  in a pool of --workers processes, so independent years convert side by side.
+- load (load_data.py) tasks run one at a time, because every year upserts the
+  same dimension tables and stages its facts in the same staging table. Each
+  load uses up to --connections parallel connections. Other years keep
+  converting while one year loads.
+A failed task skips the tasks that depend on it; the other years continue.
+With --resume, an interrupted conversion continues from its checkpoint (a
+finished one is skipped) and an interrupted load after its last committed
+batch; recode always runs again.
+Every task's run time is a span of the run report (--report, --prometheus);
+the stages inside a task run in a worker process and are not broken down here.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Callable, List, NamedTuple, Tuple
+
+from asc_to_csv import convert
+from instrumentation import add_instrumentation_args, instrumented_run, record
+from recode_data import SOURCE_COLUMNS, recode
+from warehouse import BACKENDS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class Task(NamedTuple):
+    name: str
+    func: Callable
+    args: tuple
+    deps: Tuple[str, ...]
+    lane: str  # 'cpu' (process pool) or 'db' (one at a time)
+
+
+# ----------------------------------------------------------------------
+# Step 1: Per-year tasks
+# ----------------------------------------------------------------------
+def run_convert(asc_path: str, codebook_path: str, out_csv: str, chunksize: int, resume: bool = False):
+    """ASC -> CSV with only the columns recode_data.py needs."""
+    convert(asc_path, codebook_path, out_csv, chunksize=chunksize, columns=SOURCE_COLUMNS, resume=resume)
+
+
+def run_recode(converted_csv: str, codebook_path: str, final_csv: str, chunksize: int):
+    """Converted CSV -> labelled final_data CSV."""
+    recode(converted_csv, codebook_path, final_csv, chunksize=chunksize)
+
+
+def run_load(final_csv: str, record_year: int, connections: int, force: bool,
+             backend: str = 'mssql', db_path: str = None, resume: bool = False) -> bool:
+    """Load one year into HeartDiseaseDB; returns False if the year could not be loaded."""
+    # Imported here so convert / recode runs do not need a database driver
+    import load_data
+
+    load_data.use_backend(backend, db_path)
+    conn = load_data.get_db_connection()
+    if conn is None:
+        return False
+    try:
+        return load_data.load_year(conn, final_csv, record_year, force=force, workers=connections, resume=resume)
+    finally:
+        conn.close()
+
+
+def build_tasks(years: List[Tuple[int, str, str]], out_dir: str, chunksize: int,
+                connections: int, force: bool, skip_load: bool,
+                backend: str = 'mssql', db_path: str = None, resume: bool = False) -> List[Task]:
+    """The convert -> recode -> load chain of every (year, ASC, codebook) input."""
+    tasks = []
+    for year, asc_path, codebook_path in years:
+        converted_csv = os.path.join(out_dir, f'LLCP{year}.csv')
+        final_csv = os.path.join(out_dir, f'final_data_{year}.csv')
+        tasks.append(Task(f'convert {year}', run_convert, (asc_path, codebook_path, converted_csv, chunksize, resume),
+                          (), 'cpu'))
+        tasks.append(Task(f'recode {year}', run_recode, (converted_csv, codebook_path, final_csv, chunksize),
+                          (f'convert {year}',), 'cpu'))
+        if not skip_load:
+            tasks.append(Task(f'load {year}', run_load, (final_csv, year, connections, force, backend, db_path, resume),
+                              (f'recode {year}',), 'db'))
+    return tasks
+
+
+# ----------------------------------------------------------------------
+# Step 2: Run the task graph
+# ----------------------------------------------------------------------
+def timed_call(func: Callable, args: tuple):
+    """Run func(*args) in the worker; returns (result, seconds spent running it)."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run_tasks(tasks: List[Task], workers: int) -> dict:
+    """
+    Run tasks as soon as their dependencies have finished, 'cpu' tasks on a
+    pool of `workers` processes and 'db' tasks one at a time.
+    Returns {task name: 'done' | 'failed' | 'skipped'}.
+    """
+    status = {}
+    pending = {task.name: task for task in tasks}
+    running = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as cpu, ThreadPoolExecutor(max_workers=1) as db:
+        lanes = {'cpu': cpu, 'db': db}
+        while pending or running:
+            for name, task in list(pending.items()):
+                if any(status.get(dep) in ('failed', 'skipped') for dep in task.deps):
+                    logging.warning(f'Skipping {name}: a task it depends on did not finish.')
+                    status[name] = 'skipped'
+                    del pending[name]
+                elif all(status.get(dep) == 'done' for dep in task.deps):
+                    logging.info(f'Scheduling {name}...')
+                    running[lanes[task.lane].submit(timed_call, task.func, task.args)] = task
+                    del pending[name]
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                task = running.pop(future)
+                try:
+                    result, elapsed = future.result()
+                except Exception as e:
+                    logging.error(f'{task.name} failed: {e}')
+                    status[task.name] = 'failed'
+                    continue
+                ok = result is not False
+                record(task.name, elapsed)
+                status[task.name] = 'done' if ok else 'failed'
+                if ok:
+                    logging.info(f'Finished {task.name} in {elapsed:.1f}s.')
+                else:
+                    logging.error(f'{task.name} failed after {elapsed:.1f}s.')
+    return status
+
+
+def main():
+    p = argparse.ArgumentParser(description='Convert, recode and load one or more BRFSS survey years.')
+    p.add_argument('--year', nargs=3, action='append', required=True, metavar=('YEAR', 'ASC', 'CODEBOOK'),
+                   help='Survey year, its LLCP .ASC file (or the .zip / .gz / .zst holding it) and its SAS HTML '
+                        'codebook (repeat for more years)')
+    p.add_argument('--out-dir', default='../data/processed', help='Directory for the converted and final CSVs')
+    p.add_argument('--chunksize', type=int, default=50000, help='Rows per chunk for convert / recode')
+    p.add_argument('--workers', type=int, default=0,
+                   help='Processes for convert / recode tasks (default: 0 = one per CPU core)')
+    p.add_argument('--connections', type=int, default=4, help='Database connections per load')
+    p.add_argument('--force', action='store_true', help='Reload years even if their data is unchanged')
+    p.add_argument('--skip-load', action='store_true', help='Only convert and recode')
+    p.add_argument('--resume', action='store_true', help='Continue interrupted conversions and loads from their checkpoints')
+    p.add_argument('--backend', choices=list(BACKENDS), default='mssql',
+                   help='Warehouse to load into (see warehouse.py); duckdb / sqlite need no server')
+    p.add_argument('--db-path', default=None, help='Database file of the duckdb / sqlite backends')
+    add_instrumentation_args(p)
+    args = p.parse_args()
+
+    years = []
+    for year, asc_path, codebook_path in args.year:
+        if not year.isdigit():
+            p.error(f'--year expects YEAR ASC CODEBOOK, got {year!r} as the year')
+        years.append((int(year), asc_path, codebook_path))
+    if len({year for year, _, _ in years}) != len(years):
+        p.error('each year may only be given once')
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+
+    tasks = build_tasks(years, args.out_dir, args.chunksize, args.connections, args.force, args.skip_load,
+                        args.backend, args.db_path, args.resume)
+    with instrumented_run(args, 'etl_main', log=logging.info):
+        status = run_tasks(tasks, workers)
+
+    for task in tasks:
+        logging.info(f'{task.name:<14} {status[task.name]}')
+    if any(state != 'done' for state in status.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
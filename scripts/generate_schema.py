@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Generate the HeartDiseaseDB star-schema DDL from the table definitions that
+load_data.py loads into (DIMENSIONS, FACT_COLUMNS, AGGREGATE_TABLES, ...).
+
+Usage:
+  python scripts/generate_schema.py --out Database/schema.sql \
+    --first-year 2020 --last-year 2030
+
+The generated script (SQL Server 2016+):
+- creates every dimension with an INT IDENTITY key and a UNIQUE index on its
+  natural key (the columns load_dimension matches on),
+- creates HealthRecord as a clustered columnstore table partitioned by
+  RecordYear, with narrow column types (TINYINT flag, DECIMAL measures,
+  SMALLINT year),
+- creates HealthRecordStage with exactly the same shape, so load_data.py can
+  switch a staged year into HealthRecord instead of copying its rows,
+- creates the summary tables, the load manifest and the batch checkpoint of
+  resumable fact loads.
+Every object is created only if it does not exist yet.
+
+With --dialect duckdb / sqlite it writes the same tables for the embedded
+warehouse backends instead (see warehouse.py, which runs these statements
+itself): sequence / INTEGER PRIMARY KEY ids, no partitioning, no foreign keys.
+"""
+
+import argparse
+import os
+
+from typing import List
+
+from load_data import (
+    DATABASE_NAME, DIMENSIONS, FACT_COLUMNS, STAGE_TABLE, MANIFEST_TABLE, CHECKPOINT_TABLE,
+    AGGREGATE_TABLES, AGGREGATE_MEASURES, PARTITION_FUNCTION, PARTITION_SCHEME,
+)
+
+FACT_TABLE = 'HealthRecord'
+DIALECTS = ('mssql', 'duckdb', 'sqlite')
+
+# SQL type of every column load_data.py writes; label widths fit the
+# longest label recode_data.py produces for the column.
+COLUMN_TYPES = {
+    # Dimensions
+    'Sex': 'VARCHAR(10)',
+    'AgeCategory': 'VARCHAR(20)',
+    'RaceEthnicityCategory': 'VARCHAR(40)',
+    'StateName': 'VARCHAR(40)',
+    'LastCheckupTime': 'VARCHAR(80)',
+    'CheckupRecency': 'TINYINT',
+    'PhysicalActivities': 'VARCHAR(3)',
+    'ActivityLevel': 'VARCHAR(10)',
+    'SmokerStatus': 'VARCHAR(50)',
+    'ECigaretteUsage': 'VARCHAR(50)',
+    'AlcoholDrinkers': 'VARCHAR(3)',
+    'SleepQuality': 'VARCHAR(10)',
+    'HadDiabetes': 'VARCHAR(3)',
+    'HadArthritis': 'VARCHAR(3)',
+    'HadCOPD': 'VARCHAR(3)',
+    'HadKidneyDisease': 'VARCHAR(3)',
+    'HadDepressiveDisorder': 'VARCHAR(3)',
+    'HadCancer': 'VARCHAR(3)',
+    'HadSkinCancer': 'VARCHAR(3)',
+    # HealthRecord
+    'HeartDiseaseFlag': 'TINYINT',
+    'PhysicalHealthDays': 'DECIMAL(4, 1)',  # 0-30
+    'MentalHealthDays': 'DECIMAL(4, 1)',    # 0-30
+    'SleepHours': 'DECIMAL(4, 2)',          # 1-24, mean-filled
+    'HeightInMeters': 'DECIMAL(3, 2)',      # 0.91-2.41
+    'WeightInKilograms': 'DECIMAL(5, 2)',   # 22.68-292.57
+    'BMI': 'DECIMAL(4, 2)',                 # 12.00-99.99
+    'RecordYear': 'SMALLINT',
+}
+
+# Columns that exist in the database but are not written by the loader
+EXTRA_COLUMNS = {
+    'DimState': ['Region VARCHAR(50) NULL'],
+}
+
+# Fact columns that are always present
+FACT_NOT_NULL = {'HeartDiseaseFlag', 'RecordYear'}
+
+
+# ----------------------------------------------------------------------
+# Step 1: DDL for each kind of table
+# ----------------------------------------------------------------------
+def if_missing(table_name: str, statements: str) -> str:
+    """Wrap statements so they only run when dbo.table_name does not exist."""
+    return (
+        f"IF OBJECT_ID(N'dbo.{table_name}', N'U') IS NULL\n"
+        f"BEGIN\n{statements}\nEND\nGO\n"
+    )
+
+
+def dimension_ddl(table_name: str, column_map: dict, unique_cols: list, id_column_name: str) -> str:
+    """Dimension table with an IDENTITY key and a unique index on its natural key."""
+    columns = [f"    {id_column_name} INT IDENTITY(1,1) NOT NULL"]
+    columns += [f"    {col} {COLUMN_TYPES[col]} NOT NULL" for col in column_map.values()]
+    columns += [f"    {col}" for col in EXTRA_COLUMNS.get(table_name, [])]
+    columns.append(f"    CONSTRAINT PK_{table_name} PRIMARY KEY CLUSTERED ({id_column_name})")
+    return if_missing(table_name, (
+        f"CREATE TABLE dbo.{table_name} (\n" + ',\n'.join(columns) + "\n);\n"
+        f"CREATE UNIQUE NONCLUSTERED INDEX UX_{table_name}_NaturalKey\n"
+        f"    ON dbo.{table_name} ({', '.join(unique_cols)});"
+    ))
+
+
+def partition_ddl(first_year: int, last_year: int) -> str:
+    """
+    RecordYear partition function and scheme. With RANGE RIGHT, boundaries
+    first_year..last_year + 1 give every year from first_year to last_year a
+    partition of its own; earlier and later years share the two edge
+    partitions (load_data.py copies those instead of switching them).
+    """
+    years = ', '.join(str(year) for year in range(first_year, last_year + 2))
+    return (
+        f"IF NOT EXISTS (SELECT 1 FROM sys.partition_functions WHERE name = N'{PARTITION_FUNCTION}')\n"
+        f"    CREATE PARTITION FUNCTION {PARTITION_FUNCTION} ({COLUMN_TYPES['RecordYear']})\n"
+        f"    AS RANGE RIGHT FOR VALUES ({years});\n"
+        f"GO\n"
+        f"IF NOT EXISTS (SELECT 1 FROM sys.partition_schemes WHERE name = N'{PARTITION_SCHEME}')\n"
+        f"    CREATE PARTITION SCHEME {PARTITION_SCHEME}\n"
+        f"    AS PARTITION {PARTITION_FUNCTION} ALL TO ([PRIMARY]);\n"
+        f"GO\n"
+    )
+
+
+def fact_ddl(table_name: str) -> str:
+    """
+    Clustered columnstore fact table partitioned by RecordYear.
+    HealthRecord and HealthRecordStage share this definition (indexes and
+    foreign keys included), which ALTER TABLE ... SWITCH requires.
+    """
+    dimension_ids = {id_column_name: dim_table for _, dim_table, _, _, id_column_name in DIMENSIONS}
+    on_scheme = f"ON {PARTITION_SCHEME} (RecordYear)"
+
+    # Same column names in both tables, so the identity column is HealthRecordID in the stage too
+    columns = [f"    {FACT_TABLE}ID INT IDENTITY(1,1) NOT NULL"]
+    for col in FACT_COLUMNS:
+        sql_type = 'INT' if col in dimension_ids else COLUMN_TYPES[col]
+        nullable = 'NOT NULL' if col in dimension_ids or col in FACT_NOT_NULL else 'NULL'
+        columns.append(f"    {col} {sql_type} {nullable}")
+    # The partitioning column has to be part of the (aligned) primary key. HealthRecordID
+    # alone is still unique: load_data.truncate_stage reseeds the stage above HealthRecord.
+    columns.append(f"    CONSTRAINT PK_{table_name} PRIMARY KEY NONCLUSTERED ({FACT_TABLE}ID, RecordYear) {on_scheme}")
+    for col, dim_table in dimension_ids.items():
+        columns.append(f"    CONSTRAINT FK_{table_name}_{dim_table} FOREIGN KEY ({col}) REFERENCES dbo.{dim_table} ({col})")
+
+    return if_missing(table_name, (
+        f"CREATE TABLE dbo.{table_name} (\n" + ',\n'.join(columns) + f"\n) {on_scheme};\n"
+        f"CREATE CLUSTERED COLUMNSTORE INDEX CCI_{table_name}\n"
+        f"    ON dbo.{table_name} {on_scheme};"
+    ))
+
+
+def aggregate_ddl(table_name: str, group_cols: list) -> str:
+    """Summary table keyed by RecordYear and the grouped fact columns."""
+    columns = [f"    RecordYear {COLUMN_TYPES['RecordYear']} NOT NULL"]
+    columns += [f"    {col} INT NOT NULL" for col in group_cols]
+    measure_types = {'RecordCount': 'INT', 'HeartDiseaseCount': 'INT', 'BMISum': 'FLOAT', 'SleepHoursSum': 'FLOAT'}
+    columns += [f"    {col} {measure_types[col]} NOT NULL" for col in AGGREGATE_MEASURES]
+    columns.append("    HeartDiseasePrevalence AS CAST(HeartDiseaseCount AS FLOAT) / NULLIF(RecordCount, 0)")
+    columns.append(f"    CONSTRAINT PK_{table_name} PRIMARY KEY CLUSTERED ({', '.join(['RecordYear'] + group_cols)})")
+    return if_missing(table_name, f"CREATE TABLE dbo.{table_name} (\n" + ',\n'.join(columns) + "\n);")
+
+
+def manifest_ddl() -> str:
+    """One row per loaded RecordYear with the hash of the file it came from."""
+    return if_missing(MANIFEST_TABLE, (
+        f"CREATE TABLE dbo.{MANIFEST_TABLE} (\n"
+        f"    RecordYear {COLUMN_TYPES['RecordYear']} NOT NULL PRIMARY KEY,\n"
+        f"    SourceFile NVARCHAR(400) NOT NULL,\n"
+        f"    ContentHash CHAR(64) NOT NULL,\n"
+        f"    RowsLoaded INT NOT NULL,\n"
+        f"    LoadedAt DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME()\n"
+        f");"
+    ))
+
+
+def checkpoint_ddl() -> str:
+    """One row per fact batch committed to the staging table (load_data.py --resume)."""
+    return if_missing(CHECKPOINT_TABLE, (
+        f"CREATE TABLE dbo.{CHECKPOINT_TABLE} (\n"
+        f"    RecordYear {COLUMN_TYPES['RecordYear']} NOT NULL,\n"
+        f"    BatchNo INT NOT NULL,\n"
+        f"    LoadFingerprint CHAR(64) NOT NULL,\n"
+        f"    RowsLoaded INT NOT NULL,\n"
+        f"    CommittedAt DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME(),\n"
+        f"    CONSTRAINT PK_{CHECKPOINT_TABLE} PRIMARY KEY CLUSTERED (RecordYear, BatchNo)\n"
+        f");"
+    ))
+
+
+def load_table_batches() -> List[str]:
+    """
+    The summary, manifest and checkpoint DDL as separate batches (without GO,
+    which only sqlcmd / SSMS understand), for ensure_load_tables in
+    load_data.py to run against an existing database.
+    """
+    script = ''.join([aggregate_ddl(table_name, group_cols) for table_name, group_cols in AGGREGATE_TABLES]
+                     + [manifest_ddl(), checkpoint_ddl()])
+    return [batch for batch in script.split('\nGO\n') if batch.strip()]
+
+
+# ----------------------------------------------------------------------
+# Step 2: Whole schema script
+# ----------------------------------------------------------------------
+def generate_schema(first_year: int, last_year: int, database_name: str = DATABASE_NAME) -> str:
+    """Return the full DDL script for the star schema."""
+    parts = [
+        "-- HeartDiseaseDB star schema.\n"
+        "-- Generated by scripts/generate_schema.py from the table definitions in\n"
+        "-- scripts/load_data.py; edit those and regenerate instead of editing this file.\n",
+        f"USE {database_name};\nGO\n",
+        "-- Dimensions\n",
+    ]
+    for _, table_name, column_map, unique_cols, id_column_name in DIMENSIONS:
+        parts.append(dimension_ddl(table_name, column_map, unique_cols, id_column_name))
+
+    parts.append(f"-- Facts: one partition per RecordYear ({first_year}-{last_year})\n")
+    parts.append(partition_ddl(first_year, last_year))
+    parts.append(fact_ddl(FACT_TABLE))
+    parts.append(fact_ddl(STAGE_TABLE))
+
+    parts.append("-- Summary tables and load bookkeeping\n")
+    for table_name, group_cols in AGGREGATE_TABLES:
+        parts.append(aggregate_ddl(table_name, group_cols))
+    parts.append(manifest_ddl())
+    parts.append(checkpoint_ddl())
+    return '\n'.join(parts)
+
+
+# ----------------------------------------------------------------------
+# Step 3: Embedded (DuckDB / SQLite) schema
+# ----------------------------------------------------------------------
+def embedded_id_column(dialect: str, table_name: str, id_column_name: str, primary_key: bool = True):
+    """
+    (statements to run first, column definition) of an auto-numbered ID.
+    SQLite numbers an INTEGER PRIMARY KEY itself; DuckDB takes the next value
+    of a per-table sequence. DuckDB fact tables get no primary key, since its
+    index would slow down every append.
+    """
+    if dialect == 'sqlite':
+        return [], f"    {id_column_name} INTEGER PRIMARY KEY"
+    sequence = f"seq_{table_name}"
+    key = ' PRIMARY KEY' if primary_key else ''
+    return ([f"CREATE SEQUENCE IF NOT EXISTS {sequence}"],
+            f"    {id_column_name} {'INTEGER' if primary_key else 'BIGINT'}{key} DEFAULT nextval('{sequence}')")
+
+
+def embedded_schema(dialect: str) -> List[str]:
+    """CREATE ... IF NOT EXISTS statements of every table, for --dialect duckdb / sqlite."""
+    statements = []
+    for _, table_name, column_map, unique_cols, id_column_name in DIMENSIONS:
+        before, id_column = embedded_id_column(dialect, table_name, id_column_name)
+        columns = [id_column] + [f"    {col} {COLUMN_TYPES[col]} NOT NULL" for col in column_map.values()]
+        columns += [f"    {col}" for col in EXTRA_COLUMNS.get(table_name, [])]
+        statements += before
+        statements.append(f"CREATE TABLE IF NOT EXISTS {table_name} (\n" + ',\n'.join(columns) + "\n)")
+        statements.append(f"CREATE UNIQUE INDEX IF NOT EXISTS UX_{table_name}_NaturalKey "
+                          f"ON {table_name} ({', '.join(unique_cols)})")
+
+    dimension_ids = {id_column_name for _, _, _, _, id_column_name in DIMENSIONS}
+    for table_name in (FACT_TABLE, STAGE_TABLE):
+        before, id_column = embedded_id_column(dialect, table_name, f"{FACT_TABLE}ID", primary_key=False)
+        columns = [id_column]
+        for col in FACT_COLUMNS:
+            sql_type = 'INTEGER' if col in dimension_ids else COLUMN_TYPES[col]
+            nullable = 'NOT NULL' if col in dimension_ids or col in FACT_NOT_NULL else 'NULL'
+            columns.append(f"    {col} {sql_type} {nullable}")
+        statements += before
+        statements.append(f"CREATE TABLE IF NOT EXISTS {table_name} (\n" + ',\n'.join(columns) + "\n)")
+    if dialect == 'sqlite':
+        # DuckDB skips row groups by their RecordYear min/max instead
+        statements.append(f"CREATE INDEX IF NOT EXISTS IX_{FACT_TABLE}_RecordYear ON {FACT_TABLE} (RecordYear)")
+
+    for table_name, group_cols in AGGREGATE_TABLES:
+        columns = [f"    RecordYear {COLUMN_TYPES['RecordYear']} NOT NULL"]
+        columns += [f"    {col} INTEGER NOT NULL" for col in group_cols]
+        measure_types = {'RecordCount': 'INTEGER', 'HeartDiseaseCount': 'INTEGER', 'BMISum': 'DOUBLE', 'SleepHoursSum': 'DOUBLE'}
+        columns += [f"    {col} {measure_types[col]} NOT NULL" for col in AGGREGATE_MEASURES]
+        columns.append("    HeartDiseasePrevalence DOUBLE GENERATED ALWAYS AS "
+                       "(CAST(HeartDiseaseCount AS DOUBLE) / NULLIF(RecordCount, 0)) VIRTUAL")
+        columns.append(f"    PRIMARY KEY ({', '.join(['RecordYear'] + group_cols)})")
+        statements.append(f"CREATE TABLE IF NOT EXISTS {table_name} (\n" + ',\n'.join(columns) + "\n)")
+
+    statements.append(
+        f"CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (\n"
+        f"    RecordYear {COLUMN_TYPES['RecordYear']} NOT NULL PRIMARY KEY,\n"
+        f"    SourceFile VARCHAR(400) NOT NULL,\n"
+        f"    ContentHash VARCHAR(64) NOT NULL,\n"
+        f"    RowsLoaded INTEGER NOT NULL,\n"
+        f"    LoadedAt TIMESTAMP NOT NULL\n"
+        f")"
+    )
+    statements.append(
+        f"CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (\n"
+        f"    RecordYear {COLUMN_TYPES['RecordYear']} NOT NULL,\n"
+        f"    BatchNo INTEGER NOT NULL,\n"
+        f"    LoadFingerprint VARCHAR(64) NOT NULL,\n"
+        f"    RowsLoaded INTEGER NOT NULL,\n"
+        f"    CommittedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,\n"
+        f"    PRIMARY KEY (RecordYear, BatchNo)\n"
+        f")"
+    )
+    return statements
+
+
+def main():
+    p = argparse.ArgumentParser(description='Generate the HeartDiseaseDB star-schema DDL.')
+    p.add_argument('--out', default='../Database/schema.sql', help='Output .sql path')
+    p.add_argument('--dialect', choices=DIALECTS, default='mssql',
+                   help='mssql (default; partitioned columnstore) or the embedded duckdb / sqlite warehouse')
+    p.add_argument('--first-year', type=int, default=2020, help='First RecordYear with a partition of its own')
+    p.add_argument('--last-year', type=int, default=2030, help='Last RecordYear with a partition of its own')
+    args = p.parse_args()
+
+    if args.first_year > args.last_year:
+        p.error('--first-year must not be after --last-year')
+
+    if args.dialect == 'mssql':
+        ddl = generate_schema(args.first_year, args.last_year)
+    else:
+        ddl = ';\n\n'.join(embedded_schema(args.dialect)) + ';\n'
+
+    out_dir = os.path.dirname(args.out)
+    if out_dir and not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    with open(args.out, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(ddl)
+    print(f'Schema written to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Run instrumentation shared by the ETL scripts: timing spans with row / byte
+counters, peak memory sampling, a JSON run report, an optional Prometheus
+textfile and an optional cProfile + tracemalloc profile.
+
+In the pipeline code:
+    with span('write_csv', rows=n):               # time a stage / hot-loop body
+        ...
+    for block in timed_iter('decode', reader):    # time every next() of a generator
+        ...
+    add_counts('decode', rows=n, nbytes=b)        # attach counters to a span
+
+In a script's main():
+    add_instrumentation_args(parser)
+    args = parser.parse_args()
+    with instrumented_run(args, 'asc_to_csv'):
+        convert(...)
+
+Spans are aggregated by name (calls, seconds, rows, bytes), so rows/s and
+bytes/s come out per stage. Spans are thread-safe; spans recorded inside
+worker processes (asc_to_csv --workers, etl_main) stay in those processes, so
+the parent reports them as one span around the parallel step.
+"""
+
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+RSS_SAMPLE_SECONDS = 0.5
+PROMETHEUS_PREFIX = 'brfss_etl'
+
+_lock = threading.Lock()
+_spans = {}
+
+
+# ----------------------------------------------------------------------
+# Step 1: Spans and counters
+# ----------------------------------------------------------------------
+def _entry(name: str) -> dict:
+    entry = _spans.get(name)
+    if entry is None:
+        entry = _spans[name] = {'calls': 0, 'seconds': 0.0, 'rows': 0, 'bytes': 0}
+    return entry
+
+
+def record(name: str, seconds: float, rows: int = 0, nbytes: int = 0, calls: int = 1):
+    """Add one measured call to the span `name`."""
+    with _lock:
+        entry = _entry(name)
+        entry['calls'] += calls
+        entry['seconds'] += seconds
+        entry['rows'] += rows
+        entry['bytes'] += nbytes
+
+
+def add_counts(name: str, rows: int = 0, nbytes: int = 0):
+    """Add rows / bytes to the span `name` without adding time."""
+    record(name, 0.0, rows, nbytes, calls=0)
+
+
+@contextlib.contextmanager
+def span(name: str, rows: int = 0, nbytes: int = 0):
+    """Time the body of the with-statement as one call of the span `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start, rows, nbytes)
+
+
+def timed_iter(name: str, iterable):
+    """Yield from iterable, timing each next() call as one call of the span `name`."""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            record(name, time.perf_counter() - start, calls=0)
+            return
+        record(name, time.perf_counter() - start)
+        yield item
+
+
+def reset():
+    """Forget all recorded spans."""
+    with _lock:
+        _spans.clear()
+
+
+# ----------------------------------------------------------------------
+# Step 2: Memory
+# ----------------------------------------------------------------------
+def current_rss():
+    """Resident set size of this process in bytes, or None if it cannot be read."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def max_rss():
+    """Peak RSS the OS recorded for this process in bytes, or None."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # bytes on macOS, KiB on Linux
+
+
+class RssSampler(threading.Thread):
+    """Background thread that samples the RSS every `interval` seconds and keeps the peak."""
+
+    def __init__(self, interval: float = RSS_SAMPLE_SECONDS):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.sample()
+            self._stop_event.wait(self.interval)
+
+    def sample(self):
+        rss = current_rss()
+        if rss is not None and rss > self.peak:
+            self.peak = rss
+
+    def stop(self) -> int:
+        self._stop_event.set()
+        self.join()
+        self.sample()
+        return max(self.peak, max_rss() or 0)
+
+
+# ----------------------------------------------------------------------
+# Step 3: Reports
+# ----------------------------------------------------------------------
+def build_report(script: str, started_at: datetime, wall_seconds: float, peak_rss: int, status: str) -> dict:
+    """Machine-readable summary of the run and every span."""
+    with _lock:
+        spans = {name: dict(entry) for name, entry in _spans.items()}
+    for entry in spans.values():
+        seconds = entry['seconds']
+        entry['rows_per_s'] = entry['rows'] / seconds if seconds > 0 and entry['rows'] else None
+        entry['bytes_per_s'] = entry['bytes'] / seconds if seconds > 0 and entry['bytes'] else None
+    return {
+        'script': script,
+        'argv': sys.argv,
+        'status': status,
+        'started_at': started_at.isoformat(),
+        'wall_seconds': wall_seconds,
+        'peak_rss_bytes': peak_rss or None,
+        'spans': spans,
+    }
+
+
+def write_json_report(path: str, report: dict):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+
+def write_prometheus_textfile(path: str, report: dict):
+    """
+    Write the report in the Prometheus text format for node_exporter's
+    textfile collector (written to a temp file and renamed, as it expects).
+    """
+    job = report['script']
+    lines = [
+        f'# TYPE {PROMETHEUS_PREFIX}_run_seconds gauge',
+        f'{PROMETHEUS_PREFIX}_run_seconds{{script="{job}"}} {report["wall_seconds"]:.6f}',
+        f'# TYPE {PROMETHEUS_PREFIX}_run_success gauge',
+        f'{PROMETHEUS_PREFIX}_run_success{{script="{job}"}} {int(report["status"] == "ok")}',
+    ]
+    if report['peak_rss_bytes']:
+        lines += [
+            f'# TYPE {PROMETHEUS_PREFIX}_peak_rss_bytes gauge',
+            f'{PROMETHEUS_PREFIX}_peak_rss_bytes{{script="{job}"}} {report["peak_rss_bytes"]}',
+        ]
+    for metric, key in (('span_seconds', 'seconds'), ('span_calls', 'calls'), ('span_rows', 'rows'), ('span_bytes', 'bytes')):
+        lines.append(f'# TYPE {PROMETHEUS_PREFIX}_{metric} gauge')
+        for name, entry in sorted(report['spans'].items()):
+            lines.append(f'{PROMETHEUS_PREFIX}_{metric}{{script="{job}",span="{name}"}} {entry[key]}')
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, path)
+
+
+def format_summary(report: dict) -> str:
+    """Human-readable span table, slowest first."""
+    lines = [f"{'span':<32} {'calls':>7} {'seconds':>9} {'rows/s':>12} {'MB/s':>8}"]
+    for name, entry in sorted(report['spans'].items(), key=lambda item: -item[1]['seconds']):
+        rows_per_s = f"{entry['rows_per_s']:,.0f}" if entry['rows_per_s'] else '-'
+        mb_per_s = f"{entry['bytes_per_s'] / 1e6:,.1f}" if entry['bytes_per_s'] else '-'
+        lines.append(f"{name:<32} {entry['calls']:>7} {entry['seconds']:>9.3f} {rows_per_s:>12} {mb_per_s:>8}")
+    peak = report['peak_rss_bytes']
+    lines.append(f"wall {report['wall_seconds']:.2f} s, peak RSS {peak / 2**20:,.0f} MiB" if peak
+                 else f"wall {report['wall_seconds']:.2f} s")
+    return '\n'.join(lines)
+
+
+# ----------------------------------------------------------------------
+# Step 4: Profiling and the per-run wrapper
+# ----------------------------------------------------------------------
+@contextlib.contextmanager
+def profiled(prefix: str, log=print):
+    """Run the body under cProfile and tracemalloc; writes <prefix>.prof and <prefix>.alloc.txt."""
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        profiler.dump_stats(f'{prefix}.prof')
+        with open(f'{prefix}.alloc.txt', 'w', encoding='utf-8') as f:
+            f.write(f'Peak traced memory: {traced_peak / 2**20:,.1f} MiB\n')
+            for stat in snapshot.statistics('lineno')[:25]:
+                f.write(f'{stat}\n')
+
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(15)
+        log(f'Profile written to {prefix}.prof and {prefix}.alloc.txt\n{out.getvalue()}')
+
+
+def add_instrumentation_args(parser):
+    """Add --report, --prometheus and --profile to a script's argument parser."""
+    group = parser.add_argument_group('instrumentation')
+    group.add_argument('--report', default=None, help='Write a JSON run report (span timings, rows/s, peak RSS) to this path')
+    group.add_argument('--prometheus', default=None, help='Write the run metrics as a Prometheus textfile to this path')
+    group.add_argument('--profile', nargs='?', const='profile', default=None, metavar='PREFIX',
+                       help='Profile the run with cProfile + tracemalloc; writes PREFIX.prof and PREFIX.alloc.txt')
+
+
+@contextlib.contextmanager
+def instrumented_run(args, script: str, log=print):
+    """
+    Measure a whole run: starts the RSS sampler (and the profiler with
+    --profile), then reports the span summary through `log` (print for the
+    conversion scripts, logging.info for the loader) and writes the --report /
+    --prometheus files, also when the run fails.
+    """
+    reset()
+    started_at = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    sampler = RssSampler()
+    sampler.start()
+    status = 'error'
+    try:
+        with (profiled(args.profile, log) if getattr(args, 'profile', None) else contextlib.nullcontext()):
+            yield
+        status = 'ok'
+    finally:
+        report = build_report(script, started_at, time.perf_counter() - start, sampler.stop(), status)
+        log(f'Run summary ({script}, {status}):\n{format_summary(report)}')
+        if getattr(args, 'report', None):
+            write_json_report(args.report, report)
+            log(f'Run report written to {args.report}')
+        if getattr(args, 'prometheus', None):
+            write_prometheus_textfile(args.prometheus, report)
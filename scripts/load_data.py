@@ -1,311 +1,871 @@
-import csv
-import pyodbc
+import argparse
+import hashlib
+import json
+import os
 import logging
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from operator import itemgetter
+
+import numpy as np
+
+from cleaning import Imputer, combine, constant, equals, map_values, parse_numbers, read_csv_columns, resolve_keys
+from instrumentation import add_counts, add_instrumentation_args, instrumented_run, record, span, timed_iter
+from warehouse import BACKENDS, make_backend
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # --- Configuration ---
 CSV_FILE_PATH = r'D:\Learning\FPT_polytechnic\Sem4\DAT111\DAT111_project\data\processed\final_data.csv'
+DB_BACKEND = 'mssql'  # 'mssql', 'duckdb' or 'sqlite' (see warehouse.py)
 SERVER_NAME = r'NHUTVU'
 DATABASE_NAME = 'HeartDiseaseDB'
 DRIVER = '{ODBC Driver 17 for SQL Server}'
+# Database files of the embedded backends: WAREHOUSE_DIR/HeartDiseaseDB.duckdb / .sqlite
+WAREHOUSE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'warehouse')
+RECORD_YEAR = 2022  # Survey year of CSV_FILE_PATH
+BATCH_SIZE = 50000  # Fact rows per batch; every batch is committed on its own
+FACT_WORKERS = 4  # Parallel connections used to load HealthRecord batches
+# None = the backend's fastest mode; mssql: 'executemany' or 'bulk_insert',
+# duckdb: 'arrow' or 'executemany', sqlite: 'executemany'
+FACT_LOAD_MODE = None
+# Where 'bulk_insert' writes its batch files; SQL Server must be able to read
+# this path (local server or a network share). None = the system temp dir.
+BULK_INSERT_DIR = None
+# Local cache of dimension key -> surrogate ID maps, reused across runs
+KEY_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'cache')
+
+# --- Cleaning Rules ---
+NUMERIC_COLS_FOR_MEAN = ['SleepHours', 'HeightInMeters', 'WeightInKilograms', 'BMI']
+NUMERIC_COLS_TO_FILL = ['PhysicalHealthDays', 'MentalHealthDays'] + NUMERIC_COLS_FOR_MEAN
+YES_NO_COLS = [
+    'HadHeartAttack', 'HadAngina', 'HadStroke', 'HadAsthma', 'HadSkinCancer',
+    'HadCOPD', 'HadDepressiveDisorder', 'HadKidneyDisease', 'HadArthritis',
+    'HadDiabetes', 'PhysicalActivities', 'AlcoholDrinkers'
+]
+MISSING_VALUES = ['NA', '', 'None']
+# Columns whose missing values get the mean of the row's group instead of the
+# column mean, e.g. {'BMI': ['Sex', 'AgeCategory']} (see cleaning.Imputer)
+IMPUTE_GROUPS = {}
+# Derived/placeholder columns added by clean_categories
+DERIVED_COLS = ['CheckupRecency', 'ActivityLevel', 'SleepQuality', 'HadCancer']
+CHUNK_ROWS = 50000  # CSV rows read and cleaned per block
+
+# --- Incremental Loading ---
+# Facts are loaded into STAGE_TABLE first and swapped into HealthRecord one
+# RecordYear at a time; MANIFEST_TABLE remembers the file hash of every year.
+STAGE_TABLE = 'HealthRecordStage'
+MANIFEST_TABLE = 'EtlLoadManifest'
+# Every staged batch is recorded here in its own transaction, so that an
+# interrupted load can be resumed (--resume) after its last committed batch.
+CHECKPOINT_TABLE = 'EtlLoadCheckpoint'
+# RecordYear partitioning of HealthRecord / STAGE_TABLE (see generate_schema.py)
+PARTITION_FUNCTION = 'pfRecordYear'
+PARTITION_SCHEME = 'psRecordYear'
+FACT_COLUMNS = [
+    'PersonID', 'StateID', 'CheckupTimeID', 'PhysicalActivityID', 'ChronicDiseaseID', 'LifestyleID',
+    'HeartDiseaseFlag', 'PhysicalHealthDays', 'MentalHealthDays', 'SleepHours',
+    'HeightInMeters', 'WeightInKilograms', 'BMI', 'RecordYear'
+]
+
+# --- Summary Tables ---
+# HealthRecord measures pre-aggregated per RecordYear, for Power BI aggregations
+# (prevalence = HeartDiseaseCount / RecordCount, averages = sums / RecordCount).
+# (table name, fact columns grouped by); PersonID is Sex x AgeCategory x Race.
+AGGREGATE_TABLES = [
+    ('AggHeartDiseaseByDemographics', ['StateID', 'PersonID']),
+    ('AggHeartDiseaseByRisk', ['ChronicDiseaseID', 'LifestyleID']),
+]
+AGGREGATE_MEASURES = ['RecordCount', 'HeartDiseaseCount', 'BMISum', 'SleepHoursSum']
+
+# --- Dimension Tables ---
+# (map name, table name, {csv column: table column}, unique columns, ID column)
+DIMENSIONS = [
+    ('person', 'DimPerson',
+     {'Sex': 'Sex', 'AgeCategory': 'AgeCategory', 'RaceEthnicityCategory': 'RaceEthnicityCategory'},
+     ['Sex', 'AgeCategory', 'RaceEthnicityCategory'], 'PersonID'),
+    ('state', 'DimState', {'State': 'StateName'}, ['StateName'], 'StateID'),
+    ('checkup', 'DimCheckupTime',
+     {'LastCheckupTime': 'LastCheckupTime', 'CheckupRecency': 'CheckupRecency'},
+     ['LastCheckupTime'], 'CheckupTimeID'),
+    ('physical_activity', 'DimPhysicalActivity',
+     {'PhysicalActivities': 'PhysicalActivities', 'ActivityLevel': 'ActivityLevel'},
+     ['PhysicalActivities', 'ActivityLevel'], 'PhysicalActivityID'),
+    ('lifestyle', 'DimLifestyle',
+     {'SmokerStatus': 'SmokerStatus', 'ECigaretteUsage': 'ECigaretteUsage', 'AlcoholDrinkers': 'AlcoholDrinkers', 'SleepQuality': 'SleepQuality'},
+     ['SmokerStatus', 'ECigaretteUsage', 'AlcoholDrinkers', 'SleepQuality'], 'LifestyleID'),
+    ('chronic', 'DimChronicDiseases',
+     {'HadDiabetes': 'HadDiabetes', 'HadArthritis': 'HadArthritis', 'HadCOPD': 'HadCOPD',
+      'HadKidneyDisease': 'HadKidneyDisease', 'HadDepressiveDisorder': 'HadDepressiveDisorder',
+      'HadCancer': 'HadCancer', 'HadSkinCancer': 'HadSkinCancer'},
+     ['HadDiabetes', 'HadArthritis', 'HadCOPD', 'HadKidneyDisease', 'HadDepressiveDisorder', 'HadCancer', 'HadSkinCancer'], 'ChronicDiseaseID'),
+]
 
 # --- Database Connection ---
+BACKEND = None  # active warehouse backend, see use_backend
+
+def use_backend(name=DB_BACKEND, path=None, database=DATABASE_NAME):
+    """
+    Selects the warehouse every later connection and load goes to.
+    `path` is the database file of the embedded backends
+    (default: WAREHOUSE_DIR/DATABASE_NAME.<backend>); `database` the SQL
+    Server database.
+    """
+    global BACKEND
+    if path is None and getattr(BACKENDS.get(name), 'extension', None):
+        path = os.path.join(WAREHOUSE_DIR, f"{DATABASE_NAME}.{BACKENDS[name].extension}")
+    if path is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    BACKEND = make_backend(name, server=SERVER_NAME, database=database, driver=DRIVER,
+                           bulk_insert_dir=BULK_INSERT_DIR, path=path)
+    return BACKEND
+
+def get_backend():
+    """The active backend (DB_BACKEND unless use_backend chose another one)."""
+    return BACKEND if BACKEND is not None else use_backend()
+
 def get_db_connection():
-    """Establishes a connection to the SQL Server database."""
-    conn_str = (
-        f"DRIVER={DRIVER};"
-        f"SERVER={SERVER_NAME};"
-        f"DATABASE={DATABASE_NAME};"
-        f"Trusted_Connection=yes;"
-    )
+    """Establishes a connection to the warehouse database."""
+    backend = get_backend()
     try:
-        conn = pyodbc.connect(conn_str)
-        logging.info("Database connection successful.")
+        conn = backend.connect()
+        logging.info(f"Database connection successful ({backend.name}: {backend.describe()}).")
         return conn
-    except pyodbc.Error as ex:
-        sqlstate = ex.args[0]
+    except backend.errors as ex:
+        sqlstate = ex.args[0] if ex.args else ex
         logging.error(f"Database connection failed: {sqlstate}")
         return None
 
+# --- Dimension Key Cache ---
+def open_key_cache(cache_dir=KEY_CACHE_DIR):
+    """
+    Opens (creating if needed) the SQLite key cache of the active warehouse.
+    Per dimension it holds every key -> ID pair plus the row count and max ID
+    the table had when the pairs were read, used to validate the cache.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    name = re.sub(r'\W+', '_', get_backend().describe())
+    cache = sqlite3.connect(os.path.join(cache_dir, f"dimension_keys_{name}.sqlite"))
+    cache.executescript("""
+    CREATE TABLE IF NOT EXISTS dimension_state (
+        table_name TEXT PRIMARY KEY, row_count INTEGER NOT NULL, max_id INTEGER NOT NULL);
+    CREATE TABLE IF NOT EXISTS dimension_keys (
+        table_name TEXT NOT NULL, key TEXT NOT NULL, id INTEGER NOT NULL,
+        PRIMARY KEY (table_name, key));
+    """)
+    return cache
+
+def intern_key(values):
+    """Key tuple with interned strings, so equal labels share one object across all maps."""
+    return tuple(sys.intern(v) if isinstance(v, str) else v for v in values)
+
+def read_key_cache(conn, cache, table_name, id_column_name):
+    """
+    Returns (id_map, known_max_id, row_count, is_current) for a dimension.
+
+    The cache is checked against the table's COUNT(*) and MAX(ID) (one cheap
+    query instead of a full scan). When rows were only appended since, the
+    cached pairs are kept and known_max_id tells the caller where the delta
+    starts; anything else (deleted or reseeded rows) empties the cache entry.
+    """
+    row_count, max_id = get_backend().table_stats(conn, table_name, id_column_name)
+
+    state = cache.execute("SELECT row_count, max_id FROM dimension_state WHERE table_name = ?", (table_name,)).fetchone()
+    if state is None:
+        return {}, 0, 0, False
+    cached_count, cached_max = state
+    is_current = cached_count == row_count and cached_max == max_id
+    if is_current:
+        logging.info(f"Key cache for {table_name} is current ({row_count} keys).")
+    elif row_count > cached_count and row_count - cached_count == max_id - cached_max:
+        logging.info(f"Key cache for {table_name} is missing {row_count - cached_count} appended keys.")
+    else:
+        logging.info(f"Key cache for {table_name} is stale, reading the full table.")
+        with cache:
+            cache.execute("DELETE FROM dimension_keys WHERE table_name = ?", (table_name,))
+            cache.execute("DELETE FROM dimension_state WHERE table_name = ?", (table_name,))
+        return {}, 0, 0, False
+
+    id_map = {
+        intern_key(json.loads(key)): key_id
+        for key, key_id in cache.execute("SELECT key, id FROM dimension_keys WHERE table_name = ?", (table_name,))
+    }
+    return id_map, cached_max, cached_count, is_current
+
+def write_key_cache(cache, table_name, rows, row_count, max_id):
+    """Adds the key -> ID pairs read from the database and records the table's new count/max ID."""
+    with cache:
+        cache.executemany(
+            "INSERT OR REPLACE INTO dimension_keys (table_name, key, id) VALUES (?, ?, ?)",
+            ((table_name, json.dumps(list(key)), key_id) for key, key_id in rows)
+        )
+        cache.execute(
+            "INSERT OR REPLACE INTO dimension_state (table_name, row_count, max_id) VALUES (?, ?, ?)",
+            (table_name, row_count, max_id)
+        )
+
 # --- Data Loading Functions ---
 
-def load_dimension(conn, data, table_name, column_map, unique_cols, id_column_name):
+def load_dimension(conn, data, table_name, column_map, unique_cols, id_column_name, key_cache=None):
     """
     Loads data into a dimension table, avoiding duplicates.
-    Returns a dictionary mapping unique column tuples to their new IDs.
+    Returns a dictionary mapping key tuples (in column_map order) to their IDs,
+    or None if the table could not be read or loaded.
+
+    Set-based: the backend stages the candidate keys in one batch, inserts
+    the missing ones and reads the key -> ID pairs back in a single round
+    trip (see warehouse.py), whatever the number of keys.
+    With a key_cache (see open_key_cache) only keys the cache does not know
+    are staged and only rows added since the cache was written are read back;
+    when every key is cached and the table is unchanged nothing is sent.
     """
-    cursor = conn.cursor()
-    
-    # Get existing data from the dimension table to avoid duplicates
-    existing_data = {}
-    try:
-        cursor.execute(f"SELECT {', '.join(unique_cols)}, {id_column_name} FROM dbo.{table_name}")
-        for row in cursor.fetchall():
-            key = tuple(row[:-1])
-            existing_data[key] = row[-1]
-        logging.info(f"Found {len(existing_data)} existing records in {table_name}.")
-    except pyodbc.ProgrammingError:
-        logging.info(f"Table {table_name} not found or no existing data, proceeding with fresh insert.")
-        # Table might not exist on first run, which is okay
-        pass
+    backend = get_backend()
+    columns = list(column_map.values())
+
+    id_map, known_max, known_count, is_current = {}, 0, 0, False
+    if key_cache is not None:
+        try:
+            id_map, known_max, known_count, is_current = read_key_cache(conn, key_cache, table_name, id_column_name)
+        except backend.errors as e:
+            logging.error(f"Error reading {table_name}: {e}")
+            return None
 
     # Prepare data for insertion
     data_to_insert = []
     seen_keys = set()
     for row in data:
         key_tuple = tuple(row.get(col) for col in column_map.keys())
-        if key_tuple not in seen_keys:
+        if key_tuple not in seen_keys and key_tuple not in id_map:
             seen_keys.add(key_tuple)
-            # Create a dictionary with only the required columns
-            insert_row = {col: row.get(col) for col in column_map.keys()}
-            data_to_insert.append(insert_row)
-    
-    id_map = existing_data.copy()
-    new_rows = 0
-
-    for row in data_to_insert:
-        key = tuple(row[col] for col in column_map.keys())
-        
-        if key not in existing_data:
-            try:
-                placeholders = ', '.join(['?' for _ in column_map.values()])
-                sql = f"INSERT INTO dbo.{table_name} ({', '.join(column_map.values())}) OUTPUT INSERTED.{id_column_name} VALUES ({placeholders})"
-                
-                values = [row[col] for col in column_map.keys()]
-                
-                cursor.execute(sql, *values)
-                new_id = cursor.fetchone()[0]
-                id_map[key] = new_id
-                new_rows += 1
-            except pyodbc.IntegrityError:
-                logging.warning(f"Integrity error (possible race condition) inserting into {table_name} for key {key}. Attempting to retrieve existing ID.")
-                conn.rollback()
-                cursor.execute(f"SELECT {id_column_name} FROM dbo.{table_name} WHERE {' AND '.join([f'{col}=?' for col in unique_cols])}", *key)
-                result = cursor.fetchone()
-                if result:
-                    id_map[key] = result[0]
-                else:
-                    logging.error(f"Failed to retrieve existing ID after integrity error for {table_name} with key {key}.")
-            except Exception as e:
-                logging.error(f"Error inserting into {table_name}: {e}. Problematic row: {row}")
-                conn.rollback()
+            data_to_insert.append(key_tuple)
 
+    if is_current and not data_to_insert:
+        logging.info(f"All keys of {table_name} are cached, nothing to insert.")
+        return id_map
+
+    # Keys are read back in column_map order, the same order load_fact_table
+    # builds its lookup tuples in. Inserted rows always get IDs above
+    # known_max, so the delta includes them.
+    try:
+        with span(f"load_dimension.{table_name}", rows=len(data_to_insert)):
+            backend.begin(conn)
+            rows, new_rows = backend.upsert_dimension(conn, table_name, columns, unique_cols, id_column_name,
+                                                      data_to_insert, known_max)
+            conn.commit()
+    except backend.errors as e:
+        logging.error(f"Error loading {table_name}: {e}")
+        backend.rollback(conn)
+        return None
+
+    delta = [(intern_key(row[:-1]), row[-1]) for row in rows]
+    id_map.update(delta)
+
+    if key_cache is not None and delta:
+        write_key_cache(key_cache, table_name, delta, known_count + len(delta), max(key_id for _, key_id in delta))
 
     if new_rows > 0:
-        conn.commit()
-        logging.info(f"Inserted {new_rows} new records into {table_name}.")
+        logging.info(f"Inserted {new_rows} new records into {table_name} ({len(id_map)} total).")
     else:
-        logging.info(f"No new records to insert into {table_name}.")
+        logging.info(f"No new records to insert into {table_name} ({len(id_map)} existing).")
 
     return id_map
 
-def load_fact_table(conn, data, maps):
-    """Loads data into the HealthRecord fact table."""
-    cursor = conn.cursor()
-    
-    # Clear existing data to avoid duplicates if script is re-run
+def measure_scales():
+    """{fact column: decimal places} of the DECIMAL columns of HealthRecord (generate_schema.COLUMN_TYPES)."""
+    from generate_schema import COLUMN_TYPES
+    scales = {}
+    for col in FACT_COLUMNS:
+        match = re.fullmatch(r'DECIMAL\(\d+,\s*(\d+)\)', COLUMN_TYPES.get(col, ''))
+        if match:
+            scales[col] = int(match.group(1))
+    return scales
+
+def build_fact_records(categories, numbers, maps, record_year, block_no=0):
+    """
+    Resolves the dimension IDs of a cleaned block (see iter_clean_blocks) and
+    returns its HealthRecord tuples, skipping rows with unmappable keys.
+    Measures are rounded to the scale HealthRecord stores them with, so the
+    summary tables sum exactly the values the fact rows hold.
+    """
+    columns = {}
+    keep = None
+    for name, table_name, column_map, _, id_column_name in DIMENSIONS:
+        ids, unknown_keys = resolve_keys([categories[col] for col in column_map], maps[name])
+        if unknown_keys:
+            logging.warning(f"Skipping {int((ids < 0).sum())} rows of block {block_no}: {len(unknown_keys)} key(s) "
+                            f"missing from the {table_name} map, e.g. {unknown_keys[0]}")
+        columns[id_column_name] = ids
+        keep = ids >= 0 if keep is None else keep & (ids >= 0)
+
+    # HeartDiseaseFlag: 1 if they had a heart attack or angina, else 0
+    heart_disease = equals(categories['HadHeartAttack'], 'Yes') | equals(categories['HadAngina'], 'Yes')
+    columns['HeartDiseaseFlag'] = heart_disease.astype(np.int64)
+    columns.update(numbers)
+    for col, scale in measure_scales().items():
+        columns[col] = np.round(columns[col], scale)
+
+    # .tolist() gives Python ints / floats, which every database driver accepts
+    values = [repeat(record_year) if col == 'RecordYear' else columns[col][keep].tolist() for col in FACT_COLUMNS]
+    return list(zip(*values))
+
+def iter_fact_batches(blocks, maps, record_year, batch_size):
+    """Groups the HealthRecord tuples of cleaned `blocks` into lists of `batch_size`."""
+    records_to_insert = []
+    for block_no, (categories, numbers) in enumerate(blocks, start=1):
+        records_to_insert.extend(build_fact_records(categories, numbers, maps, record_year, block_no))
+        while len(records_to_insert) >= batch_size:
+            yield records_to_insert[:batch_size]
+            records_to_insert = records_to_insert[batch_size:]
+
+    if records_to_insert:
+        yield records_to_insert
+
+def load_fact_batch(conn, batch_no, records, table_name, mode, table_hint, checkpoint=None):
+    """
+    Loads and commits one batch; returns the number of rows inserted (0 if the batch failed).
+    With checkpoint=(record_year, fingerprint) the batch is recorded in
+    CHECKPOINT_TABLE in the same transaction.
+    """
+    backend = get_backend()
+    start = time.perf_counter()
     try:
-        logging.info("Clearing existing data from HealthRecord table...")
-        cursor.execute("DELETE FROM dbo.HealthRecord")
-        # Reset identity seed
-        cursor.execute("DBCC CHECKIDENT ('dbo.HealthRecord', RESEED, 0)")
+        backend.begin(conn)
+        backend.insert_facts(conn, records, table_name, FACT_COLUMNS, mode, table_hint)
+        if checkpoint is not None:
+            record_year, fingerprint = checkpoint
+            backend.cursor(conn).execute(
+                f"INSERT INTO {backend.table(CHECKPOINT_TABLE)} (RecordYear, BatchNo, LoadFingerprint, RowsLoaded) "
+                f"VALUES (?, ?, ?, ?)", (record_year, batch_no, fingerprint, len(records)))
+        conn.commit()
+    except Exception as e:
+        logging.error(f"Failed to insert batch {batch_no} ({len(records)} rows) into {table_name}: {e}")
+        backend.rollback(conn)
+        return 0
+    elapsed = time.perf_counter() - start
+    record(f"fact_{mode}", elapsed, rows=len(records))
+    logging.info(f"Batch {batch_no}: {len(records)} rows in {elapsed:.2f}s ({len(records) / max(elapsed, 1e-9):,.0f} rows/s)")
+    return len(records)
+
+def load_fact_table(conn, data, maps, record_year=RECORD_YEAR, table_name=STAGE_TABLE,
+                    batch_size=BATCH_SIZE, workers=FACT_WORKERS, mode=FACT_LOAD_MODE, aggregates=None,
+                    checkpoint=None, committed=None):
+    """
+    Loads data into a HealthRecord-shaped table (the staging table by default).
+    `data` may be any iterable of cleaned blocks (see iter_clean_blocks).
+    Rows are sent in batches of `batch_size`, each committed on its own, so a
+    bad batch only loses itself.
+    With workers > 1 the batches run on that many parallel connections, with
+    at most two batches per worker in memory at a time (embedded backends
+    have a single writer and always use one). `mode` picks the backend's
+    load path (see FACT_LOAD_MODE).
+    If `aggregates` (see new_aggregates) is given, the summary tables are
+    accumulated from the same batches.
+    `checkpoint` is passed on to load_fact_batch. The batches in `committed`
+    ({batch number: rows}, see committed_batches) were staged by an
+    interrupted run: they are rebuilt for the aggregates but not inserted
+    again, and fail if they no longer hold the same number of rows.
+    Returns (rows inserted, batches failed).
+    """
+    backend = get_backend()
+    mode = mode or backend.fact_modes[0]
+    if mode not in backend.fact_modes:
+        raise ValueError(f"{backend.name} cannot load facts with {mode!r}; use one of {', '.join(backend.fact_modes)}")
+    if backend.max_writers is not None:
+        workers = min(workers, backend.max_writers)
+    logging.info(f"Loading {table_name} ({backend.name} {mode}, {workers} connection(s), batches of {batch_size})...")
+    # TABLOCK enables minimally logged bulk loads, but its exclusive table lock
+    # would serialize parallel connections, so it is only used with one.
+    table_hint = backend.table_lock_hint if workers <= 1 else ''
+    # Times reading, cleaning and ID resolution of every batch
+    batches = timed_iter("build_fact_batches", iter_fact_batches(data, maps, record_year, batch_size))
+    if aggregates is not None:
+        batches = (update_aggregates(aggregates, records) for records in batches)
+    committed = committed or {}
+    resumed = {'rows': 0, 'failed': 0}
+
+    def pending_batches():
+        """Numbered batches still to insert."""
+        for batch_no, records in enumerate(batches, start=1):
+            if batch_no not in committed:
+                yield batch_no, records
+            elif len(records) == committed[batch_no]:
+                resumed['rows'] += len(records)
+            else:
+                logging.error(f"Batch {batch_no} now has {len(records)} rows, but {committed[batch_no]} were "
+                              f"staged for it before; load without --resume.")
+                resumed['failed'] += 1
+
+    start = time.perf_counter()
+    inserted = 0
+    total = 0
+    failed = 0
+    if workers <= 1:
+        for batch_no, records in pending_batches():
+            rows = load_fact_batch(conn, batch_no, records, table_name, mode, table_hint, checkpoint)
+            total += len(records)
+            inserted += rows
+            failed += rows == 0
+    else:
+        local = threading.local()
+        connections = []
+        lock = threading.Lock()
+
+        def run_batch(batch_no, records):
+            """Loads one batch on this thread's connection; 0 if the connection cannot be opened."""
+            if getattr(local, 'conn', None) is None:
+                if getattr(local, 'connect_failed', False):
+                    return 0
+                local.conn = get_db_connection()
+                if local.conn is None:
+                    # get_db_connection logged the error; the thread's later batches fail without retrying
+                    local.connect_failed = True
+                    logging.error("A worker connection could not be opened; its batches are counted as failed.")
+                    return 0
+                with lock:
+                    connections.append(local.conn)
+            return load_fact_batch(local.conn, batch_no, records, table_name, mode, table_hint, checkpoint)
+
+        pending = deque()
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for batch_no, records in pending_batches():
+                    total += len(records)
+                    pending.append(executor.submit(run_batch, batch_no, records))
+                    # Bound the number of batches held in memory
+                    while len(pending) >= workers * 2:
+                        rows = pending.popleft().result()
+                        inserted += rows
+                        failed += rows == 0
+                while pending:
+                    rows = pending.popleft().result()
+                    inserted += rows
+                    failed += rows == 0
+        finally:
+            for worker_conn in connections:
+                worker_conn.close()
+
+    if committed:
+        logging.info(f"Kept {resumed['rows']} rows of {len(committed)} batch(es) staged by the interrupted load.")
+    inserted += resumed['rows']
+    total += resumed['rows']
+    failed += resumed['failed']
+    if total == 0:
+        logging.info(f"No records to insert into {table_name} table.")
+        return 0, 0
+
+    elapsed = time.perf_counter() - start
+    if failed:
+        logging.error(f"{failed} batch(es) failed; inserted {inserted} of {total} records into {table_name}.")
+    else:
+        logging.info(f"Successfully inserted {inserted} records into {table_name} "
+                     f"in {elapsed:.1f}s ({inserted / max(elapsed, 1e-9):,.0f} rows/s).")
+    return inserted, failed
+
+# --- Summary Table Functions ---
+def new_aggregates():
+    """Empty accumulators: {table name: {group key: [count, heart disease, BMI sum, sleep sum]}}."""
+    return {table_name: {} for table_name, _ in AGGREGATE_TABLES}
+
+def update_aggregates(aggregates, records):
+    """Adds a batch of HealthRecord tuples to the accumulators and returns the batch unchanged."""
+    flag, bmi, sleep = (FACT_COLUMNS.index(col) for col in ('HeartDiseaseFlag', 'BMI', 'SleepHours'))
+    for table_name, group_cols in AGGREGATE_TABLES:
+        groups = aggregates[table_name]
+        key_of = itemgetter(*[FACT_COLUMNS.index(col) for col in group_cols])
+        for fact in records:
+            key = key_of(fact)
+            totals = groups.get(key)
+            if totals is None:
+                totals = groups[key] = [0, 0, 0.0, 0.0]
+            totals[0] += 1
+            totals[1] += fact[flag]
+            totals[2] += fact[bmi] or 0.0
+            totals[3] += fact[sleep] or 0.0
+    return records
+
+def replace_aggregates(cursor, record_year, aggregates):
+    """Replaces the record_year rows of every summary table (inside the caller's transaction)."""
+    backend = get_backend()
+    for table_name, group_cols in AGGREGATE_TABLES:
+        columns = ['RecordYear'] + group_cols + AGGREGATE_MEASURES
+        cursor.execute(f"DELETE FROM {backend.table(table_name)} WHERE RecordYear = ?", (record_year,))
+        rows = [(record_year,) + key + tuple(totals) for key, totals in aggregates[table_name].items()]
+        if rows:
+            backend.insert_rows(cursor, backend.table(table_name), columns, rows)
+        logging.info(f"Wrote {len(rows)} {table_name} rows for {record_year}.")
+
+# --- Incremental Year Loading ---
+def file_hash(path):
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def ensure_load_tables(conn):
+    """
+    Creates the load manifest, the batch checkpoint, the (empty) fact staging
+    table and the summary tables if they do not exist yet. Embedded backends
+    create the whole star schema here; on SQL Server the dimensions and
+    HealthRecord come from Database/schema.sql. Both use the table
+    definitions of generate_schema.py.
+    """
+    backend = get_backend()
+    if backend.creates_schema:
+        backend.create_schema(conn)
+        return
+    from generate_schema import load_table_batches
+    cursor = conn.cursor()
+    for batch in load_table_batches():
+        cursor.execute(batch)
+    cursor.execute(f"""
+    IF OBJECT_ID('dbo.{STAGE_TABLE}') IS NULL
+        SELECT TOP 0 * INTO dbo.{STAGE_TABLE} FROM dbo.HealthRecord;
+    """)
+    conn.commit()
+
+def loaded_hash(conn, record_year):
+    """Content hash the manifest holds for record_year, or None if the year was never loaded."""
+    backend = get_backend()
+    cursor = backend.cursor(conn)
+    cursor.execute(f"SELECT ContentHash FROM {backend.table(MANIFEST_TABLE)} WHERE RecordYear = ?", (record_year,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def truncate_stage(conn):
+    """
+    Empties the staging table (minimally logged on SQL Server) and its batch
+    checkpoint. On SQL Server TRUNCATE restarts the stage's identity at 1, and
+    a partition switch keeps the staged HealthRecordIDs, so the identity is
+    reseeded above every ID HealthRecord has handed out.
+    """
+    backend = get_backend()
+    backend.truncate(conn, CHECKPOINT_TABLE)
+    backend.truncate(conn, STAGE_TABLE)
+    if backend.partition_switch:
+        # After a TRUNCATE the next row gets the reseed value itself
+        conn.cursor().execute(f"""
+        DECLARE @next BIGINT = (SELECT ISNULL(MAX(HealthRecordID), 0) FROM dbo.HealthRecord);
+        IF IDENT_CURRENT('dbo.HealthRecord') > @next SET @next = IDENT_CURRENT('dbo.HealthRecord');
+        SET @next = @next + 1;
+        DBCC CHECKIDENT ('dbo.{STAGE_TABLE}', RESEED, @next) WITH NO_INFOMSGS;
+        """)
         conn.commit()
-        logging.info("HealthRecord table cleared.")
-    except pyodbc.ProgrammingError:
-        logging.warning("HealthRecord table not found, skipping delete.")
-        conn.rollback()
 
+def load_fingerprint(content_hash, batch_size, impute_groups):
+    """
+    Identifies the batches a load produces: the same file, batch size and
+    imputation give the same HealthRecord rows in the same batches.
+    """
+    state = json.dumps([content_hash, batch_size, impute_groups], sort_keys=True)
+    return hashlib.sha256(state.encode('utf-8')).hexdigest()
 
-    logging.info("Preparing to load HealthRecord fact table...")
-    
-    records_to_insert = []
-    for index, row in enumerate(data):
-        try:
-            person_key = (row['Sex'], row['AgeCategory'], row['RaceEthnicityCategory'])
-            state_key = (row['State'],)
-            checkup_key = (row['LastCheckupTime'], row['CheckupRecency'])
-            
-            # Handle derived columns
-            activity_level = 'Active' if row['PhysicalActivities'] == 'Yes' else 'Inactive'
-            physical_activity_key = (row['PhysicalActivities'], activity_level)
-
-            lifestyle_key = (row['SmokerStatus'], row['ECigaretteUsage'], row['AlcoholDrinkers'], 'Good')
-
-            chronic_key = (
-                row['HadDiabetes'], row['HadArthritis'], row['HadCOPD'], 
-                row['HadKidneyDisease'], row['HadDepressiveDisorder'], 
-                'No', row['HadSkinCancer']
-            )
+def committed_batches(conn, record_year, fingerprint):
+    """
+    {batch number: rows} of the batches an interrupted load with this
+    fingerprint committed, or {} if the staging table does not hold exactly
+    those rows (nothing to resume).
+    """
+    backend = get_backend()
+    cursor = backend.cursor(conn)
+    cursor.execute(f"SELECT RecordYear, LoadFingerprint, BatchNo, RowsLoaded FROM {backend.table(CHECKPOINT_TABLE)}")
+    checkpoint = cursor.fetchall()
+    if not checkpoint:
+        logging.info("No interrupted load to resume.")
+        return {}
+    if any(row[0] != record_year or row[1] != fingerprint for row in checkpoint):
+        logging.warning(f"The staged batches belong to another year or file; loading {record_year} from the start.")
+        return {}
+    cursor.execute(f"SELECT COUNT(*) FROM {backend.table(STAGE_TABLE)}")
+    staged = cursor.fetchone()[0]
+    committed = {row[2]: row[3] for row in checkpoint}
+    if staged != sum(committed.values()):
+        logging.warning(f"{STAGE_TABLE} holds {staged} rows, but its checkpoint {sum(committed.values())}; "
+                        f"loading {record_year} from the start.")
+        return {}
+    logging.info(f"Resuming {record_year} after {len(committed)} staged batch(es) ({staged} rows).")
+    return committed
+
+def year_partition(conn):
+    """
+    Returns a function mapping a RecordYear to its partition number (None if
+    the year has no partition of its own) when both HealthRecord and the
+    staging table are partitioned on PARTITION_SCHEME (the layout
+    generate_schema.py creates), else None.
+    """
+    if not get_backend().partition_switch:
+        return None
+    cursor = conn.cursor()
+    cursor.execute(f"""
+    SELECT COUNT(*) FROM sys.indexes i
+    JOIN sys.partition_schemes ps ON ps.data_space_id = i.data_space_id
+    WHERE ps.name = ? AND i.index_id <= 1
+      AND i.object_id IN (OBJECT_ID('dbo.HealthRecord'), OBJECT_ID('dbo.{STAGE_TABLE}'))
+    """, (PARTITION_SCHEME,))
+    if cursor.fetchone()[0] != 2:
+        return None
 
-            # Map keys to IDs
-            person_id = maps['person'][person_key]
-            state_id = maps['state'][state_key]
-            checkup_id = maps['checkup'][checkup_key]
-            pa_id = maps['physical_activity'][physical_activity_key]
-            lifestyle_id = maps['lifestyle'][lifestyle_key]
-            chronic_id = maps['chronic'][chronic_key]
-
-            # HeartDiseaseFlag: 1 if they had a heart attack or angina, else 0
-            heart_disease_flag = 1 if row['HadHeartAttack'] == 'Yes' or row['HadAngina'] == 'Yes' else 0
-
-            record = (
-                person_id, state_id, checkup_id, pa_id, chronic_id, lifestyle_id,
-                heart_disease_flag,
-                row.get('PhysicalHealthDays'),
-                row.get('MentalHealthDays'),
-                row.get('SleepHours'),
-                row.get('HeightInMeters'),
-                row.get('WeightInKilograms'),
-                row.get('BMI'),
-                2022  # RecordYear
-            )
-            records_to_insert.append(record)
-        except KeyError as e:
-            logging.warning(f"Skipping row {index} due to missing key in dimension map: {e}. Row data: {row}")
-            continue
-        except Exception as e:
-            logging.error(f"An unexpected error occurred while processing row {index} for HealthRecord: {e}. Row data: {row}")
-            continue
-
-    if not records_to_insert:
-        logging.info("No records to insert into HealthRecord table.")
-        return
+    def partition_of(record_year):
+        """
+        The partition number of record_year, or None when that partition also
+        holds other years: the two edge partitions of the RANGE RIGHT function
+        take every year before its first and from its last boundary on.
+        """
+        cursor.execute(f"SELECT $PARTITION.{PARTITION_FUNCTION}(?), $PARTITION.{PARTITION_FUNCTION}(?), "
+                       f"$PARTITION.{PARTITION_FUNCTION}(?)", (record_year - 1, record_year, record_year + 1))
+        before, partition, after = (int(value) for value in cursor.fetchone())
+        return partition if before != partition and after != partition else None
+    return partition_of
 
+def swap_in_year(conn, record_year, source_file, content_hash, rows_loaded, aggregates=None):
+    """
+    Replaces the record_year rows of HealthRecord (and of the summary tables,
+    if aggregates are given) with the staged rows and records the file hash,
+    all in one transaction: on failure the previous data for that year stays
+    in place. Other years are not touched.
+
+    With the partitioned schema the year's partition is truncated and the
+    staged partition switched in (a metadata-only change); otherwise, and for
+    years outside the partition function's boundaries, the year is deleted
+    and the staged rows are copied in.
+    """
+    backend = get_backend()
+    columns = ', '.join(FACT_COLUMNS)
+    fact_table = backend.table('HealthRecord')
+    cursor = backend.cursor(conn)
     try:
-        sql = """
-        INSERT INTO dbo.HealthRecord (
-            PersonID, StateID, CheckupTimeID, PhysicalActivityID, ChronicDiseaseID, LifestyleID,
-            HeartDiseaseFlag, PhysicalHealthDays, MentalHealthDays, SleepHours,
-            HeightInMeters, WeightInKilograms, BMI, RecordYear
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        cursor.fast_executemany = True
-        cursor.executemany(sql, records_to_insert)
+        partition_of = year_partition(conn)
+        partition = partition_of(record_year) if partition_of is not None else None
+        if partition_of is not None and partition is None:
+            logging.warning(f"{record_year} has no partition of its own in {PARTITION_FUNCTION} "
+                            f"(see generate_schema.py --first-year / --last-year); copying its rows instead.")
+        backend.begin(conn)
+        if partition is not None:
+            cursor.execute(f"TRUNCATE TABLE dbo.HealthRecord WITH (PARTITIONS ({partition}))")
+            cursor.execute(f"ALTER TABLE dbo.{STAGE_TABLE} SWITCH PARTITION {partition} TO dbo.HealthRecord PARTITION {partition}")
+            # The switch does not advance HealthRecord's identity; raise it to the highest switched-in ID
+            # so rows later copied in by the DELETE / INSERT path get unique IDs too
+            cursor.execute("DBCC CHECKIDENT ('dbo.HealthRecord', RESEED) WITH NO_INFOMSGS")
+            logging.info(f"Switched partition {partition} ({record_year}) into HealthRecord.")
+        else:
+            cursor.execute(f"DELETE FROM {fact_table} WHERE RecordYear = ?", (record_year,))
+            logging.info(f"Removed the previous HealthRecord rows for {record_year}.")
+            # TABLOCK lets SQL Server minimally log the insert (simple / bulk-logged recovery)
+            cursor.execute(
+                f"INSERT INTO {fact_table} {backend.table_lock_hint}({columns}) "
+                f"SELECT {columns} FROM {backend.table(STAGE_TABLE)} WHERE RecordYear = ?",
+                (record_year,)
+            )
+        if aggregates is not None:
+            replace_aggregates(cursor, record_year, aggregates)
+        backend.upsert_manifest(cursor, backend.table(MANIFEST_TABLE), record_year,
+                                os.path.basename(source_file), content_hash, rows_loaded)
         conn.commit()
-        logging.info(f"Successfully inserted {len(records_to_insert)} records into HealthRecord.")
-    except Exception as e:
-        logging.error(f"Failed to bulk insert into HealthRecord: {e}")
-        conn.rollback()
+    except backend.errors as e:
+        logging.error(f"Failed to swap {record_year} into HealthRecord: {e}")
+        backend.rollback(conn)
+        return False
+    logging.info(f"Swapped {rows_loaded} rows for {record_year} into HealthRecord.")
+    return True
 
 
 # --- Helper Functions ---
-def calculate_means(data, columns):
-    """Calculates the mean for specified columns in a list of dictionaries."""
-    sums = {col: 0 for col in columns}
-    counts = {col: 0 for col in columns}
-    for row in data:
-        for col in columns:
-            if row.get(col) and row[col] not in ['NA', '', 'None']:
-                try:
-                    sums[col] += float(row[col])
-                    counts[col] += 1
-                except (ValueError, TypeError):
-                    continue  # Ignore non-numeric values
-    return {col: sums[col] / counts[col] if counts[col] > 0 else 0 for col in columns}
+def categorical_columns(impute_groups=None):
+    """Categorical CSV columns the loader reads: dimension keys, heart disease flags and imputation groups."""
+    columns = [col for _, _, column_map, _, _ in DIMENSIONS for col in column_map if col not in DERIVED_COLS]
+    columns += ['HadHeartAttack', 'HadAngina']
+    columns += [col for group_cols in (impute_groups or {}).values() for col in group_cols if col not in DERIVED_COLS]
+    return list(dict.fromkeys(columns))
+
+def clean_categories(categories, rows):
+    """
+    Standardizes the Yes/No columns of a block of dictionary-encoded columns
+    and adds the derived/placeholder columns. Every rule is applied to the
+    distinct values of a column, not to every row.
+    """
+    categories = dict(categories)
+
+    # Standardize 'Yes'/'No' columns
+    for col in YES_NO_COLS:
+        if col in categories:
+            categories[col] = map_values(categories[col], lambda value: 'Yes' if value == 'Yes' else 'No')
+
+    # Add derived/placeholder columns
+    categories['CheckupRecency'] = map_values(categories['LastCheckupTime'], lambda value: 1 if 'year' in value else 5)
+    categories['ActivityLevel'] = map_values(categories['PhysicalActivities'],
+                                             lambda value: 'Active' if value == 'Yes' else 'Inactive')
+    categories['SleepQuality'] = constant('Good', rows)  # Placeholder
+    categories['HadCancer'] = constant('No', rows)  # Placeholder
+    return categories
+
+def clean_numbers(text, categories, imputer):
+    """Fills missing numeric values with the imputer's means; values that are not numbers become 0.0."""
+    numbers = {}
+    for col in NUMERIC_COLS_TO_FILL:
+        values, missing = parse_numbers(text[col], MISSING_VALUES)
+        values = imputer.fill(col, values, missing, categories)
+        numbers[col] = np.where(np.isnan(values), 0.0, values)
+    return numbers
+
+def scan_csv(path, impute_groups=None, chunksize=CHUNK_ROWS):
+    """
+    First pass over the CSV, a block at a time: the imputation statistics
+    (see cleaning.Imputer) and the distinct key rows of every dimension.
+    Memory grows with the dimension cardinality only, not with the file size.
+    """
+    imputer = Imputer(NUMERIC_COLS_FOR_MEAN, impute_groups)
+    distinct_keys = {name: {} for name, _, _, _, _ in DIMENSIONS}
+    rows = 0
+
+    for text, categories in read_csv_columns(path, NUMERIC_COLS_TO_FILL, categorical_columns(impute_groups), chunksize):
+        block_rows = len(text[NUMERIC_COLS_TO_FILL[0]])
+        categories = clean_categories(categories, block_rows)
+        imputer.observe({col: parse_numbers(text[col], MISSING_VALUES)[0] for col in NUMERIC_COLS_FOR_MEAN},
+                        categories)
+        for name, _, column_map, _, _ in DIMENSIONS:
+            keys, _ = combine([categories[col] for col in column_map])
+            for key in keys:
+                if key not in distinct_keys[name]:
+                    distinct_keys[name][key] = dict(zip(column_map, key))
+        rows += block_rows
+
+    return rows, imputer, {name: list(keys.values()) for name, keys in distinct_keys.items()}
+
+def iter_clean_blocks(path, imputer, chunksize=CHUNK_ROWS):
+    """Second pass over the CSV: yields (categorical columns, numeric columns) of one cleaned block at a time."""
+    for text, categories in read_csv_columns(path, NUMERIC_COLS_TO_FILL, categorical_columns(imputer.groups), chunksize):
+        categories = clean_categories(categories, len(text[NUMERIC_COLS_TO_FILL[0]]))
+        yield categories, clean_numbers(text, categories, imputer)
 
 
 # --- Main Execution ---
-def main():
-    """Main function to run the ETL process."""
-    conn = get_db_connection()
-    if conn is None:
-        return
-
-    logging.info(f"Reading data from {CSV_FILE_PATH}...")
+def load_year(conn, csv_path, record_year, force=False, use_key_cache=True, workers=FACT_WORKERS,
+              impute_groups=IMPUTE_GROUPS, resume=False):
+    """
+    Loads one survey year from csv_path, replacing only that year's facts.
+    Skipped when the manifest already holds the same file content for the
+    year (unless force). With resume, the batches an interrupted load of the
+    same file already staged are kept (see committed_batches).
+    Returns True if the year is up to date afterwards.
+    """
     try:
-        with open(CSV_FILE_PATH, mode='r', encoding='utf-8') as infile:
-            reader = csv.DictReader(infile)
-            data = list(reader)
-
-        # --- Basic data cleaning ---
-        numeric_cols_for_mean = ['SleepHours', 'HeightInMeters', 'WeightInKilograms', 'BMI']
-        means = calculate_means(data, numeric_cols_for_mean)
-
-        # Define columns to be processed
-        yes_no_cols = [
-            'HadHeartAttack', 'HadAngina', 'HadStroke', 'HadAsthma', 'HadSkinCancer', 
-            'HadCOPD', 'HadDepressiveDisorder', 'HadKidneyDisease', 'HadArthritis', 
-            'HadDiabetes', 'PhysicalActivities', 'AlcoholDrinkers'
-        ]
-        
-        numeric_cols_to_fill = ['PhysicalHealthDays', 'MentalHealthDays'] + numeric_cols_for_mean
-
-        for row in data:
-            # Fill missing numeric values
-            for col in numeric_cols_to_fill:
-                if not row.get(col) or row[col] in ['NA', '', 'None']:
-                    row[col] = means.get(col, 0) # Use mean if available, else 0
-            
-            # Convert numeric columns to float
-            for col in numeric_cols_to_fill:
-                try:
-                    row[col] = float(row[col])
-                except (ValueError, TypeError):
-                    row[col] = 0.0 # Default to 0.0 if conversion fails
-
-            # Standardize 'Yes'/'No' columns
-            for col in yes_no_cols:
-                if col in row:
-                    row[col] = 'Yes' if row[col] == 'Yes' else 'No'
-            
-            # Add derived/placeholder columns
-            row['CheckupRecency'] = 1 if 'year' in row.get('LastCheckupTime', '') else 5
-            row['ActivityLevel'] = 'Active' if row.get('PhysicalActivities') == 'Yes' else 'Inactive'
-            row['SleepQuality'] = 'Good'  # Placeholder
-            row['HadCancer'] = 'No'  # Placeholder
+        with span("file_hash", nbytes=os.path.getsize(csv_path)):
+            content_hash = file_hash(csv_path)
+    except FileNotFoundError:
+        logging.error(f"Error: The file {csv_path} was not found.")
+        return False
 
+    ensure_load_tables(conn)
+    if not force and loaded_hash(conn, record_year) == content_hash:
+        logging.info(f"{record_year} is already loaded from identical data ({content_hash[:12]}), skipping.")
+        return True
 
-    except FileNotFoundError:
-        logging.error(f"Error: The file {CSV_FILE_PATH} was not found.")
-        return
+    # --- Pass 1: statistics and dimension keys ---
+    logging.info(f"Scanning {csv_path}...")
+    try:
+        with span("scan_csv", nbytes=os.path.getsize(csv_path)):
+            rows, imputer, distinct_keys = scan_csv(csv_path, impute_groups)
     except Exception as e:
         logging.error(f"An error occurred while reading or cleaning the CSV file: {e}")
-        return
+        return False
+    add_counts("scan_csv", rows=rows)
+    logging.info(f"Scanned {rows} rows.")
+    for col, stats in imputer.stats.items():
+        grouped = f", by {' x '.join(imputer.groups[col])}" if col in imputer.groups else ""
+        logging.info(f"Imputing {col} with the mean {stats.mean:.2f} (sd {stats.std:.2f}, n={stats.count}{grouped}).")
 
     logging.info("Starting dimension table loading...")
-    
-    # DimPerson
-    person_map = load_dimension(conn, data, 'DimPerson', 
-                                {'Sex': 'Sex', 'AgeCategory': 'AgeCategory', 'RaceEthnicityCategory': 'RaceEthnicityCategory'},
-                                ['Sex', 'AgeCategory', 'RaceEthnicityCategory'], 'PersonID')
-
-    # DimState
-    state_map = load_dimension(conn, data, 'DimState', {'State': 'StateName'}, ['StateName'], 'StateID')
-
-    # DimCheckupTime
-    checkup_map = load_dimension(conn, data, 'DimCheckupTime', {'LastCheckupTime': 'LastCheckupTime', 'CheckupRecency': 'CheckupRecency'}, ['LastCheckupTime'], 'CheckupTimeID')
-
-    # DimPhysicalActivity
-    pa_map = load_dimension(conn, data, 'DimPhysicalActivity', {'PhysicalActivities': 'PhysicalActivities', 'ActivityLevel': 'ActivityLevel'}, ['PhysicalActivities', 'ActivityLevel'], 'PhysicalActivityID')
-
-    # DimLifestyle
-    lifestyle_map = load_dimension(conn, data, 'DimLifestyle', 
-                                   {'SmokerStatus': 'SmokerStatus', 'ECigaretteUsage': 'ECigaretteUsage', 'AlcoholDrinkers': 'AlcoholDrinkers', 'SleepQuality': 'SleepQuality'},
-                                   ['SmokerStatus', 'ECigaretteUsage', 'AlcoholDrinkers', 'SleepQuality'], 'LifestyleID')
-
-    # DimChronicDiseases
-    chronic_map = load_dimension(conn, data, 'DimChronicDiseases',
-                                 {'HadDiabetes': 'HadDiabetes', 'HadArthritis': 'HadArthritis', 'HadCOPD': 'HadCOPD', 
-                                  'HadKidneyDisease': 'HadKidneyDisease', 'HadDepressiveDisorder': 'HadDepressiveDisorder', 
-                                  'HadCancer': 'HadCancer', 'HadSkinCancer': 'HadSkinCancer'},
-                                 ['HadDiabetes', 'HadArthritis', 'HadCOPD', 'HadKidneyDisease', 'HadDepressiveDisorder', 'HadCancer', 'HadSkinCancer'], 'ChronicDiseaseID')
-
+    key_cache = open_key_cache() if use_key_cache else None
+    maps = {}
+    for name, table_name, column_map, unique_cols, id_column_name in DIMENSIONS:
+        maps[name] = load_dimension(conn, distinct_keys[name], table_name, column_map, unique_cols, id_column_name, key_cache)
+        if maps[name] is None:
+            break
+    if key_cache is not None:
+        key_cache.close()
+    failed_dimensions = [name for name, id_map in maps.items() if id_map is None]
+    if failed_dimensions:
+        logging.error(f"Keeping the previous HealthRecord data for {record_year}: "
+                      f"the {', '.join(failed_dimensions)} dimension could not be loaded.")
+        return False
     logging.info("Dimension loading complete.")
 
-    # Load Fact Table
-    maps = {
-        'person': person_map,
-        'state': state_map,
-        'checkup': checkup_map,
-        'physical_activity': pa_map,
-        'lifestyle': lifestyle_map,
-        'chronic': chronic_map
-    }
-    load_fact_table(conn, data, maps)
+    # --- Pass 2: clean, resolve IDs and load the staging table in batches ---
+    fingerprint = load_fingerprint(content_hash, BATCH_SIZE, impute_groups)
+    committed = committed_batches(conn, record_year, fingerprint) if resume else {}
+    if not committed:
+        truncate_stage(conn)
+    aggregates = new_aggregates()
+    inserted, failed = load_fact_table(conn, iter_clean_blocks(csv_path, imputer), maps, record_year,
+                                       batch_size=BATCH_SIZE, workers=workers, aggregates=aggregates,
+                                       checkpoint=(record_year, fingerprint), committed=committed)
+    if failed:
+        logging.error(f"Keeping the previous HealthRecord data for {record_year}: {failed} batch(es) failed to stage. "
+                      f"Run again with --resume to load only the batches that are missing.")
+        return False
+    if inserted != rows:
+        logging.error(f"Keeping the previous HealthRecord data for {record_year}: only {inserted} of {rows} rows "
+                      f"could be staged, the others have keys missing from the dimension maps.")
+        return False
+
+    # --- Swap the staged year into HealthRecord ---
+    with span("swap_in_year", rows=inserted):
+        swapped = swap_in_year(conn, record_year, csv_path, content_hash, inserted, aggregates)
+    if not swapped:
+        logging.error(f"The staged rows of {record_year} are kept; run again with --resume to retry the swap.")
+        return False
+    truncate_stage(conn)
+    return True
 
-    conn.close()
+def main():
+    """Main function to run the ETL process."""
+    p = argparse.ArgumentParser(description='Load a final_data.csv survey year into HeartDiseaseDB.')
+    p.add_argument('--csv', default=CSV_FILE_PATH, help='Recoded CSV (output of recode_data.py)')
+    p.add_argument('--year', type=int, default=RECORD_YEAR, help='Survey year (RecordYear) of the CSV')
+    p.add_argument('--force', action='store_true', help='Reload the year even if the file is unchanged')
+    p.add_argument('--no-key-cache', action='store_true', help='Read the dimension tables in full instead of using the local key cache')
+    p.add_argument('--backend', choices=list(BACKENDS), default=DB_BACKEND,
+                   help=f'Warehouse to load into (default: {DB_BACKEND}); duckdb / sqlite build a local database file')
+    p.add_argument('--db-path', default=None,
+                   help='Database file of the duckdb / sqlite backends (default: data/warehouse/HeartDiseaseDB.<backend>)')
+    p.add_argument('--impute-by', action='append', default=None, metavar='COLUMN=GROUP[,GROUP...]',
+                   help="Fill a numeric column's missing values with its mean per group, e.g. BMI=Sex,AgeCategory "
+                        "(repeatable; default: IMPUTE_GROUPS)")
+    p.add_argument('--resume', action='store_true',
+                   help='Continue an interrupted or failed load of the same file after its last committed batch')
+    add_instrumentation_args(p)
+    args = p.parse_args()
+
+    impute_groups = IMPUTE_GROUPS
+    if args.impute_by:
+        impute_groups = {}
+        for spec in args.impute_by:
+            col, _, group_cols = spec.partition('=')
+            group_cols = [group_col.strip() for group_col in group_cols.split(',') if group_col.strip()]
+            if col not in NUMERIC_COLS_FOR_MEAN or not group_cols:
+                p.error(f"--impute-by {spec}: expected one of {', '.join(NUMERIC_COLS_FOR_MEAN)}=GROUP[,GROUP...]")
+            if any(group_col in NUMERIC_COLS_TO_FILL for group_col in group_cols):
+                p.error(f"--impute-by {spec}: group by categorical columns, not numeric ones")
+            impute_groups[col] = group_cols
+
+    use_backend(args.backend, args.db_path)
+    with instrumented_run(args, 'load_data', log=logging.info):
+        conn = get_db_connection()
+        if conn is None:
+            return
+
+        load_year(conn, args.csv, args.year, force=args.force, use_key_cache=not args.no_key_cache,
+                  impute_groups=impute_groups, resume=args.resume)
+
+        conn.close()
     logging.info("ETL process finished.")
 
 if __name__ == '__main__':
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Recode the raw BRFSS codes in the converted CSV into the labelled columns of
+final_data.csv that load_data.py expects (HadHeartAttack, AgeCategory, BMI, ...).
+
+Usage:
+  python scripts/recode_data.py \
+    --input data/processed/converted_from_script_new02.csv \
+    --codebook documentation/USCODE22_LLCP_102523.HTML \
+    --out data/processed/final_data.csv \
+    --chunksize 100000
+
+This is the scripted version of processing_data_main.ipynb:
+- Value labels, missing codes (7/9, 77/99, ...), valid ranges and implied
+  decimal places come from the compiled codebook schema (codebook_schema.py).
+  Where the project uses its own wording for a label, RECODES overrides it.
+- Every column is recoded at once through a lookup table indexed by the code,
+  one chunk of rows at a time, so memory stays flat for a full-year file.
+- Rows with any missing / invalid value are dropped, as dropna() did.
+"""
+
+import argparse
+import csv
+import os
+from itertools import islice
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from codebook_schema import load_codebook_schema, variables_by_name
+from instrumentation import add_counts, add_instrumentation_args, instrumented_run, span, timed_iter
+
+
+# ----------------------------------------------------------------------
+# Recode specification
+# ----------------------------------------------------------------------
+LAST_CHECKUP = {
+    1: "Within past year (anytime less than 12 months ago)",
+    2: "Within past 2 years (1 year but less than 2 years ago)",
+    3: "Within past 5 years (2 years but less than 5 years ago)",
+    4: "5 or more years ago"
+}
+
+TEETH_REMOVED = {
+    1: "1 to 5",
+    2: "6 or more (but not all)",
+    3: "All",
+    8: "None of them"
+}
+
+DIABETES = {
+    1: "Yes",
+    2: "Yes (but only during pregnancy - female)",
+    3: "No",
+    4: "No (pre-diabetes or borderline diabetes)",
+}
+
+ECIGARETTES = {
+    1: "Never used e-cigarettes in my entire life",
+    2: "Use them every day",
+    3: "Use them some days",
+    4: "Not at all (right now)"
+}
+
+RACE = {
+    1: "White only (Non-Hispanic)",
+    2: "Black only (Non-Hispanic)",
+    3: "Other race only (Non-Hispanic)",
+    4: "Multiracial (Non-Hispanic)",
+    5: "Hispanic"
+}
+
+TETANUS = {
+    1: "Yes - received Tdap",
+    2: "Yes - received tetanus shot, but not Tdap",
+    3: "Yes - received tetanus shot but not sure what type",
+    4: "No - did not receive any tetanus shot in the past 10 years",
+}
+
+COVID = {
+    1: "Yes",
+    2: "No",
+    3: "Tested positive using home test without a health professional"
+}
+
+# Days-type questions: 88 means "None"
+NONE_IS_ZERO = {88: 0.0}
+
+# (output column, SAS variable, kind, mapping)
+#   kind 'label':  mapping overrides the codebook value labels (None = use the
+#                  codebook labels, minus its missing/refused codes)
+#   kind 'number': values inside the codebook ranges are kept (scaled by the
+#                  implied decimals); mapping gives values for special codes
+RECODES: List[Tuple[str, str, str, Optional[dict]]] = [
+    ('State', '_STATE', 'label', None),
+    ('Sex', 'SEXVAR', 'label', None),
+    ('GeneralHealth', 'GENHLTH', 'label', None),
+    ('PhysicalHealthDays', 'PHYSHLTH', 'number', NONE_IS_ZERO),
+    ('MentalHealthDays', 'MENTHLTH', 'number', NONE_IS_ZERO),
+    ('LastCheckupTime', 'CHECKUP1', 'label', LAST_CHECKUP),
+    ('PhysicalActivities', 'EXERANY2', 'label', None),
+    ('SleepHours', 'SLEPTIM1', 'number', None),
+    ('RemovedTeeth', 'RMVTETH4', 'label', TEETH_REMOVED),
+    ('HadHeartAttack', 'CVDINFR4', 'label', None),
+    ('HadAngina', 'CVDCRHD4', 'label', None),
+    ('HadStroke', 'CVDSTRK3', 'label', None),
+    ('HadAsthma', 'ASTHMA3', 'label', None),
+    ('HadSkinCancer', 'CHCSCNC1', 'label', None),
+    ('HadCOPD', 'CHCCOPD3', 'label', None),
+    ('HadDepressiveDisorder', 'ADDEPEV3', 'label', None),
+    ('HadKidneyDisease', 'CHCKDNY2', 'label', None),
+    ('HadArthritis', 'HAVARTH4', 'label', None),
+    ('HadDiabetes', 'DIABETE4', 'label', DIABETES),
+    ('DeafOrHardOfHearing', 'DEAF', 'label', None),
+    ('BlindOrVisionDifficulty', 'BLIND', 'label', None),
+    ('DifficultyConcentrating', 'DECIDE', 'label', None),
+    ('DifficultyWalking', 'DIFFWALK', 'label', None),
+    ('DifficultyDressingBathing', 'DIFFDRES', 'label', None),
+    ('DifficultyErrands', 'DIFFALON', 'label', None),
+    ('SmokerStatus', '_SMOKER3', 'label', None),
+    ('ECigaretteUsage', 'ECIGNOW2', 'label', ECIGARETTES),
+    ('ChestScan', 'LCSCTSC1', 'label', None),
+    ('RaceEthnicityCategory', '_RACEGR4', 'label', RACE),
+    ('AgeCategory', '_AGEG5YR', 'label', None),
+    ('HeightInMeters', 'HTM4', 'number', None),
+    ('WeightInKilograms', 'WTKG3', 'number', None),
+    ('BMI', '_BMI5', 'number', None),
+    ('AlcoholDrinkers', 'DRNKANY6', 'label', None),
+    ('HIVTesting', '_AIDTST4', 'label', None),
+    ('FluVaxLast12', 'FLUSHOT7', 'label', None),
+    ('PneumoVaxEver', 'PNEUVAC4', 'label', None),
+    ('TetanusLast10Tdap', 'TETANUS1', 'label', TETANUS),
+    ('HighRiskLastYear', 'HIVRISK5', 'label', None),
+    ('CovidPos', 'COVIDPOS', 'label', COVID),
+]
+
+OUTPUT_COLUMNS = [output for output, _, _, _ in RECODES]
+SOURCE_COLUMNS = [sas for _, sas, _, _ in RECODES]
+
+
+# ----------------------------------------------------------------------
+# Step 1: Build lookup tables from the codebook schema
+# ----------------------------------------------------------------------
+def build_label_table(var: dict, mapping: Optional[dict]):
+    """
+    Build (lut, labels) for a coded variable.
+
+    lut[code] is the index of the code's label in labels, or -1 for codes that
+    are missing, refused or not labelled.
+    """
+    if mapping is None:
+        missing = set(var['missing_codes'])
+        mapping = {int(code): label for code, label in var['values'].items() if int(code) not in missing}
+    labels = np.array(list(mapping.values()), dtype=object)
+    lut = np.full(max(mapping) + 1, -1, dtype=np.int32)
+    for index, code in enumerate(mapping):
+        lut[code] = index
+    return lut, labels
+
+
+def build_recoders(schema: dict) -> List[tuple]:
+    """Resolve RECODES against the codebook into ready-to-apply lookup tables."""
+    variables = variables_by_name(schema)
+    recoders = []
+    for output, sas, kind, mapping in RECODES:
+        var = variables[sas]
+        if kind == 'label':
+            recoders.append((output, kind, build_label_table(var, mapping)))
+        else:
+            ranges = np.array([(low, high) for low, high, _ in var['ranges']], dtype=np.float64).reshape(-1, 2)
+            scale = 10.0 ** (var['implied_decimals'] or 0)
+            recoders.append((output, kind, (ranges, mapping or {}, scale)))
+    return recoders
+
+
+# ----------------------------------------------------------------------
+# Step 2: Vectorized recodes
+# ----------------------------------------------------------------------
+def parse_codes(values: np.ndarray) -> np.ndarray:
+    """Parse a column of code strings to float64; blanks and junk become NaN."""
+    values = np.where(values == '', 'nan', values)
+    try:
+        return values.astype(np.float64)
+    except ValueError:
+        codes = np.full(len(values), np.nan)
+        for i, value in enumerate(values.tolist()):
+            try:
+                codes[i] = float(value)
+            except ValueError:
+                pass
+        return codes
+
+
+def recode_labels(codes: np.ndarray, table) -> Tuple[np.ndarray, np.ndarray]:
+    """Map codes to labels through the lookup table; returns (labels, valid_mask)."""
+    lut, labels = table
+    in_range = np.isfinite(codes) & (codes >= 0) & (codes < len(lut)) & (codes == np.floor(codes))
+    index = np.full(len(codes), -1, dtype=np.int32)
+    index[in_range] = lut[codes[in_range].astype(np.int64)]
+    valid = index >= 0
+    out = np.empty(len(codes), dtype=object)
+    out[valid] = labels[index[valid]]
+    return out, valid
+
+
+def recode_numbers(codes: np.ndarray, table) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep codes inside the codebook ranges, scaled by the implied decimals."""
+    ranges, special, scale = table
+    in_range = np.zeros(len(codes), dtype=bool)
+    for low, high in ranges:
+        in_range |= (codes >= low) & (codes <= high)
+    out = np.where(in_range, codes / scale, np.nan)
+    for code, value in special.items():
+        out[codes == code] = value
+    return out, ~np.isnan(out)
+
+
+def recode_block(columns: Dict[str, np.ndarray], recoders) -> Tuple[List[np.ndarray], np.ndarray]:
+    """
+    Recode one block of raw columns (SAS name -> array of code strings).
+
+    Returns the output columns (in OUTPUT_COLUMNS order, formatted for CSV)
+    and the mask of rows where every column is valid.
+    """
+    keep = None
+    outputs = []
+    for (output, kind, table), sas in zip(recoders, SOURCE_COLUMNS):
+        codes = parse_codes(columns[sas])
+        if kind == 'label':
+            values, valid = recode_labels(codes, table)
+        else:
+            values, valid = recode_numbers(codes, table)
+            values = values.astype(str)
+        outputs.append(values)
+        keep = valid if keep is None else keep & valid
+    return outputs, keep
+
+
+# ----------------------------------------------------------------------
+# Step 3: Stream converted CSV -> final CSV
+# ----------------------------------------------------------------------
+def read_csv_blocks(input_csv: str, columns: List[str], chunksize: int):
+    """Yield {column: array of str} for the requested columns, chunksize rows at a time."""
+    with open(input_csv, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        header_map = {name: i for i, name in enumerate(header)}
+        missing = [col for col in columns if col not in header_map]
+        if missing:
+            raise KeyError(f'Columns not found in {input_csv}: {", ".join(missing)}')
+        getter = itemgetter(*[header_map[col] for col in columns])
+
+        while True:
+            rows = list(map(getter, islice(reader, chunksize)))
+            if not rows:
+                break
+            if len(columns) == 1:
+                rows = [(value,) for value in rows]
+            yield {col: np.array(values, dtype=str) for col, values in zip(columns, zip(*rows))}
+
+
+def recode(input_csv: str, codebook_path: str, out_csv: str, chunksize: int = 100000):
+    """Recode input_csv (output of asc_to_csv.convert) into out_csv (input of load_data.main)."""
+    print(f'Loading codebook schema: {codebook_path}')
+    with span('codebook'):
+        recoders = build_recoders(load_codebook_schema(codebook_path))
+
+    out_dir = os.path.dirname(out_csv)
+    if out_dir and not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+
+    rows_read = 0
+    rows_written = 0
+    with open(out_csv, 'w', newline='', encoding='utf-8') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(OUTPUT_COLUMNS)
+
+        for block in timed_iter('read_csv', read_csv_blocks(input_csv, SOURCE_COLUMNS, chunksize)):
+            with span('recode_block'):
+                outputs, keep = recode_block(block, recoders)
+            with span('write_csv', rows=int(keep.sum())):
+                writer.writerows(zip(*(values[keep].tolist() for values in outputs)))
+            rows_read += len(keep)
+            rows_written += int(keep.sum())
+            add_counts('read_csv', rows=len(keep))
+            add_counts('recode_block', rows=len(keep))
+            print(f'Processed {rows_read} rows, kept {rows_written}...')
+
+    add_counts('read_csv', nbytes=os.path.getsize(input_csv))
+    add_counts('write_csv', nbytes=os.path.getsize(out_csv))
+    print(f'Processing complete. Wrote {rows_written} valid rows to {out_csv}')
+    return rows_written
+
+
+def main():
+    p = argparse.ArgumentParser(description='Recode converted BRFSS CSV into the labelled final_data.csv.')
+    p.add_argument('--input', default='../data/processed/converted_from_script_new02.csv', help='CSV written by asc_to_csv.py')
+    p.add_argument('--codebook', default='../documentation/USCODE22_LLCP_102523.HTML', help='Path to SAS HTML codebook')
+    p.add_argument('--out', default='../data/processed/final_data.csv', help='Output CSV path')
+    p.add_argument('--chunksize', type=int, default=100000, help='Number of rows to recode per chunk')
+    add_instrumentation_args(p)
+    args = p.parse_args()
+
+    with instrumented_run(args, 'recode_data'):
+        recode(args.input, args.codebook, args.out, chunksize=args.chunksize)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Generate a synthetic LLCP fixed-width ASC file (and optionally the matching
+converted and final_data CSVs) from the SAS HTML codebook.
+
+Usage:
+  python scripts/synthetic_llcp.py \
+    --codebook documentation/USCODE22_LLCP_102523.HTML \
+    --rows 100000 --out data/synthetic/LLCP_synthetic.ASC \
+    --csv data/synthetic/LLCP_synthetic.csv \
+    --final data/synthetic/final_data_synthetic.csv
+
+Every variable is sampled on its own from the codebook's unweighted
+frequencies (see codebook_schema.py): each labelled code, each value range
+(uniform inside the range) and BLANK are drawn in the proportions the
+codebook reports. Variables without a frequency table (SEQNO, IDATE, the
+survey weights, ...) get random digits. The file has the real record layout,
+so asc_to_csv.py, recode_data.py and load_data.py run on it unchanged, and the
+same --seed always gives the same file.
+"""
+
+import argparse
+import os
+from typing import List, Tuple
+
+import numpy as np
+
+from codebook_schema import load_codebook_schema
+
+BLANK = -1
+SPACE, ZERO, NEWLINE = ord(' '), ord('0'), ord('\n')
+
+
+# ----------------------------------------------------------------------
+# Step 1: Sampling plan per variable
+# ----------------------------------------------------------------------
+def build_samplers(schema: dict) -> List[Tuple[int, int, np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Return (start, end, lows, highs, probabilities) per variable, in codebook order.
+
+    Outcome i draws a code uniformly from lows[i]..highs[i] (a single labelled
+    code has lows[i] == highs[i]; BLANK has both set to BLANK). Variables
+    without frequencies get an empty plan and are filled with random digits.
+    """
+    samplers = []
+    for var in schema['variables']:
+        outcomes = [(int(code), int(code), count) for code, count in var['value_counts'].items()]
+        outcomes += [(low, high, count) for (low, high, _), count in zip(var['ranges'], var['range_counts'])]
+        outcomes.append((BLANK, BLANK, var['blank_count']))
+        lows, highs, counts = (np.array(column, dtype=np.int64) for column in zip(*outcomes))
+        total = counts.sum()
+        probabilities = counts / total if total > 0 else np.empty(0)
+        samplers.append((var['start'], var['end'], lows, highs, probabilities))
+    return samplers
+
+
+def record_width(schema: dict) -> int:
+    """Record length without the line terminator (last column of any variable)."""
+    return max(var['end'] for var in schema['variables'])
+
+
+# ----------------------------------------------------------------------
+# Step 2: Generate blocks of records
+# ----------------------------------------------------------------------
+def sample_codes(rng: np.random.Generator, lows: np.ndarray, highs: np.ndarray,
+                 probabilities: np.ndarray, rows: int) -> np.ndarray:
+    """Draw `rows` codes (BLANK for blanks) from one variable's plan."""
+    choice = rng.choice(len(probabilities), size=rows, p=probabilities)
+    low, high = lows[choice], highs[choice]
+    return low + (rng.random(rows) * (high - low + 1)).astype(np.int64)
+
+
+def format_codes(codes: np.ndarray, width: int) -> np.ndarray:
+    """Zero-padded ASCII digits of every code as a (rows, width) uint8 matrix; blanks are spaces."""
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    digits = (np.maximum(codes, 0)[:, None] // powers) % 10 + ZERO
+    digits[codes == BLANK] = SPACE
+    return digits.astype(np.uint8)
+
+
+def generate_block(samplers, width: int, rows: int, rng: np.random.Generator) -> np.ndarray:
+    """One block of `rows` newline-terminated records as a (rows, width + 1) uint8 matrix."""
+    matrix = np.full((rows, width + 1), SPACE, dtype=np.uint8)
+    for start, end, lows, highs, probabilities in samplers:
+        field_width = end - start + 1
+        if len(probabilities):
+            field = format_codes(sample_codes(rng, lows, highs, probabilities, rows), field_width)
+        else:
+            field = rng.integers(ZERO, ZERO + 10, size=(rows, field_width), dtype=np.uint8)
+        # Later variables win where columns overlap, as in the codebook order
+        matrix[:, start - 1:end] = field
+    matrix[:, width] = NEWLINE
+    return matrix
+
+
+def write_synthetic_asc(out_path: str, codebook_path: str, rows: int,
+                        seed: int = 0, block_rows: int = 50000) -> int:
+    """Write `rows` synthetic records to out_path; returns the number of bytes written."""
+    schema = load_codebook_schema(codebook_path)
+    samplers = build_samplers(schema)
+    width = record_width(schema)
+    rng = np.random.default_rng(seed)
+
+    out_dir = os.path.dirname(out_path)
+    if out_dir and not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+
+    written = 0
+    with open(out_path, 'wb') as f:
+        while written < rows:
+            block = generate_block(samplers, width, min(block_rows, rows - written), rng)
+            f.write(block.tobytes())
+            written += len(block)
+    return written * (width + 1)
+
+
+# ----------------------------------------------------------------------
+# Step 3: CLI entry point
+# ----------------------------------------------------------------------
+def main():
+    p = argparse.ArgumentParser(description='Generate a synthetic LLCP ASC file from the SAS HTML codebook.')
+    p.add_argument('--codebook', default='../documentation/USCODE22_LLCP_102523.HTML', help='Path to SAS HTML codebook')
+    p.add_argument('--rows', type=int, default=100000, help='Number of records to generate')
+    p.add_argument('--seed', type=int, default=0, help='Random seed (same seed, same file)')
+    p.add_argument('--out', default='../data/synthetic/LLCP_synthetic.ASC', help='Output ASC path')
+    p.add_argument('--csv', default=None, help='Optional: also convert it to this CSV (columns recode_data.py needs)')
+    p.add_argument('--final', default=None, help='Optional: also recode it to this final_data CSV (implies a converted CSV)')
+    p.add_argument('--chunksize', type=int, default=50000, help='Records per generated block / conversion chunk')
+    args = p.parse_args()
+
+    if args.rows < 1:
+        p.error('--rows must be at least 1')
+
+    nbytes = write_synthetic_asc(args.out, args.codebook, args.rows, args.seed, args.chunksize)
+    print(f'Wrote {args.rows} synthetic records ({nbytes / 2**20:,.1f} MiB) -> {args.out}')
+
+    if args.csv or args.final:
+        from asc_to_csv import convert
+        from recode_data import SOURCE_COLUMNS, recode
+
+        converted_csv = args.csv or os.path.splitext(args.final)[0] + '_converted.csv'
+        convert(args.out, args.codebook, converted_csv, chunksize=args.chunksize, columns=SOURCE_COLUMNS)
+        if args.final:
+            recode(converted_csv, args.codebook, args.final, chunksize=args.chunksize)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Warehouse backends for load_data.py: everything that differs between the
+databases HeartDiseaseDB can be built in.
+
+load_data.py keeps the load logic (two passes, key cache, batching, staging
+and swapping years) and leaves the dialect-specific parts to the active
+backend (load_data.use_backend, --backend):
+- mssql   SQL Server over pyodbc (the server configured in load_data.py).
+          Dimension keys go through a #temp table and one T-SQL batch; facts
+          use fast_executemany or BULK INSERT; a partitioned schema lets a
+          year be switched in.
+- duckdb  Embedded DuckDB file. Fact batches are appended as Arrow tables
+          (pyarrow), which DuckDB scans without converting row by row.
+- sqlite  Embedded SQLite file. Every batch is one executemany in one
+          transaction, with WAL journaling.
+The embedded backends create the star schema themselves (the statements of
+generate_schema.py --dialect), so `python load_data.py --backend duckdb`
+builds a local analytic copy of HeartDiseaseDB without a server.
+"""
+
+import csv
+import hashlib
+import os
+import sqlite3
+import tempfile
+from typing import List, Tuple
+
+from instrumentation import span
+
+
+# ----------------------------------------------------------------------
+# Step 1: Common interface
+# ----------------------------------------------------------------------
+class Backend:
+    """
+    Base class of the warehouse backends. Parameters are always passed as a
+    sequence with '?' placeholders, which all three drivers accept.
+    """
+
+    name = None
+    prefix = ''                # schema prefix of table names
+    errors = (Exception,)      # driver exceptions load_data catches
+    fact_modes = ('executemany',)  # fact load modes; the first one is the default
+    max_writers = None         # parallel loading connections (None = no limit)
+    table_lock_hint = ''       # table hint for single-connection bulk inserts
+    creates_schema = False     # True: ensure_load_tables creates the whole star schema
+    partition_switch = False   # True: years can be switched in by partition
+
+    def table(self, table_name: str) -> str:
+        return f'{self.prefix}{table_name}'
+
+    def connect(self):
+        raise NotImplementedError
+
+    def describe(self) -> str:
+        """Name of the target database, for logs and the key cache file."""
+        raise NotImplementedError
+
+    def cursor(self, conn):
+        return conn.cursor()
+
+    def begin(self, conn):
+        """Starts a transaction where the driver does not do so implicitly."""
+
+    def rollback(self, conn):
+        try:
+            conn.rollback()
+        except self.errors:
+            pass  # nothing to roll back
+
+    def executemany(self, cursor, sql: str, rows):
+        cursor.executemany(sql, rows)
+
+    def insert_rows(self, cursor, table_name: str, columns, rows):
+        """INSERT rows (tuples in `columns` order) into table_name, which is already qualified."""
+        placeholders = ', '.join('?' for _ in columns)
+        self.executemany(cursor, f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+    def table_stats(self, conn, table_name: str, id_column_name: str) -> Tuple[int, int]:
+        """(row count, max ID) of a dimension, used to validate the key cache."""
+        cursor = self.cursor(conn)
+        cursor.execute(f"SELECT COUNT(*), COALESCE(MAX({id_column_name}), 0) FROM {self.table(table_name)}")
+        row_count, max_id = cursor.fetchone()
+        return int(row_count), int(max_id)
+
+    def truncate(self, conn, table_name: str):
+        self.cursor(conn).execute(f"DELETE FROM {self.table(table_name)}")
+        conn.commit()
+
+    def upsert_dimension(self, conn, table_name: str, columns: List[str], unique_cols: List[str],
+                         id_column_name: str, keys: list, known_max: int) -> Tuple[list, int]:
+        """
+        Inserts the keys (tuples in `columns` order) the table does not have yet.
+        Returns (rows of key values + ID for every ID above known_max, number
+        of rows inserted); the caller commits.
+        """
+        raise NotImplementedError
+
+    def insert_facts(self, conn, records: list, table_name: str, columns: List[str], mode: str, table_hint: str = ''):
+        """Sends one batch of fact tuples (in `columns` order); the caller commits."""
+        raise NotImplementedError
+
+    def upsert_manifest(self, cursor, manifest_table: str, record_year: int,
+                        source_file: str, content_hash: str, rows_loaded: int):
+        raise NotImplementedError
+
+
+# ----------------------------------------------------------------------
+# Step 2: SQL Server
+# ----------------------------------------------------------------------
+class MssqlBackend(Backend):
+    name = 'mssql'
+    prefix = 'dbo.'
+    fact_modes = ('executemany', 'bulk_insert')
+    table_lock_hint = 'WITH (TABLOCK) '
+    partition_switch = True
+
+    def __init__(self, server: str, database: str, driver: str, bulk_insert_dir: str = None, **_):
+        import pyodbc  # only this backend needs an ODBC driver
+        self.pyodbc = pyodbc
+        self.errors = (pyodbc.Error,)
+        self.server = server
+        self.database = database
+        self.driver = driver
+        # Where 'bulk_insert' writes its batch files; SQL Server must be able to read it
+        self.bulk_insert_dir = bulk_insert_dir
+
+    def connect(self):
+        return self.pyodbc.connect(
+            f"DRIVER={self.driver};"
+            f"SERVER={self.server};"
+            f"DATABASE={self.database};"
+            f"Trusted_Connection=yes;"
+        )
+
+    def describe(self) -> str:
+        return f"{self.server}_{self.database}"
+
+    def executemany(self, cursor, sql, rows):
+        cursor.fast_executemany = True
+        cursor.executemany(sql, rows)
+
+    def table_stats(self, conn, table_name, id_column_name):
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT_BIG(*), ISNULL(MAX({id_column_name}), 0) FROM dbo.{table_name}")
+        row_count, max_id = cursor.fetchone()
+        return row_count, max_id
+
+    def truncate(self, conn, table_name):
+        """Minimally logged, unlike DELETE."""
+        conn.cursor().execute(f"TRUNCATE TABLE dbo.{table_name}")
+        conn.commit()
+
+    def upsert_dimension(self, conn, table_name, columns, unique_cols, id_column_name, keys, known_max):
+        """
+        The keys go to a #temp table in one fast_executemany batch, then a
+        single T-SQL batch inserts the missing ones and reads the IDs back.
+        """
+        cursor = conn.cursor()
+        stage_table = f"#Stage{table_name}"
+        # Match on the unique columns; inserted rows always get IDs above known_max
+        match = ' AND '.join(f"t.{col} = s.{col}" for col in unique_cols)
+        upsert_sql = f"""
+        SET NOCOUNT ON;
+        DECLARE @inserted INT;
+        INSERT INTO dbo.{table_name} ({', '.join(columns)})
+        SELECT DISTINCT {', '.join(f's.{col}' for col in columns)}
+        FROM {stage_table} s
+        WHERE NOT EXISTS (SELECT 1 FROM dbo.{table_name} t WHERE {match});
+        SET @inserted = @@ROWCOUNT;
+        SELECT {', '.join(columns)}, {id_column_name}, @inserted FROM dbo.{table_name}
+        WHERE {id_column_name} > ?;
+        """
+
+        # Empty copy of the dimension's key columns (same types, no IDENTITY);
+        # temp tables live until the connection closes, so drop a leftover one first
+        cursor.execute(
+            f"IF OBJECT_ID('tempdb..{stage_table}') IS NOT NULL DROP TABLE {stage_table}; "
+            f"SELECT TOP 0 {', '.join(columns)} INTO {stage_table} FROM dbo.{table_name};"
+        )
+        if keys:
+            with span("dimension_executemany", rows=len(keys)):
+                self.insert_rows(cursor, stage_table, columns, keys)
+
+        cursor.execute(upsert_sql, (known_max,))
+        rows = cursor.fetchall()
+        return [row[:-1] for row in rows], (rows[0][-1] if rows else 0)
+
+    def insert_facts(self, conn, records, table_name, columns, mode, table_hint=''):
+        if mode == 'bulk_insert':
+            self.bulk_insert_facts(conn, records, table_name, table_hint)
+            return
+        sql = (f"INSERT INTO dbo.{table_name} {table_hint}({', '.join(columns)}) "
+               f"VALUES ({', '.join('?' for _ in columns)})")
+        self.executemany(conn.cursor(), sql, records)
+
+    def bulk_insert_facts(self, conn, records, table_name, table_hint=''):
+        """
+        Writes one batch to a CSV file and loads it with BULK INSERT.
+        The file has a leading 0 for HealthRecordID: without KEEPIDENTITY the
+        server ignores it and assigns the identity values itself.
+        """
+        fd, path = tempfile.mkstemp(prefix='HealthRecord_', suffix='.csv', dir=self.bulk_insert_dir)
+        try:
+            with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f, lineterminator='\n')
+                writer.writerows((0,) + record for record in records)
+            options = "FORMAT = 'CSV', FIELDTERMINATOR = ',', ROWTERMINATOR = '0x0a', CODEPAGE = '65001'"
+            if table_hint:
+                options += ", TABLOCK"
+            conn.cursor().execute(f"BULK INSERT dbo.{table_name} FROM '{os.path.abspath(path)}' WITH ({options})")
+        finally:
+            os.remove(path)
+
+    def upsert_manifest(self, cursor, manifest_table, record_year, source_file, content_hash, rows_loaded):
+        cursor.execute(f"""
+        MERGE {manifest_table} AS m
+        USING (SELECT ? AS RecordYear, ? AS SourceFile, ? AS ContentHash, ? AS RowsLoaded) AS s
+        ON m.RecordYear = s.RecordYear
+        WHEN MATCHED THEN UPDATE SET SourceFile = s.SourceFile, ContentHash = s.ContentHash,
+                                     RowsLoaded = s.RowsLoaded, LoadedAt = SYSUTCDATETIME()
+        WHEN NOT MATCHED THEN INSERT (RecordYear, SourceFile, ContentHash, RowsLoaded)
+                              VALUES (s.RecordYear, s.SourceFile, s.ContentHash, s.RowsLoaded);
+        """, (record_year, source_file, content_hash, rows_loaded))
+
+
+# ----------------------------------------------------------------------
+# Step 3: Embedded databases
+# ----------------------------------------------------------------------
+class EmbeddedBackend(Backend):
+    """A single database file; one writing connection at a time."""
+
+    extension = None
+    max_writers = 1
+    creates_schema = True
+
+    def __init__(self, path: str, **_):
+        self.path = path
+
+    def describe(self) -> str:
+        # The path hash keeps the key caches of equally named files apart
+        digest = hashlib.sha1(os.path.abspath(self.path).encode('utf-8')).hexdigest()[:8]
+        return f"{os.path.splitext(os.path.basename(self.path))[0]}_{self.name}_{digest}"
+
+    def create_schema(self, conn):
+        """Creates every table load_data.py writes to (if missing)."""
+        from generate_schema import embedded_schema
+        cursor = self.cursor(conn)
+        for statement in embedded_schema(self.name):
+            cursor.execute(statement)
+        conn.commit()
+
+    def upsert_dimension(self, conn, table_name, columns, unique_cols, id_column_name, keys, known_max):
+        """Same set-based upsert as on SQL Server, through a TEMP table."""
+        cursor = self.cursor(conn)
+        stage_table = f"stage_{table_name}"
+        match = ' AND '.join(f"t.{col} = s.{col}" for col in unique_cols)
+
+        cursor.execute(f"DROP TABLE IF EXISTS {stage_table}")
+        cursor.execute(f"CREATE TEMP TABLE {stage_table} AS SELECT {', '.join(columns)} FROM {table_name} LIMIT 0")
+        if keys:
+            with span("dimension_executemany", rows=len(keys)):
+                self.insert_rows(cursor, stage_table, columns, keys)
+
+        before, _ = self.table_stats(conn, table_name, id_column_name)
+        cursor.execute(f"""
+        INSERT INTO {table_name} ({', '.join(columns)})
+        SELECT DISTINCT {', '.join(f's.{col}' for col in columns)}
+        FROM {stage_table} s
+        WHERE NOT EXISTS (SELECT 1 FROM {table_name} t WHERE {match})
+        """)
+        after, _ = self.table_stats(conn, table_name, id_column_name)
+        cursor.execute(f"SELECT {', '.join(columns)}, {id_column_name} FROM {table_name} WHERE {id_column_name} > ?",
+                       (known_max,))
+        rows = cursor.fetchall()
+        cursor.execute(f"DROP TABLE {stage_table}")
+        return [tuple(row) for row in rows], after - before
+
+    def insert_facts(self, conn, records, table_name, columns, mode, table_hint=''):
+        self.insert_rows(self.cursor(conn), table_name, columns, records)
+
+    def upsert_manifest(self, cursor, manifest_table, record_year, source_file, content_hash, rows_loaded):
+        from datetime import datetime, timezone
+        cursor.execute(f"""
+        INSERT INTO {manifest_table} (RecordYear, SourceFile, ContentHash, RowsLoaded, LoadedAt)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (RecordYear) DO UPDATE SET SourceFile = excluded.SourceFile, ContentHash = excluded.ContentHash,
+                                              RowsLoaded = excluded.RowsLoaded, LoadedAt = excluded.LoadedAt
+        """, (record_year, source_file, content_hash, rows_loaded,
+              datetime.now(timezone.utc).replace(tzinfo=None).isoformat(sep=' ')))
+
+
+class SqliteBackend(EmbeddedBackend):
+    name = 'sqlite'
+    extension = 'sqlite'
+    errors = (sqlite3.Error,)
+
+    def connect(self):
+        conn = sqlite3.connect(self.path)
+        # WAL + NORMAL: one fsync per checkpoint instead of per commit
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+
+class DuckdbBackend(EmbeddedBackend):
+    name = 'duckdb'
+    extension = 'duckdb'
+
+    def __init__(self, path: str, **_):
+        super().__init__(path)
+        import duckdb
+        self.duckdb = duckdb
+        self.errors = (duckdb.Error,)
+        try:
+            import pyarrow
+            self.pa = pyarrow
+            self.fact_modes = ('arrow', 'executemany')
+        except ImportError:
+            self.pa = None
+
+    def connect(self):
+        return self.duckdb.connect(self.path)
+
+    def cursor(self, conn):
+        # A DuckDB cursor is a separate connection with its own transaction,
+        # so statements go through the connection itself
+        return conn
+
+    def begin(self, conn):
+        # DuckDB autocommits every statement outside an explicit transaction
+        conn.begin()
+
+    def insert_rows(self, cursor, table_name, columns, rows):
+        # executemany runs one INSERT per row; a registered Arrow table goes in
+        # with a single statement
+        if self.pa is None or not rows:
+            super().insert_rows(cursor, table_name, columns, rows)
+            return
+        batch = self.pa.Table.from_arrays([self.pa.array(values) for values in zip(*rows)], names=list(columns))
+        cursor.register('insert_batch', batch)
+        try:
+            cursor.execute(f"INSERT INTO {table_name} ({', '.join(columns)}) SELECT {', '.join(columns)} FROM insert_batch")
+        finally:
+            cursor.unregister('insert_batch')
+
+    def insert_facts(self, conn, records, table_name, columns, mode, table_hint=''):
+        if mode == 'arrow':
+            self.insert_rows(conn, table_name, columns, records)
+        else:
+            Backend.insert_rows(self, conn, table_name, columns, records)
+
+
+BACKENDS = {backend.name: backend for backend in (MssqlBackend, DuckdbBackend, SqliteBackend)}
+
+
+def make_backend(name: str, **settings) -> Backend:
+    """
+    Backend by name. Settings: server, database, driver, bulk_insert_dir
+    (mssql) and path (embedded backends).
+    """
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown backend {name!r}; expected one of {", ".join(BACKENDS)}')
+    return BACKENDS[name](**settings)